@@ -2,19 +2,24 @@ import re
 
 from flask import Flask, request, redirect, session, abort
 from flask_login import LoginManager
-from flask_wtf.csrf import CsrfProtect
 
-import dmapiclient
 from dmutils import init_app, flask_featureflags
 from dmutils.user import User
 
 from config import configs
+from .api_client import RequestCachedDataAPIClient
+from .buckets import BucketRegistry
+from .caching import FrameworkCache
+from .csrf import MaskedCsrfProtect
+from .instrumentation import instrumentation
 
 
-data_api_client = dmapiclient.DataAPIClient()
+data_api_client = RequestCachedDataAPIClient()
 login_manager = LoginManager()
 feature_flags = flask_featureflags.FeatureFlag()
-csrf = CsrfProtect()
+csrf = MaskedCsrfProtect()
+framework_cache = FrameworkCache()
+buckets = BucketRegistry()
 
 
 from app.main.helpers.services import parse_document_upload_time
@@ -34,9 +39,33 @@ def create_app(config_name):
         login_manager=login_manager,
     )
 
-    from .main import main as main_blueprint
+    instrumentation.init_app(application)
+    framework_cache.init_app(application)
+    buckets.init_app(application)
+
+    from .main import main as main_blueprint, content_loader
     from .status import status as status_blueprint
+    from .status.health import health_prober
     from .external.views.external import external as external_blueprint
+    from .compression import compression
+    from .fragment_cache import fragment_cache
+    from .metrics import metrics
+    from .profiling import request_profiler
+    from .main.helpers.communications import communications_index
+    from .main.helpers.frameworks import application_started_emails
+    from .main.helpers.outbox import email_outbox
+    from .main.helpers.services import signed_document_urls
+
+    content_loader.init_app(application)
+    fragment_cache.init_app(application)
+    communications_index.init_app(application)
+    application_started_emails.init_app(application)
+    email_outbox.init_app(application)
+    signed_document_urls.init_app(application)
+    compression.init_app(application)
+    metrics.init_app(application)
+    health_prober.init_app(application)
+    request_profiler.init_app(application)
 
     application.register_blueprint(main_blueprint, url_prefix='/suppliers')
     application.register_blueprint(status_blueprint, url_prefix='/suppliers')
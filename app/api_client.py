@@ -0,0 +1,159 @@
+from copy import deepcopy
+import inspect
+from threading import Lock
+
+from flask import g, has_request_context, current_app
+from dmapiclient import DataAPIClient
+
+from .instrumentation import instrumentation
+
+
+class RequestCachedDataAPIClient(DataAPIClient):
+    """A DataAPIClient which remembers the results of some read calls for the duration of a request.
+
+    Views and helpers frequently ask the API for the same framework, supplier framework or drafts more than once
+    while building a single page. Results of the methods listed in `CACHED_METHODS` are stored on `flask.g`, so
+    repeated identical calls within the same request are answered locally. Any request to the API other than a GET
+    throws away everything cached so far, so a view never sees data older than its own writes.
+
+    Outside of a request context the client behaves exactly like a plain `DataAPIClient`.
+
+    Calls to each of the client's public methods are timed by `instrumentation`, apart from those answered from the
+    request cache. `request_cache_totals` adds up the cache's hits and misses over all the requests this process has
+    handled, for `/_metrics`.
+    """
+    CACHED_METHODS = frozenset([
+        'get_framework',
+        'get_supplier_framework_info',
+        'find_draft_services',
+        'get_supplier',
+        'find_users',
+    ])
+
+    def __init__(self, *args, **kwargs):
+        super(RequestCachedDataAPIClient, self).__init__(*args, **kwargs)
+        self.request_cache_totals = _RequestCacheTotals()
+
+    def init_app(self, app):
+        super(RequestCachedDataAPIClient, self).init_app(app)
+        app.after_request(self._record_cache_stats)
+        app.extensions['data_api_client'] = self
+
+    def get_framework(self, *args, **kwargs):
+        return self._cached_call('get_framework', args, kwargs)
+
+    def get_supplier_framework_info(self, *args, **kwargs):
+        return self._cached_call('get_supplier_framework_info', args, kwargs)
+
+    def find_draft_services(self, *args, **kwargs):
+        return self._cached_call('find_draft_services', args, kwargs)
+
+    def get_supplier(self, *args, **kwargs):
+        return self._cached_call('get_supplier', args, kwargs)
+
+    def find_users(self, *args, **kwargs):
+        return self._cached_call('find_users', args, kwargs)
+
+    @instrumentation.timed('api', 'get_page')
+    def get_page(self, url):
+        """Fetches another page of results from one of the `links` of a paginated response."""
+        return self._get(url)
+
+    def _request(self, method, *args, **kwargs):
+        if method.upper() != 'GET':
+            self.clear_request_cache()
+        return super(RequestCachedDataAPIClient, self)._request(method, *args, **kwargs)
+
+    def clear_request_cache(self):
+        if has_request_context():
+            _get_request_cache().clear()
+
+    def _cached_call(self, method_name, args, kwargs):
+        uncached_method = instrumentation.timed('api', method_name)(
+            getattr(super(RequestCachedDataAPIClient, self), method_name)
+        )
+        if not has_request_context():
+            return uncached_method(*args, **kwargs)
+
+        key = (method_name, args, tuple(sorted(kwargs.items())))
+        cache = _get_request_cache()
+        try:
+            with cache.lock:
+                response = cache.responses[key]
+                cache.hits += 1
+        except TypeError:
+            # unhashable arguments - don't try to be clever
+            return uncached_method(*args, **kwargs)
+        except KeyError:
+            with cache.lock:
+                cache.misses += 1
+                generation = cache.generation
+            response = uncached_method(*args, **kwargs)
+            with cache.lock:
+                # a write may have happened (and cleared the cache) while we were waiting, in which case this response
+                # may already be out of date
+                if cache.generation == generation:
+                    cache.responses[key] = response
+
+        # callers are free to modify what they get back, so never hand out the cached object itself
+        return deepcopy(response)
+
+    def _record_cache_stats(self, response):
+        cache = g.get('_data_api_cache')
+        if cache is not None and (cache.hits or cache.misses):
+            self.request_cache_totals.add(cache.hits, cache.misses)
+            current_app.logger.info(
+                "data_api_client.request_cache: {hits} hits, {misses} misses",
+                extra={'hits': cache.hits, 'misses': cache.misses}
+            )
+        return response
+
+
+def _time_api_methods(cls):
+    for name, method in inspect.getmembers(DataAPIClient, inspect.isfunction):
+        if not name.startswith('_') and name != 'init_app' and name not in vars(cls):
+            setattr(cls, name, instrumentation.timed('api', name)(method))
+
+
+_time_api_methods(RequestCachedDataAPIClient)
+
+
+class _RequestCache(object):
+    """The responses cached for the current request. Views can fetch from the API on several threads at once (see
+    `fetch_concurrently`), so it has a lock. `generation` goes up every time the cache is cleared."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.responses = {}
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        with self.lock:
+            self.responses = {}
+            self.generation += 1
+
+
+class _RequestCacheTotals(object):
+    """The request cache's hits and misses, added up over every request."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, hits, misses):
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+
+
+_request_cache_creation_lock = Lock()
+
+
+def _get_request_cache():
+    with _request_cache_creation_lock:
+        if '_data_api_cache' not in g:
+            g._data_api_cache = _RequestCache()
+        return g._data_api_cache
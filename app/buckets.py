@@ -0,0 +1,89 @@
+from collections import defaultdict
+from threading import Lock, local
+
+from dmutils import s3
+
+from .instrumentation import instrumentation
+
+
+class BucketRegistry(object):
+    """Long-lived S3 handles for each of the buckets the app is configured to use.
+
+    Building a `dmutils.s3.S3` sets up a new boto session and connection pool, so rather than doing that for every
+    request we keep one handle per bucket per thread and reuse it (boto resources can't safely be shared between
+    threads, but each of them pools its own connections). Handles are created lazily, the first time a bucket is
+    used on a thread.
+
+    Each operation on a handle is timed by `instrumentation`, as `<bucket>.<method>`.
+
+    Use `override` to swap a bucket for a local stand-in, for example in tests.
+    """
+    BUCKET_CONFIG_KEYS = {
+        'agreements': 'DM_AGREEMENTS_BUCKET',
+        'communications': 'DM_COMMUNICATIONS_BUCKET',
+        'documents': 'DM_DOCUMENTS_BUCKET',
+        'submissions': 'DM_SUBMISSIONS_BUCKET',
+    }
+
+    def __init__(self):
+        self.bucket_names = {}
+        self._overrides = {}
+        self._local = local()
+        self._stats_lock = Lock()
+        self.created = defaultdict(int)
+        self.reused = defaultdict(int)
+
+    def init_app(self, app):
+        self.bucket_names = {
+            name: app.config[config_key] for name, config_key in self.BUCKET_CONFIG_KEYS.items()
+        }
+        self._overrides = {}
+        self._local = local()
+        self.created.clear()
+        self.reused.clear()
+        app.extensions['buckets'] = self
+
+    def get(self, name):
+        """Returns the handle for the bucket called `name` (one of the keys of `BUCKET_CONFIG_KEYS`)."""
+        if name in self._overrides:
+            return self._overrides[name]
+
+        handles = self._thread_handles()
+        if name in handles:
+            self._count(self.reused, name)
+        else:
+            handles[name] = TimedBucket(s3.S3(self.bucket_names[name]), name)
+            self._count(self.created, name)
+        return handles[name]
+
+    def override(self, name, bucket):
+        self._overrides[name] = bucket
+
+    def stats(self):
+        return {
+            name: {'created': self.created[name], 'reused': self.reused[name]}
+            for name in self.BUCKET_CONFIG_KEYS
+        }
+
+    def _thread_handles(self):
+        if not hasattr(self._local, 'handles'):
+            self._local.handles = {}
+        return self._local.handles
+
+    def _count(self, counter, name):
+        with self._stats_lock:
+            counter[name] += 1
+
+
+class TimedBucket(object):
+    """Wraps a `dmutils.s3.S3` handle, timing calls to its methods."""
+
+    def __init__(self, bucket, name):
+        self._bucket = bucket
+        self._name = name
+
+    def __getattr__(self, attr):
+        value = getattr(self._bucket, attr)
+        if attr.startswith('_') or not callable(value):
+            return value
+        return instrumentation.timed('s3', '{}.{}'.format(self._name, attr))(value)
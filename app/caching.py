@@ -0,0 +1,132 @@
+from collections import OrderedDict
+from copy import deepcopy
+from threading import RLock
+import time
+
+
+class TTLCache(object):
+    """A thread-safe, size-bounded, in-process cache whose entries expire after a number of seconds.
+
+    When the cache is full the least recently used entry is evicted to make room.
+    """
+
+    def __init__(self, maxsize=128, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires_at, value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.monotonic() + ttl, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def add(self, key, value, ttl=None):
+        """Sets `key` only if it isn't already in the cache, returning False if it was.
+
+        A TTL of 0 stores nothing, so `add` always succeeds.
+        """
+        with self._lock:
+            if key in self._data and self._data[key][0] > time.monotonic():
+                return False
+            self.set(key, value, ttl)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FrameworkCache(object):
+    """Process-wide cache of framework records fetched from the Data API.
+
+    Framework records only change a few times a year, so they are kept for `DM_FRAMEWORK_CACHE_TTL` seconds. While a
+    framework is going through its application cycle (see `TRANSITIONAL_STATUSES`) its status and dates can change at
+    any moment, so it is only kept for `DM_FRAMEWORK_CACHE_TRANSITION_TTL` seconds.
+
+    Frameworks are only ever changed by the admin app, so there's nothing here that could tell the cache a framework
+    has changed. Each process can show a framework as it was up to one TTL ago.
+
+    A different `backend` (anything with `get`, `set`, `delete` and `clear` methods matching `TTLCache`) can be passed
+    in to share cached frameworks between processes. Setting the TTL to 0 disables the cache entirely.
+    """
+    TRANSITIONAL_STATUSES = frozenset(['coming', 'open', 'pending', 'standstill'])
+    ALL_FRAMEWORKS_KEY = ('find_frameworks',)
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.ttl = 0
+        self.transition_ttl = 0
+
+    def init_app(self, app):
+        self.ttl = app.config['DM_FRAMEWORK_CACHE_TTL']
+        self.transition_ttl = app.config['DM_FRAMEWORK_CACHE_TRANSITION_TTL']
+        if self.backend is None or isinstance(self.backend, TTLCache):
+            self.backend = TTLCache(maxsize=app.config['DM_FRAMEWORK_CACHE_SIZE'], ttl=self.ttl)
+        app.extensions['framework_cache'] = self
+
+    @property
+    def enabled(self):
+        return self.backend is not None and self.ttl > 0
+
+    def get_framework(self, client, framework_slug):
+        """Returns the `frameworks` record for `framework_slug`, fetching it with `client` if necessary."""
+        if not self.enabled:
+            return client.get_framework(framework_slug)['frameworks']
+
+        key = ('get_framework', framework_slug)
+        framework = self.backend.get(key)
+        if framework is None:
+            framework = client.get_framework(framework_slug)['frameworks']
+            self.backend.set(key, framework, ttl=self._ttl_for([framework]))
+
+        return deepcopy(framework)
+
+    def find_frameworks(self, client):
+        """Returns the list of all framework records, fetching it with `client` if necessary."""
+        if not self.enabled:
+            return client.find_frameworks()['frameworks']
+
+        frameworks = self.backend.get(self.ALL_FRAMEWORKS_KEY)
+        if frameworks is None:
+            frameworks = client.find_frameworks()['frameworks']
+            self.backend.set(self.ALL_FRAMEWORKS_KEY, frameworks, ttl=self._ttl_for(frameworks))
+
+        return deepcopy(frameworks)
+
+    def _ttl_for(self, frameworks):
+        if any(framework.get('status') in self.TRANSITIONAL_STATUSES for framework in frameworks):
+            return min(self.ttl, self.transition_ttl)
+        return self.ttl
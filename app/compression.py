@@ -0,0 +1,186 @@
+import gzip
+import zlib
+from collections import defaultdict
+from io import BytesIO
+from threading import Lock
+
+from flask import request, session
+from flask_wtf.csrf import generate_csrf
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class GzipEncoder(object):
+    name = 'gzip'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        buf = BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=self.level, mtime=0) as f:
+            f.write(data)
+        return buf.getvalue()
+
+    def compress_chunks(self, chunks):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            # flush after every chunk so the browser can start on the page before we've finished sending it
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+class BrotliEncoder(object):
+    name = 'br'
+
+    def __init__(self, level):
+        # brotli's quality goes from 0 to 11 rather than gzip's 1 to 9
+        self.quality = min(11, max(0, level))
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.quality)
+
+    def compress_chunks(self, chunks):
+        compressor = brotli.Compressor(quality=self.quality)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+
+
+class Compression(object):
+    """Compresses responses for browsers that accept it, with brotli if it's installed or gzip otherwise.
+
+    Only responses with one of the `DM_COMPRESSION_MIMETYPES` are compressed, and only if they are at least
+    `DM_COMPRESSION_MIN_SIZE` bytes long - smaller responses fit in a packet or two anyway. Streamed responses are
+    compressed as they are sent, a chunk at a time. Responses that already have a `Content-Encoding`, and files sent
+    with `send_file`, are left alone.
+
+    Pages with CSRF tokens in them are compressed too. The session's token is a secret, and a page that also reflects
+    what the user sent could let an attacker recover it from the compressed sizes (BREACH), so `csrf_token()` in
+    templates gives a token masked afresh every time (see `app.csrf`). As a fallback, a page that has the unmasked
+    token in it is sent uncompressed.
+
+    Compressing a page changes its bytes, so an ETag on it is made weak: the browser can still use it in
+    `If-None-Match` to get a 304, but it no longer claims the response is byte-for-byte the same as the uncompressed
+    one.
+
+    `stats` counts the responses compressed with each encoding, and their size before and after.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.min_size = 0
+        self.mimetypes = frozenset()
+        self.encoders = []
+        self._stats_lock = Lock()
+        self.responses = defaultdict(int)
+        self.bytes_in = defaultdict(int)
+        self.bytes_out = defaultdict(int)
+
+    def init_app(self, app):
+        self.enabled = app.config['DM_COMPRESSION_ENABLED']
+        self.min_size = app.config['DM_COMPRESSION_MIN_SIZE']
+        self.mimetypes = frozenset(app.config['DM_COMPRESSION_MIMETYPES'])
+        level = app.config['DM_COMPRESSION_LEVEL']
+        self.encoders = [GzipEncoder(level)]
+        if brotli is not None:
+            self.encoders.insert(0, BrotliEncoder(level))
+        self.reset_stats()
+
+        app.after_request(self.compress_response)
+        app.extensions['compression'] = self
+
+    def compress_response(self, response):
+        if not self._should_compress(response):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoder = self._choose_encoder()
+        if encoder is None:
+            return response
+
+        if response.is_streamed:
+            self._compress_stream(response, encoder)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            compressed = encoder.compress(data)
+            response.set_data(compressed)
+            self._count(encoder.name, len(data), len(compressed))
+
+        response.headers['Content-Encoding'] = encoder.name
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                name: {
+                    'responses': self.responses[name],
+                    'bytes_in': self.bytes_in[name],
+                    'bytes_out': self.bytes_out[name],
+                    'bytes_saved': self.bytes_in[name] - self.bytes_out[name],
+                }
+                for name in self.responses
+            }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.responses.clear()
+            self.bytes_in.clear()
+            self.bytes_out.clear()
+
+    def _should_compress(self, response):
+        if not self.enabled or response.status_code != 200 or response.mimetype not in self.mimetypes:
+            return False
+        if 'Content-Encoding' in response.headers or response.direct_passthrough:
+            return False
+        return not self._may_carry_csrf_token(response)
+
+    def _may_carry_csrf_token(self, response):
+        if 'csrf_token' not in session or response.is_streamed:
+            return False
+        return generate_csrf().encode('utf-8') in response.get_data()
+
+    def _choose_encoder(self):
+        encoders = {encoder.name: encoder for encoder in self.encoders}
+        best = request.accept_encodings.best_match([encoder.name for encoder in self.encoders])
+        return encoders.get(best)
+
+    def _compress_stream(self, response, encoder):
+        chunks = response.iter_encoded()
+        original = response.response
+        if hasattr(original, 'close'):
+            # the response won't close the original iterable any more, and stream_with_context relies on it
+            response.call_on_close(original.close)
+
+        response.response = self._counted_stream(encoder, chunks)
+        response.headers.pop('Content-Length', None)
+
+    def _counted_stream(self, encoder, chunks):
+        sizes = {'in': 0, 'out': 0}
+
+        def measured(chunks):
+            for chunk in chunks:
+                sizes['in'] += len(chunk)
+                yield chunk
+
+        for chunk in encoder.compress_chunks(measured(chunks)):
+            sizes['out'] += len(chunk)
+            yield chunk
+        self._count(encoder.name, sizes['in'], sizes['out'])
+
+    def _count(self, name, size_in, size_out):
+        with self._stats_lock:
+            self.responses[name] += 1
+            self.bytes_in[name] += size_in
+            self.bytes_out[name] += size_out
+
+
+compression = Compression()
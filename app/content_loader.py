@@ -0,0 +1,259 @@
+from collections import defaultdict
+import hashlib
+import os
+import pickle
+from threading import Lock
+
+import six
+
+from dmcontent import content_loader as dmcontent_loader
+from dmcontent.content_loader import ContentLoader
+from jinja2 import Environment, meta
+
+from .caching import TTLCache
+from .instrumentation import instrumentation
+
+
+# Bump this whenever the format of content snapshots changes
+SNAPSHOT_VERSION = 1
+
+_template_parser = Environment()
+_MISSING = object()
+
+# Parsed YAML from the installed snapshot, pickled and keyed by absolute file path
+_snapshot_files = {}
+_read_yaml = dmcontent_loader.read_yaml
+
+
+def _read_yaml_from_snapshot(yaml_file):
+    data = _snapshot_files.get(os.path.abspath(yaml_file))
+    if data is None:
+        return _read_yaml(yaml_file)
+    # dmcontent changes what it reads in place, so every read needs its own copy
+    return pickle.loads(data)
+
+
+def context_keys(data):
+    """The context keys that filtering (or rendering) the loaded manifest or question `data` can read.
+
+    That's the keys named in `depends` rules, the root of `dynamic_field`s and any variables used in templated fields.
+    """
+    keys = set()
+    if isinstance(data, dict):
+        keys.update(depends['on'] for depends in data.get('depends', []))
+        if data.get('dynamic_field'):
+            keys.add(data['dynamic_field'].split('.')[0])
+        for value in data.values():
+            keys |= context_keys(value)
+    elif isinstance(data, (list, tuple)):
+        for value in data:
+            keys |= context_keys(value)
+    elif getattr(data, 'template', None) is not None and isinstance(getattr(data, 'source', None), six.string_types):
+        # a dmcontent TemplateField
+        keys |= meta.find_undeclared_variables(_template_parser.parse(data.source))
+    return keys
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return (dict, tuple(sorted((key, _freeze(item)) for key, item in value.items())))
+    if isinstance(value, (list, tuple)):
+        return (list, tuple(_freeze(item) for item in value))
+    return value
+
+
+def content_hash(content_path):
+    """A hash of the names and contents of all of the YAML files under `content_path`."""
+    digest = hashlib.sha256()
+    for path in _yaml_files(content_path):
+        digest.update(os.path.relpath(path, content_path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _yaml_files(content_path):
+    for root, dirs, files in os.walk(content_path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith('.yml'):
+                yield os.path.join(root, name)
+
+
+class LazyContentLoader(ContentLoader):
+    """A `ContentLoader` that only reads and parses manifests and messages the first time they are asked for.
+
+    Register the content each framework has with `register_manifest` and `register_messages` (they take the same
+    arguments as `load_manifest` and `load_messages`). Nothing is read until `get_manifest`/`get_message` is called for
+    it, so content for frameworks nobody looks at is never parsed. Each file is only ever loaded by one thread; any
+    others asking for it at the same time wait for that load to finish.
+
+    Call `load_all` to load everything registered up front, eg to check the content before deploying it.
+
+    `filter_manifest` shares filtered manifests between calls whose contexts agree on all of the values the manifest
+    depends on (see `context_keys`), keeping the `DM_CONTENT_FILTER_CACHE_SIZE` most recently used.
+
+    Most of the time spent loading content goes on parsing YAML. `build_snapshot` parses every YAML file in the content
+    once and saves the results in a snapshot named after a hash of the content; `use_snapshot` then reads the parsed
+    content from that snapshot instead of the YAML files. If the content has changed since the snapshot was built
+    there won't be a snapshot for it, and the YAML files are read as usual.
+    """
+
+    def __init__(self, content_path):
+        super(LazyContentLoader, self).__init__(content_path)
+        self.available_manifests = {}
+        self.available_messages = set()
+        self._locks = defaultdict(Lock)
+        self._locks_lock = Lock()
+        self._context_keys = {}
+        self.filter_cache = TTLCache(ttl=0)
+
+    def init_app(self, app):
+        snapshot_dir = app.config['DM_CONTENT_SNAPSHOT_DIR']
+        if snapshot_dir and not self.use_snapshot(snapshot_dir):
+            app.logger.warning(
+                "No content snapshot in {snapshot_dir} matches the current content, reading YAML instead",
+                extra={'snapshot_dir': snapshot_dir}
+            )
+
+        if app.config['DM_PRELOAD_CONTENT']:
+            self.load_all()
+
+        self.filter_cache = TTLCache(maxsize=app.config['DM_CONTENT_FILTER_CACHE_SIZE'],
+                                     ttl=app.config['DM_CONTENT_FILTER_CACHE_TTL'])
+
+        app.extensions['content_loader'] = self
+
+    def register_manifest(self, framework_slug, question_set, manifest):
+        self.available_manifests[(framework_slug, manifest)] = question_set
+
+    def register_messages(self, framework_slug, blocks):
+        self.available_messages.update((framework_slug, block) for block in blocks)
+
+    def get_manifest(self, framework_slug, manifest):
+        self._ensure_manifest_loaded(framework_slug, manifest)
+        return super(LazyContentLoader, self).get_manifest(framework_slug, manifest)
+
+    get_builder = get_manifest
+
+    def get_message(self, framework_slug, block, *args, **kwargs):
+        self._ensure_messages_loaded(framework_slug, block)
+        return super(LazyContentLoader, self).get_message(framework_slug, block, *args, **kwargs)
+
+    @instrumentation.timed('content', 'filter')
+    def filter_manifest(self, framework_slug, manifest, context):
+        """Returns `get_manifest(framework_slug, manifest).filter(context)`.
+
+        The filtered manifest may be shared with other requests, so it mustn't be changed.
+        """
+        try:
+            key = (framework_slug, manifest, self._context_key(framework_slug, manifest, context))
+            filtered = self.filter_cache.get(key)
+        except TypeError:
+            # the context has values we can't use in a key
+            return self.get_manifest(framework_slug, manifest).filter(context)
+
+        if filtered is None:
+            filtered = self.get_manifest(framework_slug, manifest).filter(context)
+            self.filter_cache.set(key, filtered)
+        return filtered
+
+    def filter_manifests(self, framework_slug, manifest, contexts):
+        """Returns `filter_manifest(framework_slug, manifest, context)` for each of `contexts`.
+
+        Each distinct set of values the manifest depends on is only filtered once, even if the filter cache is disabled.
+        """
+        filtered = {}
+        results = []
+        for context in contexts:
+            try:
+                key = self._context_key(framework_slug, manifest, context)
+                hash(key)
+            except TypeError:
+                results.append(self.filter_manifest(framework_slug, manifest, context))
+                continue
+
+            if key not in filtered:
+                filtered[key] = self.filter_manifest(framework_slug, manifest, context)
+            results.append(filtered[key])
+        return results
+
+    def load_all(self):
+        for framework_slug, manifest in sorted(self.available_manifests):
+            self._ensure_manifest_loaded(framework_slug, manifest)
+        for framework_slug, block in sorted(self.available_messages):
+            self._ensure_messages_loaded(framework_slug, block)
+
+    def snapshot_path(self, snapshot_dir):
+        return os.path.join(
+            snapshot_dir, 'content-{}-v{}.pickle'.format(content_hash(self.content_path), SNAPSHOT_VERSION)
+        )
+
+    def build_snapshot(self, snapshot_dir):
+        """Parses all of the content's YAML files and saves them as a snapshot in `snapshot_dir`."""
+        files = {
+            os.path.relpath(path, self.content_path): pickle.dumps(_read_yaml(path), pickle.HIGHEST_PROTOCOL)
+            for path in _yaml_files(self.content_path)
+        }
+        path = self.snapshot_path(snapshot_dir)
+        if not os.path.isdir(snapshot_dir):
+            os.makedirs(snapshot_dir)
+        # write to a temporary file first so that a half-written snapshot is never picked up
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(files, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(path + '.tmp', path)
+        return path
+
+    def use_snapshot(self, snapshot_dir):
+        """Reads content from the snapshot in `snapshot_dir` matching the current content, if there is one.
+
+        Returns False if there isn't a snapshot for the current content.
+        """
+        try:
+            with open(self.snapshot_path(snapshot_dir), 'rb') as f:
+                files = pickle.load(f)
+        except (IOError, OSError):
+            return False
+
+        _snapshot_files.update(
+            (os.path.abspath(os.path.join(self.content_path, path)), data) for path, data in files.items()
+        )
+        dmcontent_loader.read_yaml = _read_yaml_from_snapshot
+        return True
+
+    def is_loaded(self, framework_slug, manifest):
+        return manifest in self._content.get(framework_slug, {})
+
+    def _ensure_manifest_loaded(self, framework_slug, manifest):
+        key = ('manifest', framework_slug, manifest)
+        if (framework_slug, manifest) not in self.available_manifests or self.is_loaded(framework_slug, manifest):
+            return
+
+        with self._lock_for(key):
+            if not self.is_loaded(framework_slug, manifest):
+                self.load_manifest(framework_slug, self.available_manifests[(framework_slug, manifest)], manifest)
+
+    def _ensure_messages_loaded(self, framework_slug, block):
+        key = ('messages', framework_slug, block)
+        if (framework_slug, block) not in self.available_messages or block in self._messages.get(framework_slug, {}):
+            return
+
+        with self._lock_for(key):
+            if block not in self._messages.get(framework_slug, {}):
+                self.load_messages(framework_slug, [block])
+
+    def _context_key(self, framework_slug, manifest, context):
+        if (framework_slug, manifest) not in self._context_keys:
+            self._ensure_manifest_loaded(framework_slug, manifest)
+            if not self.is_loaded(framework_slug, manifest):
+                return ()  # get_manifest will raise ContentNotFoundError
+            self._context_keys[(framework_slug, manifest)] = sorted(
+                context_keys(self._content[framework_slug][manifest])
+            )
+        return tuple(
+            (key, _freeze(context.get(key, _MISSING))) for key in self._context_keys[(framework_slug, manifest)]
+        )
+
+    def _lock_for(self, key):
+        with self._locks_lock:
+            return self._locks[key]
@@ -0,0 +1,62 @@
+import binascii
+import os
+
+from flask_wtf.csrf import CsrfProtect, generate_csrf
+
+
+def mask_csrf_token(token):
+    """Returns `token` XORed with a fresh random pad, with the pad in front, as hex.
+
+    The masked token is different every time, so a compressed page that has one in it doesn't leak the session's
+    token through its size (BREACH).
+    """
+    token = token.encode('utf-8')
+    pad = os.urandom(len(token))
+    masked = bytes(a ^ b for a, b in zip(pad, token))
+    return binascii.hexlify(pad + masked).decode('ascii')
+
+
+def unmask_csrf_token(value):
+    """Returns the token `mask_csrf_token` masked, or `value` itself if it isn't a masked token.
+
+    Flask-WTF's tokens always have `##` in them and masked ones are only hex, so tokens from pages rendered before
+    masking was turned on still work.
+    """
+    if not value or '##' in value:
+        return value
+    try:
+        data = binascii.unhexlify(value)
+    except (binascii.Error, TypeError, ValueError):
+        return value
+    if not data or len(data) % 2:
+        return value
+
+    pad, masked = data[:len(data) // 2], data[len(data) // 2:]
+    try:
+        return bytes(a ^ b for a, b in zip(pad, masked)).decode('utf-8')
+    except UnicodeDecodeError:
+        return value
+
+
+def generate_masked_csrf():
+    return mask_csrf_token(generate_csrf())
+
+
+class MaskedCsrfProtect(CsrfProtect):
+    """Flask-WTF's CSRF protection, with the token masked afresh every time a template asks for it.
+
+    `csrf_token()` in templates returns a masked token, and tokens sent back in forms or headers are unmasked before
+    they are checked.
+    """
+
+    def init_app(self, app):
+        super(MaskedCsrfProtect, self).init_app(app)
+        app.jinja_env.globals['csrf_token'] = generate_masked_csrf
+
+        @app.context_processor
+        def masked_csrf_token():
+            # registered after Flask-WTF's own, so it wins
+            return dict(csrf_token=generate_masked_csrf)
+
+    def _get_csrf_token(self):
+        return unmask_csrf_token(super(MaskedCsrfProtect, self)._get_csrf_token())
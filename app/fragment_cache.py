@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import time
+
+import six
+from flask import current_app
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from .caching import TTLCache
+from .content_loader import content_hash
+
+
+class FileFragmentStore(object):
+    """Keeps rendered fragments in files in `directory`, so they're shared by every process on the same machine.
+
+    Each file holds the time the fragment expires followed by the fragment itself. Files are written to a temporary
+    name and renamed into place so a reader never sees a half-written fragment.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def get(self, key, default=None):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at, _, value = f.read().partition(b'\n')
+        except (IOError, OSError):
+            return default
+
+        if float(expires_at) <= time.time():
+            return default
+        return value.decode('utf-8')
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        path = self._path(key)
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'wb') as f:
+            f.write('{}\n'.format(time.time() + ttl).encode('utf-8'))
+            f.write(value.encode('utf-8'))
+        os.rename(temp_path, path)
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+
+class FragmentCache(object):
+    """Caches rendered pieces of templates marked with the `{% cache %}` tag.
+
+        {% cache 3600, 'dashboard-lede', framework.slug, framework.status %}
+          ...
+        {% endcache %}
+
+    The first argument is the number of seconds to keep the fragment for, the rest make up its key along with the
+    version of the framework content, so fragments built from content messages are rebuilt when the content changes.
+    Anything else the fragment depends on must be part of the key.
+
+    `DM_FRAGMENT_CACHE_BACKEND` picks where fragments are kept: `memory` keeps the `DM_FRAGMENT_CACHE_SIZE` most
+    recently used in each process, `filesystem` shares them between processes through files in
+    `DM_FRAGMENT_CACHE_DIR`. If it isn't set fragments are rendered every time.
+    """
+
+    def __init__(self):
+        self.store = None
+        self._content_path = None
+        self._content_version = None
+
+    def init_app(self, app):
+        backend = app.config['DM_FRAGMENT_CACHE_BACKEND']
+        if backend == 'memory':
+            self.store = TTLCache(maxsize=app.config['DM_FRAGMENT_CACHE_SIZE'])
+        elif backend == 'filesystem':
+            if not app.config.get('DM_FRAGMENT_CACHE_DIR'):
+                raise ValueError("DM_FRAGMENT_CACHE_DIR must be set to use the filesystem fragment cache backend")
+            self.store = FileFragmentStore(app.config['DM_FRAGMENT_CACHE_DIR'])
+        elif backend:
+            raise ValueError("Unknown fragment cache backend: {}".format(backend))
+        else:
+            self.store = None
+
+        # content_loader.init_app must have been called first
+        self._content_path = app.extensions['content_loader'].content_path
+        self._content_version = None
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.extensions['fragment_cache'] = self
+
+    @property
+    def content_version(self):
+        if self._content_version is None:
+            self._content_version = content_hash(self._content_path)
+        return self._content_version
+
+    def key(self, key_parts):
+        data = json.dumps([self.content_version] + list(key_parts), sort_keys=True, default=six.text_type)
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def get_or_render(self, key_parts, ttl, render):
+        if self.store is None:
+            return render()
+
+        key = self.key(key_parts)
+        fragment = self.store.get(key)
+        if fragment is None:
+            fragment = render()
+            self.store.set(key, six.text_type(fragment), ttl)
+        return Markup(fragment)
+
+
+class FragmentCacheExtension(Extension):
+    """Adds the `{% cache ttl, key, ... %}...{% endcache %}` tag. See `FragmentCache`."""
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        ttl = parser.parse_expression()
+        key_parts = []
+        while parser.stream.skip_if('comma'):
+            key_parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+
+        return nodes.CallBlock(
+            self.call_method('_cache', [ttl, nodes.List(key_parts)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _cache(self, ttl, key_parts, caller):
+        return current_app.extensions['fragment_cache'].get_or_render(key_parts, ttl, caller)
+
+
+fragment_cache = FragmentCache()
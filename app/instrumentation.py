@@ -0,0 +1,200 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock, local
+
+from flask import g, has_request_context, request
+from jinja2 import Template
+
+
+# Upper bounds, in seconds, of the buckets request and phase durations are counted in
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+
+class Histogram(object):
+    """Counts observed values in cumulative buckets with the given upper bounds, like a Prometheus histogram."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': [
+                ['+Inf' if upper_bound == float('inf') else upper_bound, count]
+                for upper_bound, count in zip(self.buckets, self.counts)
+            ],
+        }
+
+
+class CallStats(object):
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.duration = 0.0
+
+
+class Instrumentation(object):
+    """Times where each request spends its time.
+
+    Code doing something slow wraps it in `timer(category, name)`. We time calls to the Data API (by client method),
+    S3 (by bucket and operation), sending emails, rendering templates and filtering and summarising content manifests.
+    If a timer is started inside another of the same category, only the outer one counts, so eg an API client method
+    calling another isn't counted twice. Calls made in parallel (see `fetch_concurrently`) are each counted in full, so
+    the time spent in a category can add up to more than the request took.
+
+    When each request finishes its total duration and the time spent in each category are logged on a
+    `request.timings` line, and added to histograms for its endpoint. Requests that raised an exception we didn't
+    handle are counted as 500s. `stats()` returns the histograms, the number of
+    responses with each status code from each endpoint and the number of calls (and of those that raised an exception)
+    for each category and name; the status blueprint serves them at `/_timings`.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._lock = Lock()
+        # categories being timed on each thread - threads running fetch_concurrently's fetches share `g` with the view
+        self._active = local()
+        self.histograms = defaultdict(Histogram)
+        self.responses = defaultdict(int)
+        self.calls = defaultdict(CallStats)
+
+    def init_app(self, app):
+        self.app = app
+        self.reset()
+        # the first before_request function to run and the last after_request and teardown ones, so they cover all of
+        # the others. The request is recorded on teardown, as after_request isn't called if the view raised an
+        # exception we didn't handle
+        app.before_request_funcs.setdefault(None, []).insert(0, self._start_request)
+        app.after_request_funcs.setdefault(None, []).insert(0, self._note_status)
+        app.teardown_request_funcs.setdefault(None, []).insert(0, self._finish_request)
+        app.jinja_env.template_class = type('TimedTemplate', (TimedTemplate,), {'instrumentation': self})
+        app.extensions['instrumentation'] = self
+
+    @contextmanager
+    def timer(self, category, name):
+        active = self._active_categories()
+        if not has_request_context() or '_timings' not in g or category in active:
+            yield
+            return
+
+        active.add(category)
+        start = time.monotonic()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            duration = time.monotonic() - start
+            active.discard(category)
+            self._record_call(category, name, duration, failed)
+
+    def timed(self, category, name):
+        """Decorator form of `timer`."""
+        def decorator(func):
+            @wraps(func)
+            def timed_func(*args, **kwargs):
+                with self.timer(category, name):
+                    return func(*args, **kwargs)
+            return timed_func
+        return decorator
+
+    def stats(self):
+        with self._lock:
+            endpoints = defaultdict(dict)
+            for (endpoint, phase), histogram in self.histograms.items():
+                endpoints[endpoint][phase] = histogram.as_dict()
+            calls = defaultdict(dict)
+            for (category, name), call_stats in self.calls.items():
+                calls[category][name] = {
+                    'count': call_stats.count, 'errors': call_stats.errors, 'duration': call_stats.duration,
+                }
+            responses = defaultdict(dict)
+            for (endpoint, status_code), count in self.responses.items():
+                responses[endpoint][status_code] = count
+            return {'endpoints': dict(endpoints), 'responses': dict(responses), 'calls': dict(calls)}
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.responses.clear()
+            self.calls.clear()
+
+    def _start_request(self):
+        g._request_start = time.monotonic()
+        g._timings = defaultdict(lambda: defaultdict(list))
+
+    def _note_status(self, response):
+        g._response_status = response.status_code
+        return response
+
+    def _finish_request(self, exception=None):
+        if '_request_start' not in g:
+            return
+
+        duration = time.monotonic() - g._request_start
+        endpoint = request.endpoint or 'unknown'
+        status_code = 500 if exception is not None else g.get('_response_status', 500)
+        breakdown = {
+            category: round(sum(sum(durations) for durations in names.values()), 6)
+            for category, names in g._timings.items()
+        }
+        with self._lock:
+            self.histograms[(endpoint, 'total')].observe(duration)
+            self.responses[(endpoint, status_code)] += 1
+            for category, category_duration in breakdown.items():
+                self.histograms[(endpoint, category)].observe(category_duration)
+
+        self.app.logger.info(
+            "request.timings: {endpoint} took {duration}s",
+            extra={
+                'endpoint': endpoint,
+                'status': status_code,
+                'duration': round(duration, 6),
+                'timings': breakdown,
+                'calls': {
+                    '{}.{}'.format(category, name): len(durations)
+                    for category, names in g._timings.items() for name, durations in names.items()
+                },
+            }
+        )
+
+    def _active_categories(self):
+        if not hasattr(self._active, 'categories'):
+            self._active.categories = set()
+        return self._active.categories
+
+    def _record_call(self, category, name, duration, failed):
+        with self._lock:
+            g._timings[category][name].append(duration)
+            call_stats = self.calls[(category, name)]
+            call_stats.count += 1
+            call_stats.errors += int(failed)
+            call_stats.duration += duration
+
+
+class TimedTemplate(Template):
+    """A jinja `Template` that times each time it's rendered. Included and extended templates are part of the
+    template rendering them, so are timed with it."""
+    instrumentation = None
+
+    def render(self, *args, **kwargs):
+        with self.instrumentation.timer('template', self.name or '<string>'):
+            return super(TimedTemplate, self).render(*args, **kwargs)
+
+
+instrumentation = Instrumentation()
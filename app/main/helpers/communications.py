@@ -0,0 +1,121 @@
+from copy import deepcopy
+
+from ... import buckets
+from ...caching import TTLCache
+
+
+UPDATES_SECTIONS = ('communications', 'clarifications')
+
+
+def get_base_communications_files(framework_slug):
+    """The communications documents we expect to (eventually) find in the bucket for a framework."""
+    return {
+        "invitation": {
+            "path": "communications/",
+            "filename": "{}-invitation.pdf".format(framework_slug),
+        },
+        "proposed_agreement": {
+            "path": "communications/",
+            "filename": "{}-proposed-framework-agreement.pdf".format(framework_slug),
+        },
+        "final_agreement": {
+            "path": "communications/",
+            "filename": "{}-final-framework-agreement.pdf".format(framework_slug),
+        },
+        "proposed_call_off": {
+            "path": "communications/",
+            "filename": "{}-proposed-call-off.pdf".format(framework_slug),
+        },
+        "final_call_off": {
+            "path": "communications/",
+            "filename": "{}-final-call-off.pdf".format(framework_slug),
+        },
+        "reporting_template": {
+            "path": "communications/",
+            "filename": "{}-reporting-template.xls".format(framework_slug),
+        },
+        "supplier_updates": {
+            "path": "communications/updates/",
+        },
+    }
+
+
+class CommunicationsFiles(object):
+    """An index over the listing of a framework's files in the communications bucket.
+
+    The listing is scanned once, when the index is built, to find the last modified date of each of the known
+    communications files and to split the supplier updates into communications and clarifications.
+    """
+
+    def __init__(self, framework_slug, key_list):
+        self.framework_slug = framework_slug
+        self.base_files = get_base_communications_files(framework_slug)
+        self.updates = {section: [] for section in UPDATES_SECTIONS}
+
+        known_prefixes = set(self._full_path(d["path"] + d.get("filename", "")) for d in self.base_files.values())
+        updates_prefix = self._full_path("communications/updates/")
+        self._last_modified_by_prefix = {}
+
+        # the last matching file in the listing wins, as it did when we searched the reversed listing
+        for key in key_list:
+            for prefix in known_prefixes:
+                if key['path'].startswith(prefix):
+                    self._last_modified_by_prefix[prefix] = key.get('last_modified')
+
+            if key['path'].startswith(updates_prefix):
+                self._add_update(key)
+
+    def last_modified(self, path):
+        """Returns the last modified date of the last file starting with one of the known communications paths."""
+        return self._last_modified_by_prefix.get(self._full_path(path))
+
+    def communications_files(self):
+        """The known communications files, annotated with their `last_modified` date (`None` if they don't exist)."""
+        return {
+            label: dict(d, last_modified=self.last_modified(d["path"] + d.get("filename", "")))
+            for label, d in self.base_files.items()
+        }
+
+    def updates_files(self):
+        return deepcopy(self.updates)
+
+    def _add_update(self, key):
+        path_parts = key['path'].split('/')
+        if len(path_parts) > 3 and path_parts[3] in self.updates:
+            self.updates[path_parts[3]].append(dict(key, path='/'.join(path_parts[2:])))
+
+    def _full_path(self, path):
+        return '{}/{}'.format(self.framework_slug, path)
+
+
+class CommunicationsIndex(object):
+    """Shares `CommunicationsFiles` for each framework between requests for `DM_COMMUNICATIONS_INDEX_TTL` seconds.
+
+    Call `refresh` to throw away the index for a framework (or all of them) so that it is rebuilt from the bucket on
+    next use. A TTL of 0 disables the cache and the bucket is listed every time.
+    """
+
+    def __init__(self):
+        self.cache = TTLCache(ttl=0)
+
+    def init_app(self, app):
+        self.cache = TTLCache(maxsize=app.config['DM_COMMUNICATIONS_INDEX_SIZE'],
+                              ttl=app.config['DM_COMMUNICATIONS_INDEX_TTL'])
+        app.extensions['communications_index'] = self
+
+    def get(self, framework_slug):
+        index = self.cache.get(framework_slug)
+        if index is None:
+            key_list = buckets.get('communications').list(framework_slug, load_timestamps=True)
+            index = CommunicationsFiles(framework_slug, key_list)
+            self.cache.set(framework_slug, index)
+        return index
+
+    def refresh(self, framework_slug=None):
+        if framework_slug is None:
+            self.cache.clear()
+        else:
+            self.cache.delete(framework_slug)
+
+
+communications_index = CommunicationsIndex()
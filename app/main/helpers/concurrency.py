@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from flask import current_app, has_request_context, _app_ctx_stack, _request_ctx_stack
+
+
+_executor = None
+_executor_lock = Lock()
+_pool_size = 0
+# fetches that are running and that are waiting for a thread, for `pool_stats`
+_busy = 0
+_queued = 0
+_counts_lock = Lock()
+
+
+def fetch_concurrently(**fetches):
+    """Run independent fetches in parallel and return a dict of their results, keyed by the names they were given.
+
+        framework, drafts = itemgetter('framework', 'drafts')(fetch_concurrently(
+            framework=partial(get_framework, data_api_client, framework_slug),
+            drafts=partial(DraftIndex.fetch, data_api_client, framework_slug),
+        ))
+
+    Each fetch is a callable taking no arguments. They are run on a shared, bounded thread pool where the view's app
+    and request contexts can be seen, so `current_user`, `current_app`, `flask.g`, `session` and `abort` all behave as
+    they would in the view itself. Once every fetch has finished, the first exception raised (in the order the fetches
+    were given) is re-raised in the calling thread.
+
+    If there is only one fetch, no request context or `DM_FETCH_POOL_SIZE` is less than 2 the fetches are simply run
+    one after the other.
+    """
+    executor = _get_executor()
+    if executor is None or len(fetches) < 2:
+        return {name: fetch() for name, fetch in fetches.items()}
+
+    global _queued
+    with _counts_lock:
+        _queued += len(fetches)
+    futures = [(name, executor.submit(_in_current_contexts(fetch))) for name, fetch in fetches.items()]
+
+    results, exceptions = {}, []
+    for name, future in futures:
+        exception = future.exception()
+        if exception is not None:
+            exceptions.append(exception)
+        else:
+            results[name] = future.result()
+
+    if exceptions:
+        raise exceptions[0]
+
+    return results
+
+
+def _in_current_contexts(fetch):
+    # The view's own contexts are made visible on the worker thread, rather than copies of them, so that anything
+    # already loaded onto them (the logged in user, the session, the request cache on `g`) is shared with the view.
+    # They are put on the worker's context stacks directly instead of being pushed: pushing a request context again
+    # reopens the session from the cookie (losing any changes the view made to it), pushing and popping contexts
+    # changes their state from several threads at once, and popping them runs the app's teardown functions.
+    app_ctx = _app_ctx_stack.top
+    request_ctx = _request_ctx_stack.top
+
+    def run_in_contexts():
+        global _busy, _queued
+        with _counts_lock:
+            _queued -= 1
+            _busy += 1
+        _app_ctx_stack.push(app_ctx)
+        _request_ctx_stack.push(request_ctx)
+        try:
+            return fetch()
+        finally:
+            _request_ctx_stack.pop()
+            _app_ctx_stack.pop()
+            with _counts_lock:
+                _busy -= 1
+
+    return run_in_contexts
+
+
+def pool_stats():
+    """How big the fetch thread pool is, how many of its threads are running fetches and how many fetches are waiting
+    for a thread."""
+    with _counts_lock:
+        return {'size': _pool_size, 'busy': _busy, 'queued': _queued}
+
+
+def _get_executor():
+    global _executor, _pool_size
+
+    if not has_request_context():
+        return None
+
+    pool_size = current_app.config['DM_FETCH_POOL_SIZE']
+    if pool_size < 2:
+        return None
+
+    with _executor_lock:
+        if _executor is None or _pool_size != pool_size:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(max_workers=pool_size)
+            with _counts_lock:
+                _pool_size = pool_size
+        return _executor
@@ -0,0 +1,54 @@
+import hashlib
+import json
+
+import six
+from flask import current_app, g, request, session
+from flask_login import current_user
+
+
+def page_etag(*data):
+    """An ETag for a page showing `data` (the upstream responses it's built from) to the current user.
+
+    It also covers the app version, so a deploy with new templates or content changes it, and the session's CSRF token,
+    which pages with forms embed.
+    """
+    key = json.dumps(
+        [current_app.config['VERSION'], current_user.id, session.get('csrf_token'), data],
+        sort_keys=True, default=six.text_type,
+    )
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def check_etag(*data):
+    """Returns a 304 Not Modified response if the browser already has the page showing `data`, otherwise None.
+
+    Call it from a GET view once it has fetched everything the page shows but before rendering it:
+
+        not_modified = check_etag(framework, services)
+        if not_modified:
+            return not_modified
+        return render_template(...)
+
+    The ETag is added to the response by the blueprint's `add_cache_control`. Pages with flashed messages waiting to
+    be shown are always rendered, since a 304 would leave the messages in the session.
+    """
+    if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+        return None
+
+    g.etag = page_etag(*data)
+    # compressed pages are sent with a weak version of the ETag, see `app.compression`
+    if request.if_none_match.contains_weak(g.etag):
+        return current_app.response_class(status=304)
+    return None
+
+
+def add_etag(response):
+    etag = g.get('etag')
+    if not etag or response.status_code not in (200, 304):
+        return response
+
+    # a 304 has to send back the ETag the browser has, which is the weak one if the page it has was compressed
+    response.set_etag(etag, weak=response.status_code == 304 and request.if_none_match.is_weak(etag))
+    # the page is only for this user, so it mustn't be kept by shared caches
+    response.cache_control.private = True
+    return response
@@ -1,18 +1,24 @@
 # -*- coding: utf-8 -*-
 import re
+import sqlite3
 from datetime import datetime
 
+import six
 from dmutils.formats import DATETIME_FORMAT
-from flask import abort
+from flask import abort, current_app, render_template
 from flask_login import current_user
 from dmapiclient import APIError
 
+from ... import framework_cache
+from ...caching import TTLCache
+from .outbox import email_outbox
+
 
 def get_framework(client, framework_slug, allowed_statuses=None):
     if allowed_statuses is None:
         allowed_statuses = ['open', 'pending', 'standstill', 'live']
 
-    framework = client.get_framework(framework_slug)['frameworks']
+    framework = framework_cache.get_framework(client, framework_slug)
 
     if allowed_statuses and framework['status'] not in allowed_statuses:
         abort(404)
@@ -26,7 +32,7 @@ def get_framework_and_lot(client, framework_slug, lot_slug, allowed_statuses=Non
 
 
 def frameworks_by_slug(client):
-    framework_list = client.find_frameworks().get("frameworks")
+    framework_list = framework_cache.find_frameworks(client)
     frameworks = {}
     for framework in framework_list:
         frameworks[framework['slug']] = framework
@@ -56,18 +62,64 @@ def register_interest_in_framework(client, framework_slug):
     client.register_framework_interest(current_user.supplier_id, framework_slug, current_user.email_address)
 
 
-def get_last_modified_from_first_matching_file(key_list, framework_slug, prefix):
-    """
-    Takes a list of file keys and a string.
-    Returns the 'last_modified' timestamp for first file whose path starts with the passed-in string,
-    or None if no matching file is found.
+class ApplicationStartedEmails(object):
+    """Keeps track of the "you started an application" emails sent when a supplier registers interest in a framework.
+
+    When a framework opens thousands of suppliers register interest within the hour. The email is the same for
+    every supplier, so its body is rendered once per framework (unless we're in debug mode, where templates can
+    change under us). Suppliers who POST to the framework dashboard again within
+    `DM_APPLICATION_STARTED_EMAIL_WINDOW` seconds aren't sent it again.
 
-    :param key_list: list of file keys (from an s3 bucket)
-    :param path_starts_with: check for file paths which start with this string
-    :return: the timestamp of the first matching file key or None
+    Which suppliers have been sent the email is kept in the email outbox's database if there is one, so that every
+    worker process sharing it knows. Otherwise it's kept per worker process, and a POST that lands on another worker
+    sends the email again.
     """
-    path_starts_with = '{}/{}'.format(framework_slug, prefix)
-    return next((key for key in key_list if key.get('path').startswith(path_starts_with)), {}).get('last_modified')
+
+    def __init__(self):
+        self.bodies = {}
+        self.window = 0
+        self.recently_sent = TTLCache(ttl=0)
+
+    def init_app(self, app):
+        self.bodies = {}
+        self.window = app.config['DM_APPLICATION_STARTED_EMAIL_WINDOW']
+        self.recently_sent = TTLCache(maxsize=app.config['DM_APPLICATION_STARTED_EMAIL_WINDOW_SIZE'], ttl=self.window)
+        app.extensions['application_started_emails'] = self
+
+    def body(self, framework_slug):
+        if current_app.debug:
+            return self._render(framework_slug)
+        if framework_slug not in self.bodies:
+            self.bodies[framework_slug] = self._render(framework_slug)
+        return self.bodies[framework_slug]
+
+    def should_send(self, framework_slug, supplier_id):
+        """Returns True, and remembers that the email has been sent, unless it was sent to the supplier recently."""
+        if email_outbox.enabled:
+            try:
+                return email_outbox.remember_sent(self._key(framework_slug, supplier_id), self.window)
+            except (sqlite3.Error, OSError) as e:
+                current_app.logger.error("application_started_emails.error: {error}", extra={'error': six.text_type(e)})
+        return self.recently_sent.add((framework_slug, supplier_id), True)
+
+    def forget(self, framework_slug, supplier_id):
+        """Call this if sending the email failed, so that the next POST tries again."""
+        if email_outbox.enabled:
+            try:
+                email_outbox.forget_sent(self._key(framework_slug, supplier_id))
+            except (sqlite3.Error, OSError) as e:
+                current_app.logger.error("application_started_emails.error: {error}", extra={'error': six.text_type(e)})
+        self.recently_sent.delete((framework_slug, supplier_id))
+
+    @staticmethod
+    def _key(framework_slug, supplier_id):
+        return 'application-started:{}:{}'.format(framework_slug, supplier_id)
+
+    def _render(self, framework_slug):
+        return render_template('emails/{}_application_started.html'.format(framework_slug))
+
+
+application_started_emails = ApplicationStartedEmails()
 
 
 def get_first_question_index(content, section):
@@ -110,7 +162,7 @@ def get_framework_for_reuse(supplier_id, client, exclude_framework_slugs=None):
         supplier_frameworks
     )
     declarations = {i['frameworkSlug']: i for i in supplier_frameworks_on_framework}
-    frameworks = client.find_frameworks()['frameworks']
+    frameworks = framework_cache.find_frameworks(client)
     for framework in order_frameworks_for_reuse(frameworks):
         if framework['slug'] in declarations and framework['slug'] not in exclude_framework_slugs:
             return framework
@@ -170,12 +222,6 @@ def get_frameworks_by_status(frameworks, status, extra_condition=False):
     )
 
 
-def count_drafts_by_lot(drafts, lotSlug):
-    return len([
-        draft for draft in drafts if draft['lotSlug'] == lotSlug
-    ])
-
-
 def get_statuses_for_lot(
     has_one_service_limit,
     drafts_count,
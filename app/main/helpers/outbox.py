@@ -0,0 +1,383 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from threading import Condition, Event, Lock, Thread
+
+import six
+
+from dmutils import email
+from dmutils.email.exceptions import EmailError
+
+from ...instrumentation import instrumentation
+
+
+QUEUED = 'queued'
+SENDING = 'sending'
+FAILED = 'failed'
+
+
+class DeliveredEmail(object):
+    """Returned by `send_email` when the email was sent straight away, so there is nothing to wait for."""
+
+    def wait(self, timeout=None):
+        pass
+
+
+class QueuedEmail(object):
+    """A handle on an email sitting in the outbox."""
+
+    def __init__(self, outbox, message_id):
+        self.outbox = outbox
+        self.message_id = message_id
+
+    def wait(self, timeout=None):
+        """Blocks until the email has been sent, raising `EmailError` if it fails or isn't sent within `timeout`.
+
+        If a worker is sending the email when `timeout` runs out, this waits for that attempt to finish instead.
+        """
+        self.outbox.wait(self.message_id, timeout)
+
+
+class EmailOutbox(object):
+    """A durable queue of emails waiting to be sent by Mandrill, spooled to the SQLite database at
+    `DM_EMAIL_OUTBOX_PATH` and sent by `DM_EMAIL_OUTBOX_WORKERS` background threads.
+
+    Request handlers only have to write the email to the outbox, so a slow Mandrill doesn't hold up our workers.
+    Emails that fail to send are retried, backing off exponentially from `DM_EMAIL_OUTBOX_RETRY_DELAY` seconds, until
+    they have been tried `DM_EMAIL_OUTBOX_MAX_ATTEMPTS` times; after that they are marked as failed, and deleted
+    `DM_EMAIL_OUTBOX_FAILED_RETENTION` seconds later. Only the message itself is stored: the Mandrill API key is read
+    from the config when the email is sent.
+
+    A worker holds a lease of `DM_EMAIL_OUTBOX_LEASE` seconds on the email it's sending, which it keeps extending
+    until the send finishes. If the worker dies the lease runs out and another worker (in this process or another one
+    sharing the outbox) picks the email up. If it dies after Mandrill has accepted the email but before taking it out
+    of the outbox, the email is sent again: emails are sent at least once, not exactly once.
+
+    The database and its directory are created the first time the outbox is used, and the workers are started by the
+    first request (or email) in each process, so nothing happens for manager commands or in a parent process that
+    forks workers.
+
+    If `DM_EMAIL_OUTBOX_PATH` isn't set emails are sent synchronously, as they were before we had an outbox.
+    """
+    POLL_INTERVAL = 1
+    MAX_RETRY_DELAY = 300
+
+    def __init__(self):
+        self.app = None
+        self.path = None
+        self.worker_count = 0
+        self._workers = []
+        self._workers_pid = None
+        self._workers_lock = Lock()
+        self._schema_ready = False
+        self._schema_lock = Lock()
+        self._stopping = Event()
+        self._changed = Condition()
+
+    def init_app(self, app):
+        self.stop()
+        self.app = app
+        self.path = app.config['DM_EMAIL_OUTBOX_PATH']
+        self.worker_count = app.config['DM_EMAIL_OUTBOX_WORKERS']
+        self.max_attempts = app.config['DM_EMAIL_OUTBOX_MAX_ATTEMPTS']
+        self.retry_delay = app.config['DM_EMAIL_OUTBOX_RETRY_DELAY']
+        self.lease = app.config['DM_EMAIL_OUTBOX_LEASE']
+        self.failed_retention = app.config['DM_EMAIL_OUTBOX_FAILED_RETENTION']
+        self._schema_ready = False
+
+        if self.path:
+            app.before_request(self._ensure_started)
+
+        app.extensions['email_outbox'] = self
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    @instrumentation.timed('email', 'send_email')
+    def send_email(self, to_email_addresses, email_body, api_key, subject, from_email, from_name, tags,
+                   reply_to=None, metadata=None):
+        """Takes the same arguments as `dmutils.email.send_email` and returns an object with a `wait` method.
+
+        Raises `EmailError` if the email can't be sent (when the outbox is disabled) or queued.
+        """
+        options = {name: value for name, value in [('reply_to', reply_to), ('metadata', metadata)] if value is not None}
+        if not self.enabled:
+            email.send_email(to_email_addresses, email_body, api_key, subject, from_email, from_name, tags, **options)
+            return DeliveredEmail()
+
+        message = dict(
+            options,
+            to_email_addresses=to_email_addresses,
+            email_body=email_body,
+            subject=subject,
+            from_email=from_email,
+            from_name=from_name,
+            tags=tags,
+        )
+        try:
+            with self._connection() as conn:
+                message_id = conn.execute(
+                    "INSERT INTO outbox (payload, status, next_attempt_at) VALUES (?, ?, ?)",
+                    (json.dumps(message), QUEUED, time.time())
+                ).lastrowid
+        except (sqlite3.Error, OSError) as e:
+            raise EmailError(e)
+
+        self._ensure_started()
+        self._notify()
+        return QueuedEmail(self, message_id)
+
+    def wait(self, message_id, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            row = self._fetch_status(message_id)
+            if row is None:
+                return
+            if row['status'] == FAILED:
+                raise EmailError(row['last_error'])
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                # take it out of the outbox so that trying again can't end up sending it twice. If it's being sent
+                # right now it can't be taken out, so wait to see how that goes instead
+                if self._cancel(message_id):
+                    raise EmailError("Email was not sent within {} seconds".format(timeout))
+                remaining = None
+
+            with self._changed:
+                self._changed.wait(self.POLL_INTERVAL if remaining is None else min(remaining, self.POLL_INTERVAL))
+
+    def remember_sent(self, key, ttl):
+        """Remembers `key` for `ttl` seconds, returning False if it's already remembered.
+
+        Every process sharing the outbox sees the same keys, so this can stop several of them sending the same email.
+        """
+        if ttl <= 0:
+            return True
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM sent WHERE expires_at <= ?", (now,))
+                added = conn.execute(
+                    "INSERT OR IGNORE INTO sent (key, expires_at) VALUES (?, ?)", (key, now + ttl)
+                ).rowcount > 0
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        return added
+
+    def forget_sent(self, key):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM sent WHERE key = ?", (key,))
+
+    def start(self, worker_count):
+        self._stopping = Event()
+        self._workers = [
+            Thread(target=self._work, args=(self._stopping,), name='email-outbox-{}'.format(i), daemon=True)
+            for i in range(worker_count)
+        ]
+        self._workers_pid = os.getpid()
+        for worker in self._workers:
+            worker.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._notify()
+        if self._workers_pid == os.getpid():
+            for worker in self._workers:
+                worker.join(timeout)
+        self._workers = []
+        self._workers_pid = None
+
+    def process_next(self):
+        """Sends the next email that's due, returning False if there wasn't one."""
+        message = self._claim_next()
+        if message is None:
+            return False
+
+        payload = message['payload']
+        try:
+            with self._renewing_lease(message['id']), self.app.app_context():
+                email.send_email(
+                    payload.pop('to_email_addresses'),
+                    payload.pop('email_body'),
+                    self.app.config['DM_MANDRILL_API_KEY'],
+                    payload.pop('subject'),
+                    payload.pop('from_email'),
+                    payload.pop('from_name'),
+                    payload.pop('tags'),
+                    **payload
+                )
+        except Exception as e:
+            self._record_failure(message, e)
+        else:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM outbox WHERE id = ?", (message['id'],))
+
+        self._notify()
+        return True
+
+    def _ensure_started(self):
+        with self._workers_lock:
+            # after a fork the child has the parent's attributes but not its threads
+            if self._workers_pid == os.getpid() or not self.worker_count:
+                return
+            self.start(self.worker_count)
+
+    @contextmanager
+    def _renewing_lease(self, message_id):
+        done = Event()
+        renewer = Thread(target=self._renew_lease, args=(message_id, done), name='email-outbox-lease', daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            done.set()
+            renewer.join()
+
+    def _renew_lease(self, message_id, done):
+        while not done.wait(self.lease / 3.0):
+            try:
+                with self._connection() as conn:
+                    conn.execute(
+                        "UPDATE outbox SET next_attempt_at = ? WHERE id = ? AND status = ?",
+                        (time.time() + self.lease, message_id, SENDING)
+                    )
+            except sqlite3.Error as e:
+                self.app.logger.error("email_outbox.error: {error}", extra={'error': six.text_type(e)})
+
+    def _work(self, stopping):
+        while not stopping.is_set():
+            try:
+                sent = self.process_next()
+            except (sqlite3.Error, OSError) as e:
+                self.app.logger.error("email_outbox.error: {error}", extra={'error': six.text_type(e)})
+                sent = False
+
+            if not sent:
+                with self._changed:
+                    self._changed.wait(self.POLL_INTERVAL)
+
+    def _claim_next(self):
+        now = time.time()
+        with self._connection() as conn:
+            # BEGIN IMMEDIATE takes the write lock straight away so no other worker can claim the same email
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "DELETE FROM outbox WHERE status = ? AND next_attempt_at <= ?",
+                    (FAILED, now - self.failed_retention)
+                )
+                row = conn.execute(
+                    "SELECT id, payload, attempts FROM outbox "
+                    "WHERE status IN (?, ?) AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT 1",
+                    (QUEUED, SENDING, now)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE outbox SET status = ?, attempts = attempts + 1, next_attempt_at = ? WHERE id = ?",
+                        (SENDING, now + self.lease, row['id'])
+                    )
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+        if row is None:
+            return None
+        return {'id': row['id'], 'payload': json.loads(row['payload']), 'attempts': row['attempts'] + 1}
+
+    def _record_failure(self, message, error):
+        attempts = message['attempts']
+        with self._connection() as conn:
+            if attempts >= self.max_attempts:
+                # next_attempt_at is when it failed, so we know when to delete it
+                conn.execute(
+                    "UPDATE outbox SET status = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    (FAILED, time.time(), six.text_type(error), message['id'])
+                )
+                self.app.logger.error(
+                    "email_outbox.failed: giving up on email {id} after {attempts} attempts: {error}",
+                    extra={'id': message['id'], 'attempts': attempts, 'error': six.text_type(error)}
+                )
+            else:
+                delay = min(self.retry_delay * 2 ** (attempts - 1), self.MAX_RETRY_DELAY)
+                conn.execute(
+                    "UPDATE outbox SET status = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    (QUEUED, time.time() + delay, six.text_type(error), message['id'])
+                )
+                self.app.logger.warning(
+                    "email_outbox.retry: email {id} failed to send, retrying in {delay}s: {error}",
+                    extra={'id': message['id'], 'delay': delay, 'error': six.text_type(error)}
+                )
+
+    def _fetch_status(self, message_id):
+        with self._connection() as conn:
+            return conn.execute("SELECT status, last_error FROM outbox WHERE id = ?", (message_id,)).fetchone()
+
+    def _cancel(self, message_id):
+        """Takes the email out of the outbox, returning False if it couldn't be because it's being sent.
+
+        An email whose lease has run out isn't being sent any more, as the worker sending it has died.
+        """
+        with self._connection() as conn:
+            return conn.execute(
+                "DELETE FROM outbox WHERE id = ? AND (status = ? OR (status = ? AND next_attempt_at <= ?))",
+                (message_id, QUEUED, SENDING, time.time())
+            ).rowcount > 0
+
+    @contextmanager
+    def _connection(self):
+        # a connection per operation, as sqlite connections can't be shared between threads. Statements are
+        # committed as they run unless we explicitly BEGIN a transaction.
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_schema(self):
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            directory = os.path.dirname(os.path.abspath(self.path))
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS outbox ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                    "payload TEXT NOT NULL, "
+                    "status TEXT NOT NULL, "
+                    "attempts INTEGER NOT NULL DEFAULT 0, "
+                    "next_attempt_at REAL NOT NULL, "
+                    "last_error TEXT)"
+                )
+                conn.execute("CREATE TABLE IF NOT EXISTS sent (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+            finally:
+                conn.close()
+            self._schema_ready = True
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+
+email_outbox = EmailOutbox()
+
+
+def send_email(*args, **kwargs):
+    """A drop-in replacement for `dmutils.email.send_email` that goes through the outbox."""
+    return email_outbox.send_email(*args, **kwargs)
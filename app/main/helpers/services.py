@@ -1,38 +1,106 @@
 import re
+from collections import Counter, defaultdict
 from datetime import datetime
+from threading import Lock
+from weakref import WeakKeyDictionary
+
 from flask import abort, current_app
 from flask_login import current_user
 
 from dmapiclient import APIError
 
+from ...caching import TTLCache
+from ...instrumentation import instrumentation
+
 try:
     import urlparse
 except ImportError:
     import urllib.parse as urlparse
 
 
-def get_drafts(apiclient, framework_slug):
-    try:
-        drafts = apiclient.find_draft_services(
-            current_user.supplier_id,
-            framework=framework_slug
-        )['services']
+EMPTY_ANSWERS = ('', [], None)
+
+
+def iter_drafts(apiclient, framework_slug):
+    """Yields the supplier's draft services for a framework.
+
+    Drafts are fetched from the API a page at a time, following each page's `next` link, so callers that look at each
+    draft once (eg to count them) never need all of a supplier's drafts in memory together.
+    """
+    response = _find_drafts(apiclient.find_draft_services, current_user.supplier_id, framework=framework_slug)
+    while True:
+        for draft in response['services']:
+            yield draft
 
+        next_page = response.get('links', {}).get('next')
+        if not next_page:
+            return
+        response = _find_drafts(apiclient.get_page, next_page)
+
+
+def _find_drafts(method, *args, **kwargs):
+    try:
+        return method(*args, **kwargs)
     except APIError as e:
         abort(e.status_code)
 
-    complete_drafts = [draft for draft in drafts if draft['status'] in ('submitted', 'failed')]
-    drafts = [draft for draft in drafts if draft['status'] == 'not-submitted']
 
-    return drafts, complete_drafts
+class DraftIndex(object):
+    """A supplier's draft services for a framework, bucketed by lot and status in a single pass over them.
+
+    Drafts that haven't been submitted are incomplete; submitted and failed drafts are complete. Drafts are kept in the
+    order the API listed them. Pages that only need to know how many drafts there are can build an index with
+    `counts_only`, which doesn't keep the drafts themselves.
+    """
+    INCOMPLETE_STATUSES = frozenset(['not-submitted'])
+    COMPLETE_STATUSES = frozenset(['submitted', 'failed'])
+
+    def __init__(self, drafts, counts_only=False):
+        self.counts_only = counts_only
+        self._drafts = defaultdict(list)
+        self._counts = Counter()
+        self._status_counts = Counter()
+        for draft in drafts:
+            if draft['status'] in self.COMPLETE_STATUSES:
+                complete = True
+            elif draft['status'] in self.INCOMPLETE_STATUSES:
+                complete = False
+            else:
+                continue
 
+            self._counts[(complete, draft['lotSlug'])] += 1
+            self._counts[(complete, None)] += 1
+            self._status_counts[(draft['status'], draft['lotSlug'])] += 1
+            if not counts_only:
+                self._drafts[(complete, draft['lotSlug'])].append(draft)
+                self._drafts[(complete, None)].append(draft)
 
-def get_lot_drafts(apiclient, framework_slug, lot_slug):
-    drafts, complete_drafts = get_drafts(apiclient, framework_slug)
-    return (
-        [draft for draft in drafts if draft['lotSlug'] == lot_slug],
-        [draft for draft in complete_drafts if draft['lotSlug'] == lot_slug]
-    )
+    @classmethod
+    def fetch(cls, apiclient, framework_slug, counts_only=False):
+        return cls(iter_drafts(apiclient, framework_slug), counts_only=counts_only)
+
+    def drafts(self, lot_slug=None, complete=False):
+        """A new list of the incomplete (or complete) drafts for `lot_slug`, or for all lots."""
+        if self.counts_only:
+            raise ValueError("This DraftIndex only has counts of drafts")
+        return list(self._drafts.get((complete, lot_slug), []))
+
+    def count(self, lot_slug=None, complete=False):
+        return self._counts[(complete, lot_slug)]
+
+    def lot_result(self, lot_slug):
+        if self._status_counts[('submitted', lot_slug)]:
+            return 'Successful'
+        elif self._status_counts[('failed', lot_slug)]:
+            return 'Unsuccessful'
+        else:
+            return 'No application'
+
+
+def paginate(items, page, per_page):
+    """Returns the items on `page` (counting from 1) and whether there are any more after it."""
+    start = (page - 1) * per_page
+    return items[start:start + per_page], len(items) > start + per_page
 
 
 def count_unanswered_questions(service_attributes):
@@ -41,22 +109,152 @@ def count_unanswered_questions(service_attributes):
         for question in section.questions:
             if question.answer_required:
                 unanswered_required += 1
-            elif question.value in ['', [], None]:
+            elif question.value in EMPTY_ANSWERS:
                 unanswered_optional += 1
 
     return unanswered_required, unanswered_optional
 
 
+class UnansweredQuestionIndex(object):
+    """The questions in a filtered submission manifest, indexed so that unanswered questions can be counted for lots
+    of drafts without building a summary of every question for each of them.
+
+    Most questions are answered by a single field and count as unanswered if it's empty; those are kept as lists of
+    required and optional question ids. Anything more involved (multiquestions with followups, pricing, assurance
+    questions, ...) is kept as a question and counted from its summary, exactly as `count_unanswered_questions` does.
+
+    Indexes are built once per filtered manifest and shared (see `for_content`).
+    """
+    SIMPLE_TYPES = frozenset([
+        'text', 'textbox_large', 'radios', 'checkboxes', 'boolean', 'boolean_list', 'list', 'upload', 'number',
+        'percentage', 'service_id',
+    ])
+    _indexes = WeakKeyDictionary()
+    _indexes_lock = Lock()
+
+    def __init__(self, content):
+        self.required_ids = []
+        self.optional_ids = []
+        self.other_questions = []
+        for section in content:
+            for question in section.questions:
+                if not self._is_simple(question):
+                    self.other_questions.append(question)
+                elif question.get('optional'):
+                    self.optional_ids.append(question.id)
+                else:
+                    self.required_ids.append(question.id)
+
+    @classmethod
+    def _is_simple(cls, question):
+        return question.get('type') in cls.SIMPLE_TYPES and not any(
+            question.get(key) for key in ('assuranceApproach', 'unit', 'before_summary_value')
+        )
+
+    @classmethod
+    def for_content(cls, content):
+        try:
+            with cls._indexes_lock:
+                index = cls._indexes.get(content)
+                if index is None:
+                    index = cls._indexes[content] = cls(content)
+        except TypeError:
+            # content that can't be weakly referenced can't be cached either
+            return cls(content)
+        return index
+
+    @staticmethod
+    def _is_empty(draft, question_id):
+        return draft.get(question_id, '') in EMPTY_ANSWERS
+
+    def count(self, draft):
+        unanswered_required = sum(1 for question_id in self.required_ids if self._is_empty(draft, question_id))
+        unanswered_optional = sum(1 for question_id in self.optional_ids if self._is_empty(draft, question_id))
+        for question in self.other_questions:
+            summary = question.summary(draft)
+            if summary.answer_required:
+                unanswered_required += 1
+            elif summary.value in EMPTY_ANSWERS:
+                unanswered_optional += 1
+
+        return unanswered_required, unanswered_optional
+
+
+def count_unanswered_questions_for_drafts(content_loader, framework_slug, drafts):
+    """Sets `unanswered_required` and `unanswered_optional` on each of `drafts`.
+
+    Drafts that agree on all of the answers the submission manifest depends on share a filtered manifest, and so an
+    `UnansweredQuestionIndex`.
+    """
+    manifests = content_loader.filter_manifests(framework_slug, 'edit_submission', drafts)
+    with instrumentation.timer('content', 'summary'):
+        for draft, content in zip(drafts, manifests):
+            unanswered_required, unanswered_optional = UnansweredQuestionIndex.for_content(content).count(draft)
+            draft.update({
+                'unanswered_required': unanswered_required,
+                'unanswered_optional': unanswered_optional,
+            })
+
+    return drafts
+
+
 def is_service_associated_with_supplier(service):
     return service.get('supplierId') == current_user.supplier_id
 
 
 def get_signed_document_url(uploader, document_path):
-    url = uploader.get_signed_url(document_path)
-    if url is not None:
-        url = urlparse.urlparse(url)
-        base_url = urlparse.urlparse(current_app.config['DM_ASSETS_URL'])
-        return url._replace(netloc=base_url.netloc, scheme=base_url.scheme).geturl()
+    return signed_document_urls.get(uploader, document_path)
+
+
+class SignedDocumentURLCache(object):
+    """Hands out signed S3 URLs for documents, rewritten to be served from `DM_ASSETS_URL`.
+
+    A signed URL for a (bucket, path) is reused until `DM_SIGNED_URL_SAFETY_MARGIN` seconds before it expires, so
+    suppliers clicking through several documents in quick succession don't pay for signing each time.
+    """
+
+    def __init__(self):
+        self.cache = TTLCache(ttl=0)
+        self._assets_url = None
+        self._parsed_assets_url = None
+
+    def init_app(self, app):
+        self.cache = TTLCache(
+            maxsize=app.config['DM_SIGNED_URL_CACHE_SIZE'],
+            ttl=app.config['DM_SIGNED_URL_LIFETIME'] - app.config['DM_SIGNED_URL_SAFETY_MARGIN'],
+        )
+        self._parse_assets_url(app.config['DM_ASSETS_URL'])
+        app.extensions['signed_document_urls'] = self
+
+    def get(self, uploader, document_path):
+        key = (uploader.bucket_name, document_path)
+        url = self.cache.get(key)
+        if url is None:
+            url = uploader.get_signed_url(document_path)
+            if url is None:
+                return None
+            url = self._rewrite_for_assets_url(url)
+            self.cache.set(key, url)
+        return url
+
+    def _rewrite_for_assets_url(self, url):
+        # only re-parse the assets url if the config has been changed since we last looked at it
+        if current_app.config['DM_ASSETS_URL'] != self._assets_url:
+            self._parse_assets_url(current_app.config['DM_ASSETS_URL'])
+        if self._parsed_assets_url is None:
+            return url
+
+        return urlparse.urlparse(url)._replace(
+            netloc=self._parsed_assets_url.netloc,
+            scheme=self._parsed_assets_url.scheme,
+        ).geturl()
+
+    def _parse_assets_url(self, assets_url):
+        self._assets_url = assets_url
+        self._parsed_assets_url = urlparse.urlparse(assets_url) if assets_url else None
+
+
+signed_document_urls = SignedDocumentURLCache()
 
 
 def parse_document_upload_time(data):
@@ -1,10 +1,13 @@
-from functools import reduce
-from operator import add
+from itertools import chain
 import re
+from threading import Lock
+from weakref import WeakKeyDictionary
+
 import six
 from werkzeug.datastructures import ImmutableOrderedMultiDict
 
 EMAIL_REGEX = r'^[^@^\s]+@[^@^\.^\s]+(\.[^@^\.^\s]+)+$'
+EMAIL_RE = re.compile(EMAIL_REGEX)
 
 
 def get_validator(framework, content, answers):
@@ -18,40 +21,147 @@ def get_validator(framework, content, answers):
         return validator_cls(content, answers)
 
 
+def is_truthy(answers, field):
+    return bool(answers.get(field))
+
+
+def is_falsy(answers, field):
+    """The question has been answered, but with a falsy answer (eg No)."""
+    return field in answers and not answers[field]
+
+
+def is_exactly(value):
+    return lambda answers, field: answers.get(field) is value
+
+
+def is_one_of(*values):
+    return lambda answers, field: answers.get(field) in values
+
+
+def includes_any_of(*values):
+    return lambda answers, field: any(value in (answers.get(field) or []) for value in values)
+
+
+def any_truthy(fields):
+    return [(field, is_truthy) for field in fields]
+
+
+class RequiredIf(object):
+    """A conditional requirement: the `targets` questions must be answered if the answers to the trigger questions
+    satisfy any of the `any_of` conditions and all of the `all_of` conditions. Conditions are `(field, predicate)`
+    pairs, where the predicate is called with the answers and the field.
+    """
+
+    def __init__(self, targets, any_of=(), all_of=()):
+        self.targets = tuple(targets)
+        self.any_of = tuple(any_of)
+        self.all_of = tuple(all_of)
+
+    def applies(self, answers):
+        if self.any_of and not any(predicate(answers, field) for field, predicate in self.any_of):
+            return False
+        return all(predicate(answers, field) for field, predicate in self.all_of)
+
+
+class ValidationPlan(object):
+    """Everything about a declaration manifest that a validator needs and that doesn't depend on the answers.
+
+    Building one means looking up every question in the manifest, so plans are built once per manifest and validator
+    class and shared by every validator that uses them (see `DeclarationValidator.plan`).
+    """
+    _plans = WeakKeyDictionary()
+    _plans_lock = Lock()
+
+    def __init__(self, validator_cls, content):
+        self.fields = list(chain.from_iterable(section.get_question_ids() for section in content))
+        self.questions = {question_id: content.get_question(question_id) for question_id in self.fields}
+        self.text_fields = [
+            question_id for question_id in self.fields
+            if self.questions[question_id].get('type') in ['text', 'textbox_large']
+        ]
+        self.number_string_fields = [
+            (field, re.compile(r'^\d{{{0}}}$'.format(length)))
+            for field, length in (validator_cls.number_string_fields or [])
+        ]
+        self.default_required_fields = frozenset(getattr(validator_cls, 'required_fields', self.fields))
+
+        # index the conditional requirements by the questions they make required, so that validating a page only
+        # has to check the rules for the questions on it
+        self.required_if = list(validator_cls.required_if)
+        self.rules_by_target = {}
+        for rule in self.required_if:
+            for target in rule.targets:
+                self.rules_by_target.setdefault(target, []).append(rule)
+
+    def rules_for(self, question_ids=None):
+        if question_ids is None:
+            return self.required_if
+        rules = set(chain.from_iterable(self.rules_by_target.get(question_id, ()) for question_id in question_ids))
+        return [rule for rule in self.required_if if rule in rules]
+
+    @classmethod
+    def for_content(cls, validator_cls, content):
+        try:
+            with cls._plans_lock:
+                plans = cls._plans.setdefault(content, {})
+        except TypeError:
+            # content that can't be weakly referenced can't be cached either
+            return cls(validator_cls, content)
+
+        if validator_cls not in plans:
+            plans[validator_cls] = cls(validator_cls, content)
+        return plans[validator_cls]
+
+
 class DeclarationValidator(object):
     email_validation_fields = []
     number_string_fields = []
     character_limit = None
     optional_fields = set([])
+    required_if = []
 
     def __init__(self, content, answers):
         self.content = content
         self.answers = answers
+        self._plan = None
+
+    @property
+    def plan(self):
+        if self._plan is None:
+            self._plan = ValidationPlan.for_content(type(self), self.content)
+        return self._plan
 
     def get_error_messages_for_page(self, section):
-        all_errors = self.get_error_messages()
-        page_ids = section.get_question_ids()
-        page_errors = ImmutableOrderedMultiDict(filter(lambda err: err[0] in page_ids, all_errors))
-        return page_errors
+        return ImmutableOrderedMultiDict(self.get_error_messages(section.get_question_ids()))
 
-    def get_error_messages(self):
-        raw_errors_map = self.errors()
+    def get_error_messages_for_pages(self, sections):
+        """Validates the whole declaration once and returns the errors for each of `sections`, in the same order."""
+        all_errors = self.get_error_messages()
+        pages_errors = []
+        for section in sections:
+            page_ids = set(section.get_question_ids())
+            pages_errors.append(ImmutableOrderedMultiDict(err for err in all_errors if err[0] in page_ids))
+        return pages_errors
+
+    def get_error_messages(self, question_ids=None):
+        raw_errors_map = self.errors(question_ids)
         errors_map = list()
         for question_id in self.all_fields():
             if question_id in raw_errors_map:
-                question_number = self.content.get_question(question_id).get('number')
+                question = self.plan.questions[question_id]
+                question_number = question.get('number')
                 validation_message = self.get_error_message(question_id, raw_errors_map[question_id])
                 errors_map.append((question_id, {
                     'input_name': question_id,
                     'question': "Question {}".format(question_number)
-                    if question_number else self.content.get_question(question_id).get('question'),
+                    if question_number else question.get('question'),
                     'message': validation_message,
                 }))
 
         return errors_map
 
     def get_error_message(self, question_id, message_key):
-        for validation in self.content.get_question(question_id).get('validations', []):
+        for validation in self.plan.questions[question_id].get('validations', []):
             if validation['name'] == message_key:
                 return validation['message']
         default_messages = {
@@ -63,67 +173,132 @@ class DeclarationValidator(object):
             message_key, 'There was a problem with the answer to this question')
 
     def all_fields(self):
-        return reduce(add, (section.get_question_ids() for section in self.content))
+        return list(self.plan.fields)
 
     def fields_with_values(self):
         return set(key for key, value in self.answers.items()
                    if value is not None and (not isinstance(value, six.string_types) or len(value) > 0))
 
-    def errors(self):
+    def errors(self, question_ids=None):
+        """Returns a dict of question id to error key. If `question_ids` is given only those questions are checked."""
+        question_ids = None if question_ids is None else set(question_ids)
         errors_map = {}
-        errors_map.update(self.character_limit_errors())
-        errors_map.update(self.formatting_errors(self.answers))
-        errors_map.update(self.answer_required_errors())
+        errors_map.update(self.character_limit_errors(question_ids))
+        errors_map.update(self.formatting_errors(self.answers, question_ids))
+        errors_map.update(self.answer_required_errors(question_ids))
         return errors_map
 
-    def answer_required_errors(self):
-        req_fields = self.get_required_fields()
+    def answer_required_errors(self, question_ids=None):
+        req_fields = self.get_required_fields(question_ids)
         filled_fields = self.fields_with_values()
         errors_map = {}
 
-        for field in req_fields - filled_fields:
+        for field in _only(req_fields - filled_fields, question_ids):
             errors_map[field] = 'answer_required'
 
         return errors_map
 
-    def character_limit_errors(self):
+    def character_limit_errors(self, question_ids=None):
         errors_map = {}
-        for question_id in self.all_fields():
-            if self.content.get_question(question_id).get('type') in ['text', 'textbox_large']:
-                answer = self.answers.get(question_id) or ''
-                if self.character_limit is not None and len(answer) > self.character_limit:
-                    errors_map[question_id] = "under_character_limit"
+        if self.character_limit is None:
+            return errors_map
+
+        for question_id in _only(self.plan.text_fields, question_ids):
+            answer = self.answers.get(question_id) or ''
+            if len(answer) > self.character_limit:
+                errors_map[question_id] = "under_character_limit"
 
         return errors_map
 
-    def formatting_errors(self, answers):
+    def formatting_errors(self, answers, question_ids=None):
         errors_map = {}
-        if self.email_validation_fields is not None and len(self.email_validation_fields) > 0:
-            for field in self.email_validation_fields:
-                if self.answers.get(field) is None or not re.match(EMAIL_REGEX, self.answers.get(field, '')):
-                    errors_map[field] = 'invalid_format'
-
-        if self.number_string_fields is not None and len(self.number_string_fields) > 0:
-            for field, length in self.number_string_fields:
-                if self.answers.get(field) is None or not re.match(
-                        '^\d{{{0}}}$'.format(length), self.answers.get(field, '')
-                ):
-                    errors_map[field] = 'invalid_format'
+        for field in _only(self.email_validation_fields or [], question_ids):
+            if self.answers.get(field) is None or not EMAIL_RE.match(self.answers.get(field, '')):
+                errors_map[field] = 'invalid_format'
+
+        for field, pattern in self.plan.number_string_fields:
+            if question_ids is not None and field not in question_ids:
+                continue
+            if self.answers.get(field) is None or not pattern.match(self.answers.get(field, '')):
+                errors_map[field] = 'invalid_format'
         return errors_map
 
-    def get_required_fields(self):
-        try:
-            req_fields = self.required_fields
-        except AttributeError:
-            req_fields = set(self.all_fields())
+    def get_required_fields(self, question_ids=None):
+        """The questions that must be answered. If `question_ids` is given, only the conditional requirements for those
+        questions are checked."""
+        req_fields = set(self.plan.default_required_fields)
 
         #  Remove optional fields
         if self.optional_fields is not None:
             req_fields -= set(self.optional_fields)
 
+        # Add back the ones made required by the other answers
+        for rule in self.plan.rules_for(question_ids):
+            if rule.applies(self.answers):
+                req_fields.update(rule.targets)
+
         return req_fields
 
 
+def _only(fields, question_ids):
+    if question_ids is None:
+        return fields
+    return [field for field in fields if field in question_ids]
+
+
+G7_REQUIRED_IF = [
+    #  If you answered other to question 19 (trading status)
+    RequiredIf(['SQ1-1cii'], any_of=[('SQ1-1ci', is_one_of('other (please specify)'))]),
+    #  If you answered yes to question 27 (non-UK business registered in EU)
+    RequiredIf(['SQ1-1i-ii'], any_of=[('SQ1-1i-i', is_truthy)]),
+    #  If you answered 'licensed' or 'a member of a relevant organisation' in question 29
+    RequiredIf(['SQ1-1j-ii'], any_of=[
+        ('SQ1-1j-i', includes_any_of('licensed', 'a member of a relevant organisation')),
+    ]),
+    # If you answered yes to either question 53 or 54 (tax returns)
+    RequiredIf(['SQ4-1c'], any_of=any_truthy(['SQ4-1a', 'SQ4-1b'])),
+    # If you answered Yes to questions 39 - 51 (discretionary exclusion)
+    RequiredIf(['SQ3-1k'], any_of=any_truthy([
+        'SQ2-2a', 'SQ3-1a', 'SQ3-1b', 'SQ3-1c', 'SQ3-1d', 'SQ3-1e', 'SQ3-1f', 'SQ3-1g',
+        'SQ3-1h-i', 'SQ3-1h-ii', 'SQ3-1i-i', 'SQ3-1i-ii', 'SQ3-1j'
+    ])),
+    # If you answered No to question 26 (established in the UK)
+    RequiredIf(['SQ1-1i-i', 'SQ1-1j-i'], any_of=[('SQ5-2a', is_falsy)]),
+]
+
+DOS_REQUIRED_IF = [
+    # If you responded yes to any of questions 22 to 34
+    RequiredIf(['mitigatingFactors'], any_of=any_truthy([
+        'misleadingInformation', 'confidentialInformation', 'influencedContractingAuthority',
+        'witheldSupportingDocuments', 'seriousMisrepresentation', 'significantOrPersistentDeficiencies',
+        'distortedCompetition', 'conflictOfInterest', 'distortingCompetition', 'graveProfessionalMisconduct',
+        'bankrupt', 'environmentalSocialLabourLaw', 'taxEvasion'
+    ])),
+    # If you responded yes to either 36 or 37
+    RequiredIf(['mitigatingFactors2'], any_of=any_truthy(["unspentTaxConvictions", "GAAR"])),
+    # Describe your trading status
+    RequiredIf(['tradingStatusOther'], any_of=[('tradingStatus', is_one_of("other (please specify)"))]),
+    # If your company was not established in the UK
+    RequiredIf(
+        ['appropriateTradeRegisters', 'licenceOrMemberRequired'],
+        all_of=[('establishedInTheUK', is_exactly(False))],
+    ),
+    # If yes to appropriate trade registers
+    RequiredIf(
+        ['appropriateTradeRegistersNumber'],
+        all_of=[('establishedInTheUK', is_exactly(False)), ('appropriateTradeRegisters', is_exactly(True))],
+    ),
+    # If not 'none of the above' to licenceOrMemberRequired
+    RequiredIf(
+        ['licenceOrMemberRequiredDetails'],
+        all_of=[
+            ('establishedInTheUK', is_exactly(False)),
+            ('licenceOrMemberRequired', is_one_of('licensed', 'a member of a relevant organisation')),
+        ],
+    ),
+]
+
+
 class G7Validator(DeclarationValidator):
     """
     Validator for G-Cloud 7.
@@ -135,42 +310,7 @@ class G7Validator(DeclarationValidator):
     ])
     email_validation_fields = set(['SQ1-1o', 'SQ1-2b'])
     character_limit = 5000
-
-    def get_required_fields(self):
-        req_fields = super(G7Validator, self).get_required_fields()
-
-        #  If you answered other to question 19 (trading status)
-        if self.answers.get('SQ1-1ci') == 'other (please specify)':
-            req_fields.add('SQ1-1cii')
-
-        #  If you answered yes to question 27 (non-UK business registered in EU)
-        if self.answers.get('SQ1-1i-i', False):
-            req_fields.add('SQ1-1i-ii')
-
-        #  If you answered 'licensed' or 'a member of a relevant organisation' in question 29
-        answer_29 = self.answers.get('SQ1-1j-i', [])
-        if answer_29 and len(answer_29) > 0 and \
-                ('licensed' in answer_29 or 'a member of a relevant organisation' in answer_29):
-                req_fields.add('SQ1-1j-ii')
-
-        # If you answered yes to either question 53 or 54 (tax returns)
-        if self.answers.get('SQ4-1a', False) or self.answers.get('SQ4-1b', False):
-            req_fields.add('SQ4-1c')
-
-        # If you answered Yes to questions 39 - 51 (discretionary exclusion)
-        dependent_fields = [
-            'SQ2-2a', 'SQ3-1a', 'SQ3-1b', 'SQ3-1c', 'SQ3-1d', 'SQ3-1e', 'SQ3-1f', 'SQ3-1g',
-            'SQ3-1h-i', 'SQ3-1h-ii', 'SQ3-1i-i', 'SQ3-1i-ii', 'SQ3-1j'
-        ]
-        if any(self.answers.get(field) for field in dependent_fields):
-            req_fields.add('SQ3-1k')
-
-        # If you answered No to question 26 (established in the UK)
-        if 'SQ5-2a' in self.answers and not self.answers['SQ5-2a']:
-            req_fields.add('SQ1-1i-i')
-            req_fields.add('SQ1-1j-i')
-
-        return req_fields
+    required_if = G7_REQUIRED_IF
 
 
 class DOSValidator(DeclarationValidator):
@@ -182,44 +322,7 @@ class DOSValidator(DeclarationValidator):
     ])
     email_validation_fields = set(["contactEmailContractNotice", "primaryContactEmail"])
     character_limit = 5000
-
-    def get_required_fields(self):
-        req_fields = super(DOSValidator, self).get_required_fields()
-
-        dependent_fields = {
-            # If you responded yes to any of questions 22 to 34
-            "mitigatingFactors": [
-                'misleadingInformation', 'confidentialInformation', 'influencedContractingAuthority',
-                'witheldSupportingDocuments', 'seriousMisrepresentation', 'significantOrPersistentDeficiencies',
-                'distortedCompetition', 'conflictOfInterest', 'distortingCompetition', 'graveProfessionalMisconduct',
-                'bankrupt', 'environmentalSocialLabourLaw', 'taxEvasion'
-            ],
-            # If you responded yes to either 36 or 37
-            "mitigatingFactors2": [
-                "unspentTaxConvictions", "GAAR"
-            ],
-        }
-        for target_field, fields in dependent_fields.items():
-            if any(self.answers.get(field) for field in fields):
-                req_fields.add(target_field)
-
-        # Describe your trading status
-        if self.answers.get('tradingStatus') == "other (please specify)":
-            req_fields.add('tradingStatusOther')
-
-        # If your company was not established in the UK
-        if self.answers.get('establishedInTheUK') is False:
-            req_fields.add('appropriateTradeRegisters')
-            # If yes to appropriate trade registers
-            if self.answers.get('appropriateTradeRegisters') is True:
-                req_fields.add('appropriateTradeRegistersNumber')
-
-            req_fields.add('licenceOrMemberRequired')
-            # If not 'none of the above' to licenceOrMemberRequired
-            if self.answers.get('licenceOrMemberRequired') in ['licensed', 'a member of a relevant organisation']:
-                req_fields.add('licenceOrMemberRequiredDetails')
-
-        return req_fields
+    required_if = DOS_REQUIRED_IF
 
 
 class G8Validator(DOSValidator):
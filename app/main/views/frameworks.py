@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from collections import OrderedDict
+from functools import partial
 from itertools import chain
 
 from dateutil.parser import parse as date_parse
@@ -11,67 +12,87 @@ import six
 
 from dmapiclient import APIError
 from dmapiclient.audit import AuditTypes
-from dmutils.email import send_email
 from dmutils.email.exceptions import EmailError
 from dmcontent.formats import format_service_price
 from dmcontent.questions import ContentQuestion
 from dmcontent.errors import ContentNotFoundError
 from dmutils.formats import datetimeformat
-from dmutils import s3
 from dmutils.documents import (
     RESULT_LETTER_FILENAME, AGREEMENT_FILENAME, SIGNED_AGREEMENT_PREFIX, SIGNED_SIGNATURE_PAGE_PREFIX,
     SIGNATURE_PAGE_FILENAME, get_document_path, generate_timestamped_document_upload_path,
-    degenerate_document_path_and_return_doc_name, get_signed_url, get_extension, file_is_less_than_5mb,
+    degenerate_document_path_and_return_doc_name, get_extension, file_is_less_than_5mb,
     file_is_empty, file_is_image, file_is_pdf, sanitise_supplier_name
 )
 
-from ... import data_api_client, flask_featureflags
+from ... import buckets, data_api_client, flask_featureflags
+from ...instrumentation import instrumentation
 from ...main import main, content_loader
 from ..helpers import hash_email, login_required
 from ..helpers.frameworks import (
-    get_declaration_status, get_last_modified_from_first_matching_file, register_interest_in_framework,
+    get_declaration_status, register_interest_in_framework,
     get_supplier_on_framework_from_info, get_declaration_status_from_info, get_supplier_framework_info,
-    get_framework, get_framework_and_lot, count_drafts_by_lot, get_statuses_for_lot,
+    get_framework, get_framework_and_lot, get_statuses_for_lot,
     return_supplier_framework_info_if_on_framework_or_abort, returned_agreement_email_recipients,
-    check_agreement_is_related_to_supplier_framework_or_abort, get_framework_for_reuse,
+    check_agreement_is_related_to_supplier_framework_or_abort, get_framework_for_reuse, application_started_emails,
 )
+from ..helpers.communications import communications_index
+from ..helpers.concurrency import fetch_concurrently
+from ..helpers.etags import check_etag
+from ..helpers.outbox import send_email
 from ..helpers.validation import get_validator
 from ..helpers.services import (
-    get_signed_document_url, get_drafts, get_lot_drafts, count_unanswered_questions
+    get_signed_document_url, DraftIndex, count_unanswered_questions_for_drafts, paginate
 )
 from ..forms.frameworks import SignerDetailsForm, ContractReviewForm, AcceptAgreementVariationForm, ReuseDeclarationForm
 
 CLARIFICATION_QUESTION_NAME = 'clarification_question'
 
 
+def send_application_started_email(framework_slug, framework):
+    supplier_users = data_api_client.find_users(supplier_id=current_user.supplier_id)
+
+    try:
+        send_email(
+            [user['emailAddress'] for user in supplier_users['users'] if user['active']],
+            application_started_emails.body(framework_slug),
+            current_app.config['DM_MANDRILL_API_KEY'],
+            'You started a {} application'.format(framework['name']),
+            current_app.config['CLARIFICATION_EMAIL_FROM'],
+            current_app.config['CLARIFICATION_EMAIL_NAME'],
+            ['{}-application-started'.format(framework_slug)]
+        )
+    except EmailError as e:
+        application_started_emails.forget(framework_slug, current_user.supplier_id)
+        current_app.logger.error(
+            "Application started email failed to send: {error}, supplier_id: {supplier_id}",
+            extra={'error': six.text_type(e), 'supplier_id': current_user.supplier_id}
+        )
+
+
 @main.route('/frameworks/<framework_slug>', methods=['GET', 'POST'])
 @login_required
 def framework_dashboard(framework_slug):
-    framework = get_framework(data_api_client, framework_slug)
+    # the framework comes first, so that if it doesn't exist its 404 wins over whatever the other fetches raise
+    fetches = OrderedDict()
     if request.method == 'POST':
+        # we need to know the framework is one we can register interest in before we do so
+        framework = get_framework(data_api_client, framework_slug)
         register_interest_in_framework(data_api_client, framework_slug)
-        supplier_users = data_api_client.find_users(supplier_id=current_user.supplier_id)
-
-        try:
-            email_body = render_template('emails/{}_application_started.html'.format(framework_slug))
-            send_email(
-                [user['emailAddress'] for user in supplier_users['users'] if user['active']],
-                email_body,
-                current_app.config['DM_MANDRILL_API_KEY'],
-                'You started a {} application'.format(framework['name']),
-                current_app.config['CLARIFICATION_EMAIL_FROM'],
-                current_app.config['CLARIFICATION_EMAIL_NAME'],
-                ['{}-application-started'.format(framework_slug)]
-            )
-        except EmailError as e:
-            current_app.logger.error(
-                "Application started email failed to send: {error}, supplier_id: {supplier_id}",
-                extra={'error': six.text_type(e), 'supplier_id': current_user.supplier_id}
-            )
-
-    drafts, complete_drafts = get_drafts(data_api_client, framework_slug)
+        if application_started_emails.should_send(framework_slug, current_user.supplier_id):
+            send_application_started_email(framework_slug, framework)
+    else:
+        fetches['framework'] = partial(get_framework, data_api_client, framework_slug)
+    fetches['drafts'] = partial(DraftIndex.fetch, data_api_client, framework_slug, counts_only=True)
+    fetches['supplier_framework_info'] = partial(get_supplier_framework_info, data_api_client, framework_slug)
+    fetches['communications'] = partial(communications_index.get, framework_slug)
+
+    fetched = fetch_concurrently(**fetches)
+    if 'framework' in fetched:
+        framework = fetched['framework']
+    drafts = fetched['drafts']
+    supplier_framework_info = fetched['supplier_framework_info']
+    communications = fetched['communications']
 
-    supplier_framework_info = get_supplier_framework_info(data_api_client, framework_slug)
     declaration_status = get_declaration_status_from_info(supplier_framework_info)
     supplier_is_on_framework = get_supplier_on_framework_from_info(supplier_framework_info)
 
@@ -79,8 +100,10 @@ def framework_dashboard(framework_slug):
     if declaration_status == 'unstarted' and framework['status'] == 'live':
         abort(404)
 
-    application_made = supplier_is_on_framework or (len(complete_drafts) > 0 and declaration_status == 'complete')
-    lots_with_completed_drafts = [lot for lot in framework['lots'] if count_drafts_by_lot(complete_drafts, lot['slug'])]
+    application_made = supplier_is_on_framework or (
+        drafts.count(complete=True) > 0 and declaration_status == 'complete'
+    )
+    lots_with_completed_drafts = [lot for lot in framework['lots'] if drafts.count(lot['slug'], complete=True)]
 
     framework_dates = content_loader.get_message(framework_slug, 'dates')
     framework_urls = content_loader.get_message(framework_slug, 'urls')
@@ -105,63 +128,20 @@ def framework_dashboard(framework_slug):
             supplier_framework_info['agreementPath']
         )
 
-    key_list = s3.S3(current_app.config['DM_COMMUNICATIONS_BUCKET']).list(framework_slug, load_timestamps=True)
-    key_list.reverse()
-
-    base_communications_files = {
-        "invitation": {
-            "path": "communications/",
-            "filename": "{}-invitation.pdf".format(framework_slug),
-        },
-        "proposed_agreement": {
-            "path": "communications/",
-            "filename": "{}-proposed-framework-agreement.pdf".format(framework_slug),
-        },
-        "final_agreement": {
-            "path": "communications/",
-            "filename": "{}-final-framework-agreement.pdf".format(framework_slug),
-        },
-        "proposed_call_off": {
-            "path": "communications/",
-            "filename": "{}-proposed-call-off.pdf".format(framework_slug),
-        },
-        "final_call_off": {
-            "path": "communications/",
-            "filename": "{}-final-call-off.pdf".format(framework_slug),
-        },
-        "reporting_template": {
-            "path": "communications/",
-            "filename": "{}-reporting-template.xls".format(framework_slug),
-        },
-        "supplier_updates": {
-            "path": "communications/updates/",
-        },
-    }
-    # now we annotate these with last_modified information which also tells us whether the file exists
-    communications_files = {
-        label: dict(
-            d,
-            last_modified=get_last_modified_from_first_matching_file(
-                key_list,
-                framework_slug,
-                d["path"] + d.get("filename", ""),
-            ),
-        )
-        for label, d in six.iteritems(base_communications_files)
-    }
+    communications_files = communications.communications_files()
 
     return render_template(
         "frameworks/dashboard.html",
         application_made=application_made,
         communications_files=communications_files,
         completed_lots=tuple(
-            dict(lot, complete_count=count_drafts_by_lot(complete_drafts, lot['slug']))
+            dict(lot, complete_count=drafts.count(lot['slug'], complete=True))
             for lot in lots_with_completed_drafts
         ),
         countersigned_agreement_file=countersigned_agreement_file,
         counts={
-            "draft": len(drafts),
-            "complete": len(complete_drafts)
+            "draft": drafts.count(),
+            "complete": drafts.count(complete=True)
         },
         declaration_status=declaration_status,
         signed_agreement_document_name=signed_agreement_document_name,
@@ -180,18 +160,17 @@ def framework_dashboard(framework_slug):
 def framework_submission_lots(framework_slug):
     framework = get_framework(data_api_client, framework_slug)
 
-    drafts, complete_drafts = get_drafts(data_api_client, framework_slug)
+    drafts = DraftIndex.fetch(data_api_client, framework_slug, counts_only=True)
+    complete_count = drafts.count(complete=True)
     declaration_status = get_declaration_status(data_api_client, framework_slug)
-    application_made = len(complete_drafts) > 0 and declaration_status == 'complete'
+    application_made = complete_count > 0 and declaration_status == 'complete'
     if framework['status'] not in ["open", "pending", "standstill"]:
         abort(404)
     if framework['status'] == 'pending' and not application_made:
         abort(404)
 
     lots = [
-        dict(lot,
-             draft_count=count_drafts_by_lot(drafts, lot['slug']),
-             complete_count=count_drafts_by_lot(complete_drafts, lot['slug']))
+        dict(lot, draft_count=drafts.count(lot['slug']), complete_count=drafts.count(lot['slug'], complete=True))
         for lot in framework['lots']]
 
     lot_question = {
@@ -217,8 +196,7 @@ def framework_submission_lots(framework_slug):
 
     return render_template(
         "frameworks/submission_lots.html",
-        complete_drafts=list(reversed(complete_drafts)),
-        drafts=list(reversed(drafts)),
+        complete_count=complete_count,
         declaration_status=declaration_status,
         framework=framework,
         lots=lots,
@@ -230,7 +208,8 @@ def framework_submission_lots(framework_slug):
 def framework_submission_services(framework_slug, lot_slug):
     framework, lot = get_framework_and_lot(data_api_client, framework_slug, lot_slug)
 
-    drafts, complete_drafts = get_lot_drafts(data_api_client, framework_slug, lot_slug)
+    draft_index = DraftIndex.fetch(data_api_client, framework_slug)
+    drafts, complete_drafts = draft_index.drafts(lot_slug), draft_index.drafts(lot_slug, complete=True)
     declaration_status = get_declaration_status(data_api_client, framework_slug)
     if framework['status'] == 'pending' and declaration_status != 'complete':
         abort(404)
@@ -247,24 +226,36 @@ def framework_submission_services(framework_slug, lot_slug):
                     framework_slug=framework_slug, lot_slug=lot_slug, service_id=draft['id'])
         )
 
+    # the two lists are paged through separately, as a supplier may have many more of one than the other
+    page = request.args.get('page', 1, type=int)
+    complete_page = request.args.get('complete_page', 1, type=int)
+    per_page = current_app.config['DM_DRAFTS_PER_PAGE']
+    complete_count = len(complete_drafts)
+    # newest first, as the API lists drafts in the order they were created
+    drafts, more_drafts = paginate(drafts[::-1], page, per_page)
+    complete_drafts, more_complete_drafts = paginate(complete_drafts[::-1], complete_page, per_page)
+    if min(page, complete_page) < 1 or (page > 1 and not drafts) or (complete_page > 1 and not complete_drafts):
+        abort(404)
+
+    # only the drafts on this page are shown, so there's no need to work out the rest of them
     for draft in chain(drafts, complete_drafts):
         draft['priceString'] = format_service_price(draft)
-        content = content_loader.get_manifest(framework_slug, 'edit_submission').filter(draft)
-        sections = content.summary(draft)
-
-        unanswered_required, unanswered_optional = count_unanswered_questions(sections)
-        draft.update({
-            'unanswered_required': unanswered_required,
-            'unanswered_optional': unanswered_optional,
-        })
+    count_unanswered_questions_for_drafts(content_loader, framework_slug, drafts + complete_drafts)
 
     return render_template(
         "frameworks/services.html",
-        complete_drafts=list(reversed(complete_drafts)),
-        drafts=list(reversed(drafts)),
+        complete_drafts=complete_drafts,
+        complete_count=complete_count,
+        drafts=drafts,
         declaration_status=declaration_status,
         framework=framework,
         lot=lot,
+        page=page,
+        complete_page=complete_page,
+        previous_page_number=page - 1 if page > 1 else None,
+        next_page_number=page + 1 if more_drafts else None,
+        previous_complete_page_number=complete_page - 1 if complete_page > 1 else None,
+        next_complete_page_number=complete_page + 1 if more_complete_drafts else None,
     ), 200
 
 
@@ -405,26 +396,24 @@ def framework_supplier_declaration_overview(framework_slug):
         abort(410)
 
     try:
-        content = content_loader.get_manifest(framework_slug, 'declaration').filter(sf["declaration"])
+        content = content_loader.filter_manifest(framework_slug, 'declaration', sf["declaration"])
     except ContentNotFoundError:
         abort(404)
 
+    not_modified = check_etag(framework, sf)
+    if not_modified:
+        return not_modified
+
     # generate an (ordered) dict of the form {section_slug: (section, section_errors)}.
     # we must perform an actual validation for each section rather than rely on .answer_required as the latter won't
-    # take into account declarations custom question dependencies
+    # take into account declarations custom question dependencies. The whole declaration is validated in one go and
+    # the errors shared out between the sections.
+    with instrumentation.timer('content', 'summary'):
+        sections = list(content.summary(sf["declaration"]))
+    pages_errors = get_validator(framework, content, sf["declaration"]).get_error_messages_for_pages(sections)
     sections_errors = OrderedDict(
-        (
-            section.slug,
-            (
-                section,
-                section.editable and get_validator(
-                    framework,
-                    content,
-                    sf["declaration"],
-                ).get_error_messages_for_page(section),
-            ),
-        )
-        for section in content.summary(sf["declaration"])
+        (section.slug, (section, section.editable and page_errors))
+        for section, page_errors in zip(sections, pages_errors)
     )
 
     return render_template(
@@ -446,7 +435,7 @@ def framework_supplier_declaration_submit(framework_slug):
     # ensure our declaration is at least a dict
     sf["declaration"] = sf.get("declaration") or {}
 
-    content = content_loader.get_manifest(framework_slug, 'declaration').filter(sf["declaration"])
+    content = content_loader.filter_manifest(framework_slug, 'declaration', sf["declaration"])
 
     validator = get_validator(framework, content, sf["declaration"])
     errors = validator.get_error_messages()
@@ -479,7 +468,7 @@ def framework_supplier_declaration_submit(framework_slug):
 def framework_supplier_declaration_edit(framework_slug, section_id):
     framework = get_framework(data_api_client, framework_slug, allowed_statuses=['open'])
 
-    content = content_loader.get_manifest(framework_slug, 'declaration').filter({})
+    content = content_loader.filter_manifest(framework_slug, 'declaration', {})
     status_code = 200
 
     # Get and check the current section.
@@ -571,7 +560,7 @@ def framework_supplier_declaration_edit(framework_slug, section_id):
 @main.route('/frameworks/<framework_slug>/files/<path:filepath>', methods=['GET'])
 @login_required
 def download_supplier_file(framework_slug, filepath):
-    uploader = s3.S3(current_app.config['DM_COMMUNICATIONS_BUCKET'])
+    uploader = buckets.get('communications')
     url = get_signed_document_url(uploader, "{}/communications/{}".format(framework_slug, filepath))
     if not url:
         abort(404)
@@ -586,9 +575,9 @@ def download_agreement_file(framework_slug, document_name):
     if supplier_framework_info is None or not supplier_framework_info.get("declaration"):
         abort(404)
 
-    agreements_bucket = s3.S3(current_app.config['DM_AGREEMENTS_BUCKET'])
+    agreements_bucket = buckets.get('agreements')
     path = get_document_path(framework_slug, current_user.supplier_id, 'agreements', document_name)
-    url = get_signed_url(agreements_bucket, path, current_app.config['DM_ASSETS_URL'])
+    url = get_signed_document_url(agreements_bucket, path)
     if not url:
         abort(404)
 
@@ -606,16 +595,11 @@ def framework_updates(framework_slug, error_message=None, default_textbox_value=
                                    'user_id': current_user.id,
                                    'supplier_id': current_user.supplier_id})
 
-    communications_bucket = s3.S3(current_app.config['DM_COMMUNICATIONS_BUCKET'])
-    file_list = communications_bucket.list('{}/communications/updates/'.format(framework_slug), load_timestamps=True)
-    files = {
-        'communications': [],
-        'clarifications': [],
-    }
-    for file in file_list:
-        path_parts = file['path'].split('/')
-        file['path'] = '/'.join(path_parts[2:])
-        files[path_parts[3]].append(file)
+    files = communications_index.get(framework_slug).updates_files()
+
+    not_modified = check_etag(framework, supplier_framework_info, files)
+    if not_modified:
+        return not_modified
 
     return render_template(
         "frameworks/updates.html",
@@ -671,6 +655,7 @@ def framework_updates_email_clarification_question(framework_slug):
         )
         tags = ["application-question"]
     try:
+        # the supplier needs to know if their question didn't reach us, so wait for it to actually be sent
         send_email(
             to_address,
             email_body,
@@ -680,7 +665,7 @@ def framework_updates_email_clarification_question(framework_slug):
             "{} Supplier".format(framework['name']),
             tags,
             reply_to=from_address,
-        )
+        ).wait(current_app.config['DM_EMAIL_OUTBOX_WAIT_TIMEOUT'])
     except EmailError as e:
         current_app.logger.error(
             "{framework} clarification question email failed to send. "
@@ -740,8 +725,13 @@ def framework_updates_email_clarification_question(framework_slug):
 @main.route('/frameworks/<framework_slug>/agreement', methods=['GET'])
 @login_required
 def framework_agreement(framework_slug):
-    framework = get_framework(data_api_client, framework_slug, allowed_statuses=['standstill', 'live'])
-    supplier_framework = return_supplier_framework_info_if_on_framework_or_abort(data_api_client, framework_slug)
+    fetched = fetch_concurrently(
+        framework=partial(get_framework, data_api_client, framework_slug, allowed_statuses=['standstill', 'live']),
+        supplier_framework=partial(
+            return_supplier_framework_info_if_on_framework_or_abort, data_api_client, framework_slug
+        ),
+    )
+    framework, supplier_framework = fetched['framework'], fetched['supplier_framework']
 
     if supplier_framework['agreementReturned']:
         supplier_framework['agreementReturnedAt'] = datetimeformat(
@@ -750,20 +740,7 @@ def framework_agreement(framework_slug):
 
     # if there's a frameworkAgreementVersion key, it means we're on G-Cloud 8 or higher
     if framework.get('frameworkAgreementVersion'):
-        def lot_result(drafts_for_lot):
-            if any(draft['status'] == 'submitted' for draft in drafts_for_lot):
-                return 'Successful'
-            elif any(draft['status'] == 'failed' for draft in drafts_for_lot):
-                return 'Unsuccessful'
-            else:
-                return 'No application'
-
-        drafts, complete_drafts = get_drafts(data_api_client, framework_slug)
-        complete_drafts_by_lot = {
-            lot['slug']: [draft for draft in complete_drafts if draft['lotSlug'] == lot['slug']]
-            for lot in framework['lots']
-        }
-        lot_results = {k: lot_result(v) for k, v in complete_drafts_by_lot.items()}
+        drafts = DraftIndex.fetch(data_api_client, framework_slug, counts_only=True)
 
         return render_template(
             'frameworks/contract_start.html',
@@ -772,7 +749,7 @@ def framework_agreement(framework_slug):
             framework_urls=content_loader.get_message(framework_slug, 'urls'),
             lots=[{
                 'name': lot['name'],
-                'result': lot_results[lot['slug']]
+                'result': drafts.lot_result(lot['slug'])
             } for lot in framework['lots']],
             supplier_framework=supplier_framework,
         ), 200
@@ -813,7 +790,7 @@ def upload_framework_agreement(framework_slug):
             agreement_filename=AGREEMENT_FILENAME,
         ), 400
 
-    agreements_bucket = s3.S3(current_app.config['DM_AGREEMENTS_BUCKET'])
+    agreements_bucket = buckets.get('agreements')
     extension = get_extension(request.files['agreement'].filename)
 
     path = generate_timestamped_document_upload_path(
@@ -958,7 +935,7 @@ def signature_upload(framework_slug, agreement_id):
     agreement = data_api_client.get_framework_agreement(agreement_id)['agreement']
     check_agreement_is_related_to_supplier_framework_or_abort(agreement, supplier_framework)
 
-    agreements_bucket = s3.S3(current_app.config['DM_AGREEMENTS_BUCKET'])
+    agreements_bucket = buckets.get('agreements')
     agreement_path = agreement.get('signedAgreementPath')
     signature_page = agreements_bucket.get_key(agreement_path) if agreement_path else None
     upload_error = None
@@ -1032,7 +1009,7 @@ def contract_review(framework_slug, agreement_id):
     ):
         abort(404)
 
-    agreements_bucket = s3.S3(current_app.config['DM_AGREEMENTS_BUCKET'])
+    agreements_bucket = buckets.get('agreements')
     signature_page = agreements_bucket.get_key(agreement['signedAgreementPath'])
 
     form = ContractReviewForm()
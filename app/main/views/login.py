@@ -4,12 +4,13 @@ from flask_login import current_user
 from flask import current_app, flash, redirect, render_template, url_for, abort
 
 from dmapiclient.audit import AuditTypes
-from dmutils.email import generate_token, send_email
+from dmutils.email import generate_token
 from dmutils.email.exceptions import EmailError
 
 from .. import main
 from ..forms.auth_forms import EmailAddressForm
 from ..helpers import hash_email, login_required
+from ..helpers.outbox import send_email
 from ... import data_api_client
 
 
@@ -1,9 +1,11 @@
 from flask_login import current_user
-from flask import render_template, request, redirect, url_for, abort, flash, current_app
+from flask import render_template, request, redirect, url_for, abort, flash
 
-from ... import data_api_client, flask_featureflags
+from ... import buckets, data_api_client, flask_featureflags
+from ...instrumentation import instrumentation
 from ...main import main, content_loader
 from ..helpers import login_required
+from ..helpers.etags import check_etag
 from ..helpers.services import is_service_associated_with_supplier, get_signed_document_url, count_unanswered_questions
 from ..helpers.frameworks import (
     get_framework_and_lot,
@@ -14,7 +16,6 @@ from ..helpers.frameworks import (
 
 from dmcontent.content_loader import ContentNotFoundError
 from dmapiclient import HTTPError
-from dmutils import s3
 from dmutils.documents import upload_service_documents
 
 
@@ -28,6 +29,10 @@ def list_services(framework_slug):
         framework=framework_slug,
     )["services"]
 
+    not_modified = check_etag(framework, suppliers_services)
+    if not_modified:
+        return not_modified
+
     return render_template(
         "services/list_services.html",
         services=suppliers_services,
@@ -54,18 +59,21 @@ def edit_service(framework_slug, service_id):
     framework = data_api_client.get_framework(service['frameworkSlug'])['frameworks']
 
     try:
-        content = content_loader.get_manifest(framework['slug'], 'edit_service').filter(service)
+        content = content_loader.filter_manifest(framework['slug'], 'edit_service', service)
     except ContentNotFoundError:
         abort(404)
     remove_requested = bool(request.args.get('remove_requested'))
 
+    with instrumentation.timer('content', 'summary'):
+        sections = content.summary(service)
+
     return render_template(
         "services/service.html",
         service_id=service.get('id'),
         service_data=service,
         service_unavailability_information=service_unavailability_information,
         framework=framework,
-        sections=content.summary(service),
+        sections=sections,
         remove_requested=remove_requested,
     )
 
@@ -137,7 +145,7 @@ def edit_section(framework_slug, service_id, section_id):
         abort(404)
 
     try:
-        content = content_loader.get_manifest(service["frameworkSlug"], 'edit_service').filter(service)
+        content = content_loader.filter_manifest(service["frameworkSlug"], 'edit_service', service)
     except ContentNotFoundError:
         abort(404)
     section = content.get_section(section_id)
@@ -171,7 +179,7 @@ def update_section(framework_slug, service_id, section_id):
         abort(404)
 
     try:
-        content = content_loader.get_manifest(service["frameworkSlug"], 'edit_service').filter(service)
+        content = content_loader.filter_manifest(service["frameworkSlug"], 'edit_service', service)
     except ContentNotFoundError:
         abort(404)
     section = content.get_section(section_id)
@@ -242,9 +250,7 @@ def start_new_draft_service(framework_slug, lot_slug):
     if not get_supplier_framework_info(data_api_client, framework_slug):
         abort(404)
 
-    content = content_loader.get_manifest(framework_slug, 'edit_submission').filter(
-        {'lot': lot['slug']}
-    )
+    content = content_loader.filter_manifest(framework_slug, 'edit_submission', {'lot': lot['slug']})
 
     section = content.get_section(content.get_next_editable_section_id())
     if section is None:
@@ -310,9 +316,7 @@ def copy_draft_service(framework_slug, lot_slug, service_id):
     if not is_service_associated_with_supplier(draft):
         abort(404)
 
-    content = content_loader.get_manifest(framework_slug, 'edit_submission').filter(
-        {'lot': lot['slug']}
-    )
+    content = content_loader.filter_manifest(framework_slug, 'edit_submission', {'lot': lot['slug']})
 
     draft_copy = data_api_client.copy_draft_service(
         service_id,
@@ -423,7 +427,7 @@ def service_submission_document(framework_slug, supplier_id, document_name):
     if current_user.supplier_id != supplier_id:
         abort(404)
 
-    uploader = s3.S3(current_app.config['DM_SUBMISSIONS_BUCKET'])
+    uploader = buckets.get('submissions')
     s3_url = get_signed_document_url(uploader,
                                      "{}/submissions/{}/{}".format(framework_slug, supplier_id, document_name))
     if not s3_url:
@@ -449,9 +453,10 @@ def view_service_submission(framework_slug, lot_slug, service_id):
     if not is_service_associated_with_supplier(draft):
         abort(404)
 
-    content = content_loader.get_manifest(framework['slug'], 'edit_submission').filter(draft)
+    content = content_loader.filter_manifest(framework['slug'], 'edit_submission', draft)
 
-    sections = content.summary(draft)
+    with instrumentation.timer('content', 'summary'):
+        sections = content.summary(draft)
 
     unanswered_required, unanswered_optional = count_unanswered_questions(sections)
     delete_requested = True if request.args.get('delete_requested') else False
@@ -506,7 +511,7 @@ def edit_service_submission(framework_slug, lot_slug, service_id, section_id, qu
     if not is_service_associated_with_supplier(draft):
         abort(404)
 
-    content = content_loader.get_manifest(framework_slug, 'edit_submission').filter(draft)
+    content = content_loader.filter_manifest(framework_slug, 'edit_submission', draft)
     section = content.get_section(section_id)
     if section and (question_slug is not None):
         next_question = section.get_question_by_slug(section.get_next_question_slug(question_slug))
@@ -520,7 +525,7 @@ def edit_service_submission(framework_slug, lot_slug, service_id, section_id, qu
         update_data = section.get_data(request.form)
 
         if request.files:
-            uploader = s3.S3(current_app.config['DM_SUBMISSIONS_BUCKET'])
+            uploader = buckets.get('submissions')
             documents_url = url_for('.dashboard', _external=True) + '/assets/'
             uploaded_documents, document_errors = upload_service_documents(
                 uploader, 'submissions', documents_url, draft, request.files, section,
@@ -595,7 +600,7 @@ def remove_subsection(framework_slug, lot_slug, service_id, section_id, question
     if not is_service_associated_with_supplier(draft):
         abort(404)
 
-    content = content_loader.get_manifest(framework_slug, 'edit_submission').filter(draft)
+    content = content_loader.filter_manifest(framework_slug, 'edit_submission', draft)
     section = content.get_section(section_id)
     containing_section = section
     if section and (question_slug is not None):
@@ -1,5 +1,6 @@
 # coding=utf-8
 
+from functools import partial
 from itertools import chain
 
 from flask import render_template, request, redirect, url_for, abort, session, Markup, flash
@@ -8,38 +9,46 @@ import six
 
 from dmapiclient import APIError
 from dmapiclient.audit import AuditTypes
-from dmutils.email import send_email, generate_token
+from dmutils.email import generate_token
 from dmutils.email.exceptions import EmailError
 from dmutils.email.dm_mailchimp import DMMailChimpClient
 from dmcontent.content_loader import ContentNotFoundError
 
 from ...main import main, content_loader
-from ... import data_api_client
+from ... import data_api_client, framework_cache
 from ..forms.suppliers import (
     EditSupplierForm, EditContactInformationForm, DunsNumberForm, CompaniesHouseNumberForm,
     CompanyContactDetailsForm, CompanyNameForm, EmailAddressForm
 )
+from ..helpers.concurrency import fetch_concurrently
 from ..helpers.frameworks import get_frameworks_by_status
 from ..helpers import hash_email, login_required
+from ..helpers.etags import check_etag
+from ..helpers.outbox import send_email
 from .users import get_current_suppliers_users
 
 
 @main.route('')
 @login_required
 def dashboard():
-    supplier = data_api_client.get_supplier(
-        current_user.supplier_id
-    )['suppliers']
+    fetched = fetch_concurrently(
+        supplier=partial(data_api_client.get_supplier, current_user.supplier_id),
+        all_frameworks=partial(framework_cache.find_frameworks, data_api_client),
+        supplier_frameworks=partial(data_api_client.get_supplier_frameworks, current_user.supplier_id),
+        users=get_current_suppliers_users,
+    )
+
+    supplier = fetched['supplier']['suppliers']
     supplier['contact'] = supplier['contactInformation'][0]
 
     all_frameworks = sorted(
-        data_api_client.find_frameworks()['frameworks'],
+        fetched['all_frameworks'],
         key=lambda framework: framework['slug'],
         reverse=True
     )
     supplier_frameworks = {
         framework['frameworkSlug']: framework
-        for framework in data_api_client.get_supplier_frameworks(current_user.supplier_id)['frameworkInterest']
+        for framework in fetched['supplier_frameworks']['frameworkInterest']
     }
 
     for framework in all_frameworks:
@@ -67,7 +76,7 @@ def dashboard():
     return render_template(
         "suppliers/dashboard.html",
         supplier=supplier,
-        users=get_current_suppliers_users(),
+        users=fetched['users'],
         frameworks={
             'coming': get_frameworks_by_status(all_frameworks, 'coming'),
             'open': get_frameworks_by_status(all_frameworks, 'open'),
@@ -89,6 +98,10 @@ def supplier_details():
         abort(e.status_code)
     supplier['contact'] = supplier['contactInformation'][0]
 
+    not_modified = check_etag(supplier)
+    if not_modified:
+        return not_modified
+
     return render_template(
         "suppliers/details.html",
         supplier=supplier,
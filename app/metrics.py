@@ -0,0 +1,257 @@
+from collections import OrderedDict
+import json
+import os
+import resource
+import sys
+import time
+from threading import Lock
+
+from .main.helpers.concurrency import pool_stats
+
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+METRICS = OrderedDict([
+    ('dm_requests_total', (COUNTER, "Responses sent, by endpoint and status code")),
+    ('dm_request_duration_seconds', (HISTOGRAM, "Time taken to handle requests, by endpoint")),
+    ('dm_request_phase_duration_seconds', (
+        HISTOGRAM, "Time each request spent on API calls, S3, email, templates and content, by endpoint"
+    )),
+    ('dm_calls_total', (COUNTER, "Timed calls, by category (api, s3, email, template or content) and name")),
+    ('dm_call_errors_total', (COUNTER, "Timed calls that raised an exception, by category and name")),
+    ('dm_call_duration_seconds_total', (COUNTER, "Time spent in timed calls, by category and name")),
+    ('dm_cache_hits_total', (COUNTER, "Cache lookups that found an entry, by cache")),
+    ('dm_cache_misses_total', (COUNTER, "Cache lookups that didn't find an entry, by cache")),
+    ('dm_compressed_responses_total', (COUNTER, "Responses compressed, by encoding")),
+    ('dm_compression_bytes_in_total', (COUNTER, "Size of responses before they were compressed, by encoding")),
+    ('dm_compression_bytes_out_total', (COUNTER, "Size of responses after they were compressed, by encoding")),
+    ('dm_fetch_pool_size', (GAUGE, "Threads in the pool used to make upstream calls in parallel")),
+    ('dm_fetch_pool_busy_threads', (GAUGE, "Threads in the fetch pool running a fetch")),
+    ('dm_fetch_pool_queued_fetches', (GAUGE, "Fetches waiting for a thread in the fetch pool")),
+    ('process_resident_memory_bytes', (GAUGE, "Resident memory size of the process")),
+])
+
+# cache name: (extension, attribute of the extension holding the cache)
+CACHES = OrderedDict([
+    ('data_api_request', ('data_api_client', 'request_cache_totals')),
+    ('framework', ('framework_cache', 'backend')),
+    ('content_filter', ('content_loader', 'filter_cache')),
+    ('fragment', ('fragment_cache', 'store')),
+    ('signed_document_url', ('signed_document_urls', 'cache')),
+    ('communications', ('communications_index', 'cache')),
+])
+
+
+def resident_memory_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (IOError, OSError):
+        # there's no /proc on a Mac, so make do with the peak
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+class Metrics(object):
+    """Collects the app's metrics and renders them in the Prometheus text format, for the status blueprint's
+    `/_metrics`.
+
+    Metrics come from `instrumentation` (requests and the calls they make), the caches in `CACHES`, `compression`, the
+    fetch thread pool and the process itself. Cache hit ratios are `dm_cache_hits_total` over hits plus
+    `dm_cache_misses_total`.
+
+    Each process only knows about the requests it handled. When we run several worker processes, point
+    `DM_METRICS_DIR` at a directory they share: every worker writes its metrics there at most every
+    `DM_METRICS_WRITE_INTERVAL` seconds (after a request) and `/_metrics` adds up the counters and histograms of all of
+    them, including workers that have since exited. Gauges are reported per process, labelled with its pid, for
+    workers that are still running. The directory should be emptied whenever the app is restarted.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.directory = None
+        self.write_interval = 0
+        self._last_write = 0
+        self._write_lock = Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.directory = app.config['DM_METRICS_DIR']
+        self.write_interval = app.config['DM_METRICS_WRITE_INTERVAL']
+        self._last_write = 0
+        if self.directory:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            app.after_request(self._write_periodically)
+        app.extensions['metrics'] = self
+
+    def collect(self):
+        """This process's metrics, as a list of [name, labels, value] samples. Histogram values are the dicts returned
+        by `Histogram.as_dict`."""
+        samples = []
+        samples.extend(self._request_samples())
+        samples.extend(self._call_samples())
+        samples.extend(self._cache_samples())
+        samples.extend(self._compression_samples())
+        pool = pool_stats()
+        samples.extend([
+            ['dm_fetch_pool_size', {}, pool['size']],
+            ['dm_fetch_pool_busy_threads', {}, pool['busy']],
+            ['dm_fetch_pool_queued_fetches', {}, pool['queued']],
+            ['process_resident_memory_bytes', {}, resident_memory_bytes()],
+        ])
+        return samples
+
+    def render(self):
+        if self.directory:
+            self.write_snapshot()
+            samples = aggregate(self._read_snapshots())
+        else:
+            samples = self.collect()
+        return render_samples(samples)
+
+    def write_snapshot(self):
+        path = os.path.join(self.directory, '{}.json'.format(os.getpid()))
+        with self._write_lock:
+            with open(path + '.tmp', 'w') as f:
+                json.dump({'pid': os.getpid(), 'samples': self.collect()}, f)
+            os.rename(path + '.tmp', path)
+            self._last_write = time.monotonic()
+
+    def _write_periodically(self, response):
+        if time.monotonic() - self._last_write >= self.write_interval:
+            self.write_snapshot()
+        return response
+
+    def _read_snapshots(self):
+        snapshots = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshots.append(json.load(f))
+            except (IOError, OSError, ValueError):
+                # the worker may have gone away, or be in the middle of replacing it
+                continue
+        return snapshots
+
+    def _request_samples(self):
+        stats = self.app.extensions['instrumentation'].stats()
+        for endpoint, phases in sorted(stats['endpoints'].items()):
+            for phase, histogram in sorted(phases.items()):
+                if phase == 'total':
+                    yield ['dm_request_duration_seconds', {'endpoint': endpoint}, histogram]
+                else:
+                    yield ['dm_request_phase_duration_seconds', {'endpoint': endpoint, 'phase': phase}, histogram]
+        for endpoint, status_codes in sorted(stats['responses'].items()):
+            for status_code, count in sorted(status_codes.items()):
+                yield ['dm_requests_total', {'endpoint': endpoint, 'status': str(status_code)}, count]
+
+    def _call_samples(self):
+        calls = self.app.extensions['instrumentation'].stats()['calls']
+        for category, names in sorted(calls.items()):
+            for name, call_stats in sorted(names.items()):
+                labels = {'category': category, 'name': name}
+                yield ['dm_calls_total', labels, call_stats['count']]
+                yield ['dm_call_errors_total', labels, call_stats['errors']]
+                yield ['dm_call_duration_seconds_total', labels, call_stats['duration']]
+
+    def _cache_samples(self):
+        for cache_name, (extension, attribute) in CACHES.items():
+            cache = getattr(self.app.extensions.get(extension), attribute, None)
+            if hasattr(cache, 'hits'):
+                yield ['dm_cache_hits_total', {'cache': cache_name}, cache.hits]
+                yield ['dm_cache_misses_total', {'cache': cache_name}, cache.misses]
+
+    def _compression_samples(self):
+        for encoding, stats in sorted(self.app.extensions['compression'].stats().items()):
+            labels = {'encoding': encoding}
+            yield ['dm_compressed_responses_total', labels, stats['responses']]
+            yield ['dm_compression_bytes_in_total', labels, stats['bytes_in']]
+            yield ['dm_compression_bytes_out_total', labels, stats['bytes_out']]
+
+
+def aggregate(snapshots):
+    """Adds up the counters and histograms from each process's snapshot. Gauges are kept separate, labelled with the
+    pid of their process, and only for processes that are still running."""
+    totals = OrderedDict()
+    gauges = []
+    for snapshot in snapshots:
+        running = _is_running(snapshot['pid'])
+        for name, labels, value in snapshot['samples']:
+            metric_type = METRICS[name][0]
+            if metric_type == GAUGE:
+                if running:
+                    gauges.append([name, dict(labels, pid=str(snapshot['pid'])), value])
+                continue
+
+            key = (name, tuple(sorted(labels.items())))
+            if key not in totals:
+                totals[key] = [name, labels, value]
+            elif metric_type == HISTOGRAM:
+                totals[key][2] = _add_histograms(totals[key][2], value)
+            else:
+                totals[key][2] += value
+
+    return list(totals.values()) + gauges
+
+
+def _add_histograms(first, second):
+    return {
+        'count': first['count'] + second['count'],
+        'sum': first['sum'] + second['sum'],
+        'buckets': [
+            [upper_bound, count + other_count]
+            for (upper_bound, count), (_, other_count) in zip(first['buckets'], second['buckets'])
+        ],
+    }
+
+
+def _is_running(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def render_samples(samples):
+    """Renders [name, labels, value] samples in the Prometheus text exposition format."""
+    by_name = OrderedDict((name, []) for name in METRICS)
+    for name, labels, value in samples:
+        by_name[name].append((labels, value))
+
+    lines = []
+    for name, name_samples in by_name.items():
+        metric_type, help_text = METRICS[name]
+        lines.append('# HELP {} {}'.format(name, help_text))
+        lines.append('# TYPE {} {}'.format(name, metric_type))
+        for labels, value in name_samples:
+            if metric_type == HISTOGRAM:
+                for upper_bound, count in value['buckets']:
+                    lines.append(_line(name + '_bucket', dict(labels, le=upper_bound), count))
+                lines.append(_line(name + '_sum', labels, value['sum']))
+                lines.append(_line(name + '_count', labels, value['count']))
+            else:
+                lines.append(_line(name, labels, value))
+    return '\n'.join(lines) + '\n'
+
+
+def _line(name, labels, value):
+    if labels:
+        name += '{' + ','.join(
+            '{}="{}"'.format(key, _escape(value)) for key, value in sorted(labels.items())
+        ) + '}'
+    return '{} {}'.format(name, repr(value) if isinstance(value, float) else value)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+metrics = Metrics()
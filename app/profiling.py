@@ -0,0 +1,166 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+
+from flask import current_app, g, request
+from itsdangerous import BadData, URLSafeTimedSerializer
+
+
+PROFILE_ID_PATTERN = re.compile(r'^\d+-[0-9a-f]+$')
+
+
+class RequestProfiler(object):
+    """Profiles requests with cProfile, saving each profile to `DM_PROFILING_DIR` for the status blueprint's
+    `/_profiles` to list, slowest first.
+
+    Nothing is profiled unless `DM_PROFILING_ENABLED` is set. Then a request is profiled if it has a valid token (from
+    `python application.py profiling_token`) in the `DM_PROFILING_HEADER` header, or otherwise at random, for a
+    `DM_PROFILING_SAMPLE_RATE` fraction of requests. Only the `DM_PROFILING_MAX_PROFILES` most recent profiles are
+    kept. Profiles show how the code works, so they can only be seen with a valid token in the same header.
+
+    cProfile only sees the thread the view runs on, so time spent in fetches run in parallel by `fetch_concurrently`
+    shows up as waiting for their results.
+    """
+    TOKEN_SALT = 'ProfileRequest'
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self.sample_rate = 0
+        self.header = None
+        self.max_profiles = 0
+        self.token_max_age = 0
+        self._serializer = None
+
+    def init_app(self, app):
+        self.enabled = app.config['DM_PROFILING_ENABLED']
+        self.directory = app.config['DM_PROFILING_DIR']
+        self.sample_rate = app.config['DM_PROFILING_SAMPLE_RATE']
+        self.header = app.config['DM_PROFILING_HEADER']
+        self.max_profiles = app.config['DM_PROFILING_MAX_PROFILES']
+        self.token_max_age = app.config['DM_PROFILING_TOKEN_MAX_AGE']
+        self._serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt=self.TOKEN_SALT)
+
+        if self.enabled:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            # the first before_request function to run and the last after_request one, so they cover all of the others
+            app.before_request_funcs.setdefault(None, []).insert(0, self._start_profiling)
+            app.after_request_funcs.setdefault(None, []).insert(0, self._save_profile)
+            app.teardown_request(self._stop_profiling)
+        app.extensions['request_profiler'] = self
+
+    def make_token(self):
+        """A token that gets requests with it in the `DM_PROFILING_HEADER` header profiled, for a while."""
+        return self._serializer.dumps('profile')
+
+    def is_valid_token(self, token):
+        try:
+            self._serializer.loads(token, max_age=self.token_max_age)
+        except BadData:
+            return False
+        return True
+
+    def should_profile(self):
+        token = request.headers.get(self.header)
+        if token and self.is_valid_token(token):
+            return True
+        return random.random() < self.sample_rate
+
+    def profiles(self):
+        """Details of the saved profiles, slowest first."""
+        profiles = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    profiles.append(json.load(f))
+            except (IOError, OSError, ValueError):
+                # deleted or not finished being written
+                continue
+        return sorted(profiles, key=lambda profile: profile['duration'], reverse=True)
+
+    def report(self, profile_id, sort_by='cumulative', limit=100):
+        """The saved profile `profile_id` as text, or None if there isn't one."""
+        path = self._path(profile_id, '.prof')
+        if path is None or not os.path.exists(path):
+            return None
+        if sort_by not in pstats.Stats.sort_arg_dict_default:
+            sort_by = 'cumulative'
+        output = io.StringIO()
+        pstats.Stats(path, stream=output).sort_stats(sort_by).print_stats(limit)
+        return output.getvalue()
+
+    def _start_profiling(self):
+        # status checks are frequent, quick and not very interesting
+        if request.blueprint == 'status' or not self.should_profile():
+            return
+        g._profiler = cProfile.Profile()
+        g._profile_start = time.time()
+        g._profiler.enable()
+
+    def _save_profile(self, response):
+        profiler = self._stop_profiling()
+        if profiler is None:
+            return response
+
+        duration = time.time() - g._profile_start
+        request_id = getattr(request, 'request_id', None)
+        if not request_id:
+            request_id = request.headers.get(current_app.config['DM_DOWNSTREAM_REQUEST_ID_HEADER'])
+        profile_id = '{}-{}'.format(int(g._profile_start * 1000), uuid.uuid4().hex[:8])
+        details = {
+            'id': profile_id,
+            'endpoint': request.endpoint,
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'request_id': request_id,
+            'started_at': g._profile_start,
+            'duration': duration,
+        }
+
+        profiler.dump_stats(self._path(profile_id, '.prof'))
+        # written last, so that a profile is only listed once it's all there
+        with open(self._path(profile_id, '.json.tmp'), 'w') as f:
+            json.dump(details, f)
+        os.rename(self._path(profile_id, '.json.tmp'), self._path(profile_id, '.json'))
+
+        self._remove_old_profiles()
+        return response
+
+    def _stop_profiling(self, exception=None):
+        # also called on teardown, as after_request isn't called if the view raised an exception we didn't handle
+        profiler = g.get('_profiler')
+        if profiler is not None:
+            profiler.disable()
+            g._profiler = None
+        return profiler
+
+    def _remove_old_profiles(self):
+        profile_ids = sorted(
+            name[:-len('.json')] for name in os.listdir(self.directory)
+            if name.endswith('.json') and PROFILE_ID_PATTERN.match(name[:-len('.json')])
+        )
+        for profile_id in profile_ids[:max(0, len(profile_ids) - self.max_profiles)]:
+            for extension in ('.json', '.prof'):
+                try:
+                    os.remove(self._path(profile_id, extension))
+                except OSError:
+                    # another worker got there first
+                    pass
+
+    def _path(self, profile_id, extension):
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        return os.path.join(self.directory, profile_id + extension)
+
+
+request_profiler = RequestProfiler()
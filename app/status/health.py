@@ -0,0 +1,148 @@
+import os
+import socket
+import time
+from threading import Event, Lock, Thread
+
+import six
+
+from .. import buckets, data_api_client
+
+
+MANDRILL_ADDRESS = ('mandrillapp.com', 443)
+
+# No key starts with this, so listing it is a single small ListObjects request that needs the same access as our reads
+BUCKET_CHECK_PREFIX = '_health-check/'
+
+
+class HealthCheck(object):
+    """The result of checking the app's dependencies. `age` is how many seconds ago the check was made."""
+
+    def __init__(self, api_status, bucket_status=None, email_status=None):
+        self.api_status = api_status
+        self.bucket_status = bucket_status
+        self.email_status = email_status
+        self.checked_at = time.monotonic()
+
+    @property
+    def ok(self):
+        if self.api_status.get('status') != 'ok' or self.email_status not in (None, 'ok'):
+            return False
+        return all(status == 'ok' for status in (self.bucket_status or {}).values())
+
+    @property
+    def age(self):
+        return time.monotonic() - self.checked_at
+
+
+class HealthProber(object):
+    """Checks the Data API (and optionally our S3 buckets and Mandrill) every `DM_HEALTH_CHECK_INTERVAL` seconds on a
+    background thread, so that `/_status` can answer load balancer probes from the last result straight away.
+
+    A slow or failing API would otherwise hold up every probe, and make every instance look unhealthy at once.
+
+    If the last result is more than `DM_HEALTH_CHECK_MAX_AGE` seconds old (the background thread is stuck, say) the
+    next `latest()` checks again there and then. An interval of 0 turns off the background thread so that every call
+    checks, as `/_status` used to.
+
+    The thread is started by the first call to `latest()` rather than by `init_app`, so it runs in each worker process
+    rather than in a parent that forks them.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.interval = 0
+        self.max_age = 0
+        self.check_buckets = False
+        self.check_email = False
+        self._latest = None
+        self._lock = Lock()
+        self._thread = None
+        self._thread_pid = None
+        self._stopping = Event()
+
+    def init_app(self, app):
+        self.stop()
+        self.app = app
+        self.interval = app.config['DM_HEALTH_CHECK_INTERVAL']
+        self.max_age = app.config['DM_HEALTH_CHECK_MAX_AGE']
+        self.check_buckets = app.config['DM_HEALTH_CHECK_BUCKETS']
+        self.check_email = app.config['DM_HEALTH_CHECK_EMAIL']
+        self._latest = None
+        app.extensions['health_prober'] = self
+
+    def latest(self):
+        """Returns the most recent `HealthCheck`, checking now if there isn't a recent enough one."""
+        if self.interval <= 0:
+            return self.check()
+
+        self._ensure_started()
+        latest = self._latest
+        if latest is None or latest.age > self.max_age:
+            return self.check()
+        return latest
+
+    def check(self):
+        """Checks the app's dependencies now, saving the result for `latest`."""
+        with self.app.app_context():
+            result = HealthCheck(
+                api_status=self._check_api(),
+                bucket_status=self._check_buckets() if self.check_buckets else None,
+                email_status=self._check_email() if self.check_email else None,
+            )
+        with self._lock:
+            if self._latest is None or result.checked_at > self._latest.checked_at:
+                self._latest = result
+        return result
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        if self._thread is not None and self._thread_pid == os.getpid():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _ensure_started(self):
+        with self._lock:
+            # after a fork the child has the parent's attributes but not its threads
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stopping = Event()
+            self._thread = Thread(target=self._run, args=(self._stopping,), name='health-prober', daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def _run(self, stopping):
+        while not stopping.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                self.app.logger.error("health_prober.error: {error}", extra={'error': six.text_type(e)})
+            stopping.wait(self.interval)
+
+    def _check_api(self):
+        try:
+            return data_api_client.get_status()
+        except Exception as e:
+            return {'status': 'error', 'message': six.text_type(e)}
+
+    def _check_buckets(self):
+        statuses = {}
+        for name, bucket_name in sorted(buckets.bucket_names.items()):
+            if not bucket_name:
+                continue
+            try:
+                buckets.get(name).list(BUCKET_CHECK_PREFIX)
+            except Exception:
+                statuses[name] = 'error'
+            else:
+                statuses[name] = 'ok'
+        return statuses
+
+    def _check_email(self):
+        try:
+            socket.create_connection(MANDRILL_ADDRESS, timeout=5).close()
+        except (IOError, OSError):
+            return 'error'
+        return 'ok'
+
+
+health_prober = HealthProber()
@@ -1,11 +1,16 @@
-from flask import jsonify, current_app, request
+import hmac
 
-from . import status
-from .. import data_api_client
+from flask import abort, jsonify, current_app, request, Response, url_for
+
+from . import status as status_blueprint
+from .health import health_prober
+from ..instrumentation import instrumentation
+from ..metrics import metrics
+from ..profiling import request_profiler
 from dmutils.status import get_flags
 
 
-@status.route('/_status')
+@status_blueprint.route('/_status')
 def status():
 
     if 'ignore-dependencies' in request.args:
@@ -13,21 +18,72 @@ def status():
             status="ok",
         ), 200
 
-    api_status = data_api_client.get_status()
-    version = current_app.config['VERSION']
+    # normally answered from the health prober's last check, but `check-dependencies` makes it check there and then
+    health = health_prober.check() if 'check-dependencies' in request.args else health_prober.latest()
+    dependencies = dict(
+        version=current_app.config['VERSION'],
+        api_status=health.api_status,
+        checked_seconds_ago=round(health.age, 3),
+        flags=get_flags(current_app),
+    )
+    if health.bucket_status is not None:
+        dependencies['bucket_status'] = health.bucket_status
+    if health.email_status is not None:
+        dependencies['email_status'] = health.email_status
 
-    if api_status['status'] == "ok":
-        return jsonify(
-            status="ok",
-            version=version,
-            api_status=api_status,
-            flags=get_flags(current_app)
-        )
-
-    return jsonify(
-        status="error",
-        version=version,
-        api_status=api_status,
-        message="Error connecting to the (Data) API.",
-        flags=get_flags(current_app)
-    ), 500
+    if health.ok:
+        return jsonify(status="ok", **dependencies)
+
+    if health.api_status.get('status') != "ok":
+        message = "Error connecting to the (Data) API."
+    else:
+        message = "Error connecting to S3 or Mandrill."
+    return jsonify(status="error", message=message, **dependencies), 500
+
+
+@status_blueprint.route('/_timings')
+def timings():
+    _check_metrics_token()
+
+    return jsonify(instrumentation.stats())
+
+
+@status_blueprint.route('/_metrics')
+def prometheus_metrics():
+    _check_metrics_token()
+
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _check_metrics_token():
+    # sent the way Prometheus sends its `bearer_token`, so that it can scrape /_metrics
+    token = current_app.config['DM_METRICS_TOKEN']
+    authorization = request.headers.get('Authorization', '')
+    if not token or not hmac.compare_digest(authorization.encode('utf-8'), 'Bearer {}'.format(token).encode('utf-8')):
+        abort(404)
+
+
+def _check_profiling_token():
+    token = request.headers.get(request_profiler.header)
+    if not request_profiler.enabled or not token or not request_profiler.is_valid_token(token):
+        abort(404)
+
+
+@status_blueprint.route('/_profiles')
+def list_profiles():
+    _check_profiling_token()
+
+    profiles = request_profiler.profiles()[:request.args.get('limit', 50, type=int)]
+    for profile in profiles:
+        profile['url'] = url_for('.view_profile', profile_id=profile['id'])
+    return jsonify(profiles=profiles)
+
+
+@status_blueprint.route('/_profiles/<string:profile_id>')
+def view_profile(profile_id):
+    _check_profiling_token()
+
+    report = request_profiler.report(profile_id, sort_by=request.args.get('sort', 'cumulative'))
+    if report is None:
+        abort(404)
+    return Response(report, mimetype='text/plain')
@@ -2,18 +2,47 @@
 
 import os
 from app import create_app
+from app.main import content_loader
+from app.profiling import request_profiler
 from dmutils import init_manager
 
 application = create_app(
     os.getenv('DM_ENVIRONMENT') or 'development'
 )
-application.jinja_options = {
-    'extensions': [
-        'jinja2.ext.with_'
-    ]
-}
-
 manager = init_manager(application, 5003, ['./app/content/frameworks'])
 
+
+@manager.command
+def load_content():
+    """Load and parse all of the framework content, to check that it's valid"""
+    content_loader.load_all()
+
+
+@manager.command
+def build_content_snapshot():
+    """Parse the framework content into a snapshot in DM_CONTENT_SNAPSHOT_DIR, to save parsing it at startup"""
+    snapshot_dir = application.config['DM_CONTENT_SNAPSHOT_DIR']
+    if not snapshot_dir:
+        raise SystemExit("DM_CONTENT_SNAPSHOT_DIR is not set")
+    print("Wrote {}".format(content_loader.build_snapshot(snapshot_dir)))
+
+
+@manager.command
+def compile_templates():
+    """Compile all of the templates into the template bytecode cache, so that workers don't have to on first render"""
+    if application.jinja_env.bytecode_cache is None:
+        raise SystemExit("DM_TEMPLATE_BYTECODE_CACHE_ENABLED is not set")
+    template_names = application.jinja_env.list_templates(extensions=['html'])
+    for template_name in template_names:
+        application.jinja_env.get_template(template_name)
+    print("Compiled {} templates".format(len(template_names)))
+
+
+@manager.command
+def profiling_token():
+    """Print a token to send in the DM_PROFILING_HEADER header to get requests profiled"""
+    print(request_profiler.make_token())
+
+
 if __name__ == '__main__':
     manager.run()
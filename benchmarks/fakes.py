@@ -0,0 +1,164 @@
+from collections import Counter
+from contextlib import contextmanager
+import json
+import os
+import re
+from threading import Lock
+
+from dmapiclient import DataAPIClient
+import mock
+
+try:
+    import urlparse
+    from urllib import urlencode
+except ImportError:
+    import urllib.parse as urlparse
+    from urllib.parse import urlencode
+
+
+API_URL = 'http://localhost:5000'
+
+
+class UnexpectedAPICall(Exception):
+    """A view made a request the fake Data API doesn't know how to answer, so the fixtures need extending."""
+
+
+class FakeDataAPI(object):
+    """Answers `DataAPIClient` requests from fixture data, in place of `DataAPIClient._request`.
+
+    Everything above `_request` - our request cache, instrumentation and the client's own methods - runs just as it
+    does against the real API. Each response is encoded as JSON once and decoded again for every request, as the
+    client decodes what the API sends it. Draft services are listed `DRAFTS_PER_PAGE` at a time, with a `next` link to
+    the following page.
+
+    `calls` counts the requests made, by route.
+    """
+    DRAFTS_PER_PAGE = 100
+
+    def __init__(self, fixtures):
+        self.fixtures = fixtures
+        self.calls = Counter()
+        self._lock = Lock()
+        self._responses = {}
+        self._routes = [
+            ('get_user', re.compile(r'^/users/(?P<user_id>\d+)$'), self._user),
+            ('find_users', re.compile(r'^/users$'), self._users),
+            ('get_supplier', re.compile(r'^/suppliers/\d+$'), self._supplier),
+            ('get_supplier_frameworks', re.compile(r'^/suppliers/\d+/frameworks$'), self._supplier_frameworks),
+            ('get_supplier_framework_info',
+             re.compile(r'^/suppliers/\d+/frameworks/(?P<framework_slug>[^/]+)$'), self._supplier_framework),
+            ('get_supplier_declaration',
+             re.compile(r'^/suppliers/\d+/frameworks/(?P<framework_slug>[^/]+)/declaration$'), self._declaration),
+            ('find_frameworks', re.compile(r'^/frameworks$'), self._frameworks),
+            ('get_framework', re.compile(r'^/frameworks/(?P<framework_slug>[^/]+)$'), self._framework),
+            ('find_draft_services', re.compile(r'^/draft-services$'), self._drafts),
+            ('get_draft_service', re.compile(r'^/draft-services/(?P<draft_id>\d+)$'), self._draft),
+            ('get_service', re.compile(r'^/services/(?P<service_id>\d+)$'), self._service),
+        ]
+
+    @contextmanager
+    def installed(self):
+        fake = self
+
+        def _request(client, method, url, data=None, params=None):
+            return fake.request(method, url, data=data, params=params)
+
+        with mock.patch.object(DataAPIClient, '_request', _request):
+            yield self
+
+    def request(self, method, url, data=None, params=None):
+        if method.upper() != 'GET':
+            raise UnexpectedAPICall("{} {}".format(method, url))
+
+        parts = urlparse.urlsplit(url)
+        query = dict(urlparse.parse_qsl(parts.query))
+        query.update((key, str(value)) for key, value in (params or {}).items() if value is not None)
+        key = (parts.path, tuple(sorted(query.items())))
+
+        for name, pattern, handler in self._routes:
+            match = pattern.match(parts.path)
+            if match:
+                with self._lock:
+                    self.calls[name] += 1
+                    if key not in self._responses:
+                        self._responses[key] = json.dumps(handler(query, **match.groupdict()))
+                return json.loads(self._responses[key])
+
+        raise UnexpectedAPICall("GET {}".format(url))
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls.clear()
+
+    def _user(self, query, user_id):
+        return self.fixtures['user']
+
+    def _users(self, query):
+        return {'users': self.fixtures['users'], 'links': {}}
+
+    def _supplier(self, query):
+        return self.fixtures['supplier']
+
+    def _supplier_frameworks(self, query):
+        return {'frameworkInterest': list(self.fixtures['supplier_frameworks'].values())}
+
+    def _supplier_framework(self, query, framework_slug):
+        return {'frameworkInterest': self.fixtures['supplier_frameworks'][framework_slug]}
+
+    def _declaration(self, query, framework_slug):
+        return {'declaration': self.fixtures['supplier_frameworks'][framework_slug]['declaration']}
+
+    def _frameworks(self, query):
+        return {'frameworks': list(self.fixtures['frameworks'].values())}
+
+    def _framework(self, query, framework_slug):
+        return {'frameworks': self.fixtures['frameworks'][framework_slug]}
+
+    def _drafts(self, query):
+        drafts = [
+            draft for draft in self.fixtures['drafts']
+            if query.get('framework') in (None, draft['frameworkSlug'])
+        ]
+        page = int(query.get('page', 1))
+        start = (page - 1) * self.DRAFTS_PER_PAGE
+        response = {'services': drafts[start:start + self.DRAFTS_PER_PAGE], 'links': {}}
+        if start + self.DRAFTS_PER_PAGE < len(drafts):
+            response['links']['next'] = '{}/draft-services?{}'.format(
+                API_URL, urlencode(sorted(dict(query, page=page + 1).items()))
+            )
+        return response
+
+    def _draft(self, query, draft_id):
+        draft = next(draft for draft in self.fixtures['drafts'] if draft['id'] == int(draft_id))
+        return {
+            'services': draft,
+            'auditEvents': {'createdAt': draft['updatedAt'], 'userName': 'Supplier User 1'},
+            'validationErrors': {},
+        }
+
+    def _service(self, query, service_id):
+        return {'services': self.fixtures['services'][int(service_id)]}
+
+
+class FakeBucket(object):
+    """Stands in for a `dmutils.s3.S3` bucket holding `keys`, a dict of paths to last modified times."""
+
+    def __init__(self, name, keys=None):
+        self.name = name
+        self.keys = keys or {}
+
+    def list(self, prefix='', delimiter='', load_timestamps=False):
+        keys = [self._format_key(path, load_timestamps) for path in self.keys if path.startswith(prefix)]
+        return sorted(keys, key=lambda key: key['last_modified'] if load_timestamps else key['path'])
+
+    def get_signed_url(self, path, expires_in=30):
+        if path not in self.keys:
+            return None
+        return 'https://{}.s3.amazonaws.com/{}?Signature=fake&Expires={}'.format(self.name, path, expires_in)
+
+    def _format_key(self, path, load_timestamps):
+        filename, ext = os.path.splitext(os.path.basename(path))
+        key = {'path': path, 'filename': filename, 'ext': ext[1:], 'size': 1024}
+        if load_timestamps:
+            key['last_modified'] = self.keys[path]
+        return key
@@ -0,0 +1,198 @@
+from copy import deepcopy
+
+from tests.app.helpers import BaseApplicationTest, valid_g9_declaration_base
+
+
+SUPPLIER_ID = 1234
+USER_ID = 123
+FRAMEWORK_SLUG = 'g-cloud-9'
+SERVICE_ID = 1234567890123456
+
+G9_LOTS = [
+    ('cloud-hosting', 'Cloud hosting'),
+    ('cloud-software', 'Cloud software'),
+    ('cloud-support', 'Cloud support'),
+]
+DRAFT_STATUSES = ['not-submitted', 'not-submitted', 'submitted', 'failed']
+
+# a service with (close to) every question answered, so that the summaries have as much to show as they ever do
+G9_SERVICE_ANSWERS = {
+    'serviceName': 'Managed cloud hosting',
+    'serviceDescription': 'Scalable hosting for public sector web applications, with 24 hour monitoring. ' * 3,
+    'serviceFeatures': ['Autoscaling', 'Load balancing', 'Managed backups', 'Intrusion detection',
+                        'Patch management', 'Web application firewall', 'Content delivery network', 'Log retention',
+                        'Private networking', 'Blue-green deployments'],
+    'serviceBenefits': ['Pay only for what you use', 'Scale up in minutes', 'No capital expenditure',
+                        'Hosted in UK data centres', 'Accredited support staff', 'Open standards throughout',
+                        'Dedicated account manager', 'Simple migration', 'Predictable monthly bills',
+                        'Published APIs'],
+    'cloudDeploymentModel': 'public cloud',
+    'priceMin': '0.05',
+    'priceMax': '1500',
+    'priceUnit': 'virtual machine',
+    'priceInterval': 'hour',
+    'educationPricing': True,
+    'freeVersionTrialOption': True,
+    'freeVersionDescription': 'A single small virtual machine, for 30 days.',
+    'freeVersionLink': 'https://example.com/free-trial',
+    'serviceDefinitionDocumentURL': 'https://assets.example.com/g-cloud-9/documents/1234/1-service-definition.pdf',
+    'termsAndConditionsDocumentURL': 'https://assets.example.com/g-cloud-9/documents/1234/1-terms.pdf',
+    'pricingDocumentURL': 'https://assets.example.com/g-cloud-9/documents/1234/1-pricing.pdf',
+    'serviceConstraints': 'Planned maintenance happens on Sunday mornings, with two weeks notice.',
+    'systemRequirements': ['A modern web browser', 'An internet connection'],
+    'emailOrTicketingSupport': 'yes, at extra cost',
+    'emailOrTicketingSupportPriority': True,
+    'emailOrTicketingSupportResponseTimes': 'Within an hour, any time of day.',
+    'phoneSupport': True,
+    'phoneSupportAvailability': '24 hours a day, 7 days a week',
+    'webChatSupport': 'yes, at extra cost',
+    'webChatSupportAvailability': '9am to 5pm, Monday to Friday',
+    'webChatSupportAccessibility': 'WCAG AA or EN 301 549',
+    'supportLevels': 'Standard support is included. Premium support adds a named engineer. ' * 4,
+    'supportAvailableToThirdParties': True,
+    'onboardingGuidance': 'We provide documentation, webinars and a migration assessment.',
+    'offboardingGuidance': 'We help you export your data and machine images.',
+    'endOfContractDataExtraction': 'Data can be exported through our API or console at any time.',
+    'endOfContractProcess': 'We delete all data 30 days after the end of the contract, and confirm this in writing.',
+    'serviceInterface': True,
+    'serviceInterfaceAccessibility': 'WCAG AA or EN 301 549',
+    'serviceInterfaceTesting': ['Screen readers', 'Keyboard only navigation'],
+    'APIAccess': True,
+    'APIAutomationTools': ['Ansible', 'Chef', 'Puppet', 'Terraform'],
+    'APIType': 'REST',
+    'APIDocumentation': True,
+    'APIDocumentationFormats': ['HTML', 'PDF', 'Open API (also known as Swagger)'],
+    'commandLineInterface': True,
+    'commandLineOS': ['Linux or Unix', 'MacOS', 'Windows'],
+    'scalingType': 'automatic',
+    'independenceOfResources': 'Each customer gets dedicated resources, with contention monitored centrally.',
+    'serviceUsageMetrics': True,
+    'serviceUsageMetricsHow': 'Usage is shown in the console and available through the API.',
+    'backupWhatData': ['Virtual machines', 'Databases', 'Files'],
+    'backupControls': 'Users choose what to back up and when through the console.',
+    'backupDatacentre': 'backups go to a different data centre',
+    'backupScheduling': 'backups run on a schedule users set',
+    'backupRecovery': 'users can recover their own backups',
+    'dataProtectionBetweenNetworks': ['Private network or public sector network', 'TLS (version 1.2 or above)'],
+    'dataProtectionWithinNetwork': ['TLS (version 1.2 or above)', 'IPsec or TLS VPN gateway'],
+    'datacentreLocations': ['UK'],
+    'datacentreSecurityStandards': 'complies with CSA CCM v3.0',
+    'penetrationTesting': ['at least once a year', 'after every major change'],
+    'protectiveMonitoringApproach': 'Alerts are triaged by our security operations centre within 15 minutes.',
+    'incidentManagementApproach': 'Incidents are reported through the service desk and to affected customers.',
+    'vulnerabilityManagementApproach': 'Critical patches are applied within 24 hours of release.',
+    'configurationAndChangeManagementApproach': 'Every change is reviewed, tested and recorded.',
+    'securityGovernanceAccreditation': True,
+    'securityGovernanceStandards': ['ISO/IEC 27001'],
+    'informationSecurityPoliciesAndProcesses': 'Our policies follow ISO 27001 and are reviewed every year.',
+    'equipmentDisposalApproach': 'complying with a recognised standard, for example CSA CCM v.30, CAS (Sanitisation)',
+    'auditInformationProvided': 'users have access to real-time audit information',
+    'userAuthentication': ['2-step verification', 'Identity federation with standards-based authentication'],
+    'managementAccessAuthentication': ['2-step verification', 'Dedicated device on a segregated network'],
+    'staffSecurityClearanceChecks': 'all staff have security clearance',
+    'governmentSecurityClearances': 'up to developed vetting (DV)',
+    'approachToResilience': 'Services run across three availability zones, with automatic failover.',
+    'outageReporting': ['API notifications', 'Email alerts', 'Public dashboard'],
+    'serviceAvailabilityPercentage': '99.95%',
+    'guaranteedAvailability': 'Service credits are paid for any month below 99.95% availability.',
+    'dataExportFormats': ['CSV', 'ODF'],
+    'dataImportFormats': ['CSV', 'ODF'],
+    'energyEfficientDatacentres': True,
+    'energyEfficientDatacentresDescription': 'Our data centres follow the EU Code of Conduct for data centres.',
+}
+
+
+def draft_service(draft_id, lot_slug, lot_name, status):
+    draft = deepcopy(G9_SERVICE_ANSWERS)
+    draft.update({
+        'id': draft_id,
+        'supplierId': SUPPLIER_ID,
+        'supplierName': 'Supplier Name',
+        'frameworkName': 'G-Cloud 9',
+        'frameworkSlug': FRAMEWORK_SLUG,
+        'lot': lot_slug,
+        'lotSlug': lot_slug,
+        'lotName': lot_name,
+        'serviceName': '{} {}'.format(draft['serviceName'], draft_id),
+        'status': status,
+        'links': {},
+        'createdAt': '2017-02-01T15:26:07.650368Z',
+        'updatedAt': '2017-02-{:02d}T15:26:07.650368Z'.format(1 + draft_id % 28),
+    })
+    return draft
+
+
+def drafts(count):
+    """`count` G-Cloud 9 drafts, spread over the lots and statuses."""
+    result = []
+    for draft_id in range(1, count + 1):
+        lot_slug, lot_name = G9_LOTS[(draft_id - 1) % len(G9_LOTS)]
+        status = DRAFT_STATUSES[(draft_id - 1) % len(DRAFT_STATUSES)]
+        result.append(draft_service(draft_id, lot_slug, lot_name, status))
+    return result
+
+
+def live_service():
+    service = draft_service(1, 'cloud-hosting', 'Cloud hosting', 'published')
+    service['id'] = str(SERVICE_ID)
+    return service
+
+
+def frameworks():
+    framework = BaseApplicationTest.framework
+    return {
+        'g-cloud-9': framework(status='open', name='G-Cloud 9', slug='g-cloud-9',
+                               framework_agreement_version='RM1557ix')['frameworks'],
+        'g-cloud-8': framework(status='live', name='G-Cloud 8', slug='g-cloud-8',
+                               framework_agreement_version='RM1557viii')['frameworks'],
+        'g-cloud-7': framework(status='expired', name='G-Cloud 7', slug='g-cloud-7')['frameworks'],
+        'digital-outcomes-and-specialists-2': framework(status='live', name='Digital Outcomes and Specialists 2',
+                                                        slug='digital-outcomes-and-specialists-2')['frameworks'],
+    }
+
+
+def supplier_frameworks(draft_count):
+    supplier_framework = BaseApplicationTest.supplier_framework
+    g9 = supplier_framework(supplier_id=SUPPLIER_ID, framework_slug='g-cloud-9',
+                            declaration=dict(valid_g9_declaration_base(), status='complete'))['frameworkInterest']
+    g8 = supplier_framework(supplier_id=SUPPLIER_ID, framework_slug='g-cloud-8', status='complete', on_framework=True,
+                            agreement_returned=True)['frameworkInterest']
+    counts = {
+        'g-cloud-9': {'drafts_count': draft_count, 'complete_drafts_count': draft_count // 2, 'services_count': 0},
+        'g-cloud-8': {'drafts_count': 0, 'complete_drafts_count': 0, 'services_count': 12},
+    }
+    return {slug: dict(sf, **counts[slug]) for slug, sf in [('g-cloud-9', g9), ('g-cloud-8', g8)]}
+
+
+def users(count=10):
+    return [
+        BaseApplicationTest.user(USER_ID + i, 'user{}@example.com'.format(i), SUPPLIER_ID, 'Supplier Name',
+                                 'Supplier User {}'.format(i), active=(i % 5 != 4))['users']
+        for i in range(count)
+    ]
+
+
+def communications_keys(framework_slug=FRAMEWORK_SLUG):
+    """The paths in the communications bucket for a framework, with their last modified dates."""
+    keys = {}
+    for filename in ['invitation.pdf', 'proposed-framework-agreement.pdf', 'proposed-call-off.pdf',
+                     'reporting-template.xls']:
+        keys['{0}/communications/{0}-{1}'.format(framework_slug, filename)] = '2017-02-01T10:00:00.000000Z'
+    for section in ['communications', 'clarifications']:
+        for i in range(1, 21):
+            path = '{}/communications/updates/{}/{}-update-{}.pdf'.format(framework_slug, section, section, i)
+            keys[path] = '2017-03-{:02d}T10:00:00.000000Z'.format(i)
+    return keys
+
+
+def api_fixtures(draft_count):
+    """The data the fake Data API answers from, for a supplier with `draft_count` G-Cloud 9 drafts."""
+    return {
+        'user': BaseApplicationTest.user(USER_ID, 'email@email.com', SUPPLIER_ID, 'Supplier Name', 'Name'),
+        'users': users(),
+        'supplier': BaseApplicationTest.supplier(),
+        'frameworks': frameworks(),
+        'supplier_frameworks': supplier_frameworks(draft_count),
+        'drafts': drafts(draft_count),
+        'services': {SERVICE_ID: live_service()},
+    }
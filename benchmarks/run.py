@@ -0,0 +1,177 @@
+"""Times the heaviest supplier pages against the fake Data API and S3 in `benchmarks.fakes`.
+
+    python -m benchmarks.run [--iterations 100] [--only dashboard] [--save-baseline]
+
+Each page is requested a few times to warm up the app's caches, then `--iterations` times to find the median (p50)
+and 99th percentile (p99) response times, then a few more times with `tracemalloc` tracing to find the most memory
+allocated at once while handling the request. How many Data API requests the page makes is counted too.
+
+Results are compared with those saved in `benchmarks/baseline.json` by `--save-baseline`, and the run fails if a
+page's p50 or memory has grown by more than `--tolerance`, or it makes more API requests than it did. Timings depend
+on the machine, so save the baseline on the machine you compare on.
+"""
+import argparse
+from collections import OrderedDict
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+from app import buckets, create_app
+from tests import login_for_tests
+
+from . import fixtures
+from .fakes import FakeBucket, FakeDataAPI
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DRAFT_COUNTS = (1, 50, 500)
+WARMUP_ITERATIONS = 3
+ALLOCATION_ITERATIONS = 5
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def scenarios():
+    """(name, number of drafts the supplier has, URL) for each page we time."""
+    framework_url = '/suppliers/frameworks/{}'.format(fixtures.FRAMEWORK_SLUG)
+    result = []
+    for count in DRAFT_COUNTS:
+        result.append(('framework_dashboard[{}]'.format(count), count, framework_url))
+        result.append((
+            'framework_submission_services[{}]'.format(count), count, framework_url + '/submissions/cloud-hosting'
+        ))
+    result.extend([
+        ('framework_supplier_declaration_overview', 1, framework_url + '/declaration'),
+        ('edit_service', 1, '{}/services/{}'.format(framework_url, fixtures.SERVICE_ID)),
+        ('view_service_submission', 1, framework_url + '/submissions/cloud-hosting/1'),
+        ('dashboard', 1, '/suppliers'),
+    ])
+    return result
+
+
+def percentile(values, percent):
+    """The nearest-rank `percent`th percentile of `values`."""
+    ordered = sorted(values)
+    return ordered[max(0, int(math.ceil(percent / 100.0 * len(ordered))) - 1)]
+
+
+def make_client():
+    app = create_app('benchmark')
+    app.register_blueprint(login_for_tests)
+    buckets.override('communications', FakeBucket('communications', fixtures.communications_keys()))
+    for name in ('agreements', 'documents', 'submissions'):
+        buckets.override(name, FakeBucket(name))
+
+    client = app.test_client()
+    client.get('/auto-login')
+    return client
+
+
+def get(client, name, url):
+    response = client.get(url)
+    if response.status_code != 200:
+        raise BenchmarkError("{}: GET {} returned {}".format(name, url, response.status_code))
+    response.close()
+
+
+def run_scenario(name, draft_count, url, iterations):
+    api = FakeDataAPI(fixtures.api_fixtures(draft_count))
+    with api.installed():
+        client = make_client()
+        for _ in range(WARMUP_ITERATIONS):
+            get(client, name, url)
+
+        api.reset_calls()
+        durations = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            get(client, name, url)
+            durations.append(time.perf_counter() - start)
+        api_calls = sum(api.calls.values()) / float(iterations)
+
+        peaks = []
+        for _ in range(ALLOCATION_ITERATIONS):
+            tracemalloc.start()
+            try:
+                get(client, name, url)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+
+    return OrderedDict([
+        ('p50_ms', round(percentile(durations, 50) * 1000, 2)),
+        ('p99_ms', round(percentile(durations, 99) * 1000, 2)),
+        ('peak_kib', round(percentile(peaks, 50) / 1024.0, 1)),
+        ('api_calls', api_calls),
+    ])
+
+
+def regressions(result, baseline, tolerance):
+    """How `result` is worse than `baseline`, as a list of descriptions."""
+    found = []
+    for key in ('p50_ms', 'peak_kib'):
+        if result[key] > baseline[key] * (1 + tolerance):
+            found.append('{} {} (was {})'.format(key, result[key], baseline[key]))
+    if result['api_calls'] > baseline['api_calls']:
+        found.append('api_calls {} (was {})'.format(result['api_calls'], baseline['api_calls']))
+    return found
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as f:
+        return json.load(f)
+
+
+def save_baseline(results):
+    with open(BASELINE_PATH, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Time the heaviest supplier pages against a fake Data API.")
+    parser.add_argument('--iterations', type=int, default=100, help="requests to time for each page")
+    parser.add_argument('--only', help="only time pages whose names contain this")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="how much slower (or bigger) than the baseline a page can get, as a fraction")
+    parser.add_argument('--save-baseline', action='store_true', help="save the results as the new baseline")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    baseline = load_baseline()
+    results = OrderedDict()
+    failed = False
+
+    print('{:<48} {:>9} {:>9} {:>10} {:>10}'.format('page', 'p50 ms', 'p99 ms', 'peak KiB', 'API calls'))
+    for name, draft_count, url in scenarios():
+        if args.only and args.only not in name:
+            continue
+        result = results[name] = run_scenario(name, draft_count, url, args.iterations)
+        found = regressions(result, baseline[name], args.tolerance) if name in baseline else []
+        failed = failed or bool(found)
+        print('{:<48} {:>9} {:>9} {:>10} {:>10}{}'.format(
+            name, result['p50_ms'], result['p99_ms'], result['peak_kib'], result['api_calls'],
+            '  REGRESSED: ' + ', '.join(found) if found else '',
+        ))
+
+    if args.save_baseline:
+        baseline.update(results)
+        save_baseline(baseline)
+        print('Saved the results to {}'.format(BASELINE_PATH))
+    elif not baseline:
+        print('There is no baseline to compare with yet - run with --save-baseline to save one.')
+
+    return 1 if failed and not args.save_baseline else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
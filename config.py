@@ -33,10 +33,107 @@ class Config(object):
     DM_SUBMISSIONS_BUCKET = None
     DM_ASSETS_URL = None
 
+    # Listings of each framework's communications files are shared between requests for this many seconds
+    DM_COMMUNICATIONS_INDEX_TTL = 60
+    DM_COMMUNICATIONS_INDEX_SIZE = 20
+
+    # dmutils signs document URLs for 30 seconds. We keep handing out the same signed URL for a document until
+    # DM_SIGNED_URL_SAFETY_MARGIN seconds before it expires.
+    DM_SIGNED_URL_LIFETIME = 30
+    DM_SIGNED_URL_SAFETY_MARGIN = 10
+    DM_SIGNED_URL_CACHE_SIZE = 1000
+
     DM_MAILCHIMP_USERNAME = None
     DM_MAILCHIMP_API_KEY = None
     DM_MAILCHIMP_OPEN_FRAMEWORK_NOTIFICATION_MAILING_LIST_ID = None
 
+    # Framework records are cached per process. Frameworks that are coming, open, pending or in standstill
+    # can change status at any time so are only cached for a short while. Nothing invalidates the cache when a framework
+    # changes (that's done by the admin app), so each worker can show a framework's old status (eg still open after the
+    # deadline) for up to DM_FRAMEWORK_CACHE_TRANSITION_TTL seconds, or DM_FRAMEWORK_CACHE_TTL for other frameworks.
+    DM_FRAMEWORK_CACHE_TTL = 300
+    DM_FRAMEWORK_CACHE_TRANSITION_TTL = 30
+    DM_FRAMEWORK_CACHE_SIZE = 50
+
+    # Framework content is normally only loaded the first time it's needed. Set this to load it all at startup.
+    DM_PRELOAD_CONTENT = False
+    # Directory of parsed content snapshots built by `python application.py build_content_snapshot`. If there's a
+    # snapshot of the current content in it, it's read instead of parsing the content's YAML.
+    DM_CONTENT_SNAPSHOT_DIR = None
+    # Filtered content manifests are shared between requests with the same answers to the questions they depend on
+    DM_CONTENT_FILTER_CACHE_SIZE = 1000
+    DM_CONTENT_FILTER_CACHE_TTL = 3600
+
+    # Drafts listed on each page of a lot's services
+    DM_DRAFTS_PER_PAGE = 100
+
+    # Where fragments of templates marked with {% cache %} are kept: 'memory', 'filesystem' (in DM_FRAGMENT_CACHE_DIR,
+    # shared by every process on the machine) or None to render them every time
+    DM_FRAGMENT_CACHE_BACKEND = 'memory'
+    DM_FRAGMENT_CACHE_SIZE = 500
+    DM_FRAGMENT_CACHE_DIR = None
+
+    # Compiled templates are kept in DM_TEMPLATE_BYTECODE_CACHE_DIR (or Jinja's own private per-user directory, if it
+    # isn't set or can't be written to) and shared between workers on the same machine. The build doesn't fill it, as
+    # each instance has a disk of its own: the first request to render a template compiles it, or
+    # `python application.py compile_templates` compiles them all in advance.
+    DM_TEMPLATE_BYTECODE_CACHE_ENABLED = False
+    DM_TEMPLATE_BYTECODE_CACHE_DIR = None
+
+    # Responses of these types are gzipped (or compressed with brotli, if it's installed) for browsers that accept it
+    DM_COMPRESSION_ENABLED = True
+    DM_COMPRESSION_MIN_SIZE = 1024
+    DM_COMPRESSION_LEVEL = 6
+    DM_COMPRESSION_MIMETYPES = [
+        'text/html', 'text/css', 'text/plain', 'text/csv', 'application/javascript', 'application/json',
+    ]
+
+    # /_status is answered from the result of checking the Data API (and, if these are set, our S3 buckets and
+    # Mandrill) on a background thread every DM_HEALTH_CHECK_INTERVAL seconds. An interval of 0 checks on every request.
+    DM_HEALTH_CHECK_INTERVAL = 10
+    DM_HEALTH_CHECK_MAX_AGE = 60
+    DM_HEALTH_CHECK_BUCKETS = False
+    DM_HEALTH_CHECK_EMAIL = False
+
+    # /_timings and /_metrics are only served to requests with an `Authorization: Bearer <DM_METRICS_TOKEN>` header,
+    # which is what Prometheus sends when its scrape config has this as the `bearer_token`. They're 404s if it's unset.
+    DM_METRICS_TOKEN = None
+    # Worker processes share their metrics through files in this directory, so that /_metrics covers all of them
+    DM_METRICS_DIR = None
+    DM_METRICS_WRITE_INTERVAL = 10
+
+    # Requests can be profiled, with the profiles saved in DM_PROFILING_DIR and listed at /_profiles. Requests with a
+    # token from `python application.py profiling_token` in the DM_PROFILING_HEADER header are always profiled, and a
+    # DM_PROFILING_SAMPLE_RATE fraction of the rest.
+    DM_PROFILING_ENABLED = False
+    DM_PROFILING_DIR = None
+    DM_PROFILING_SAMPLE_RATE = 0
+    DM_PROFILING_HEADER = 'DM-Profile-Request'
+    DM_PROFILING_TOKEN_MAX_AGE = 3600
+    DM_PROFILING_MAX_PROFILES = 200
+
+    # Size of the thread pool used to make independent upstream calls in parallel. Less than 2 disables it.
+    DM_FETCH_POOL_SIZE = 10
+
+    # Emails are queued in this SQLite database and sent by background workers. If it isn't set emails are sent
+    # synchronously, in the request. It (and its directory) is created on first use, so it must be somewhere writable,
+    # and somewhere that survives restarts and redeploys - queued emails are lost with it. That rules out the local
+    # disk of a PaaS instance, so it isn't set for any of our deployed environments.
+    DM_EMAIL_OUTBOX_PATH = None
+    DM_EMAIL_OUTBOX_WORKERS = 2
+    DM_EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+    DM_EMAIL_OUTBOX_RETRY_DELAY = 5
+    # A worker's lease on the email it's sending is extended every third of this while the send is in progress
+    DM_EMAIL_OUTBOX_LEASE = 60
+    # Emails that are given up on are kept this long before being deleted
+    DM_EMAIL_OUTBOX_FAILED_RETENTION = 24 * 60 * 60
+    # How long to wait for emails we can't carry on without (eg clarification questions) to be sent
+    DM_EMAIL_OUTBOX_WAIT_TIMEOUT = 10
+
+    # Suppliers are only sent the "you started an application" email once in this many seconds
+    DM_APPLICATION_STARTED_EMAIL_WINDOW = 3600
+    DM_APPLICATION_STARTED_EMAIL_WINDOW_SIZE = 10000
+
     DEBUG = False
 
     RESET_PASSWORD_EMAIL_NAME = 'Digital Marketplace Admin'
@@ -92,6 +189,35 @@ class Config(object):
         jinja_loader = jinja2.FileSystemLoader(template_folders)
         app.jinja_loader = jinja_loader
 
+        # set on the environment itself rather than in jinja_options, as it may already have been created
+        if app.config['DM_TEMPLATE_BYTECODE_CACHE_ENABLED']:
+            app.jinja_env.bytecode_cache = jinja2.FileSystemBytecodeCache(_template_bytecode_cache_dir(app))
+
+
+def _template_bytecode_cache_dir(app):
+    """DM_TEMPLATE_BYTECODE_CACHE_DIR, created if need be, or None if that can't be written to.
+
+    None leaves Jinja to use its own directory, which only our user can write to. Never fall back to the shared
+    temporary directory: Jinja loads what it finds in the cache with `marshal`, so anyone able to plant a file there
+    could run code in the app.
+    """
+    cache_dir = app.config['DM_TEMPLATE_BYTECODE_CACHE_DIR']
+    if not cache_dir:
+        return None
+
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+    except OSError as e:
+        app.logger.warning("Can't create the template bytecode cache in {}: {}".format(cache_dir, e))
+        return None
+
+    if not os.access(cache_dir, os.W_OK):
+        app.logger.warning("Can't write to the template bytecode cache in {}".format(cache_dir))
+        return None
+
+    return cache_dir
+
 
 class Test(Config):
     DEBUG = True
@@ -111,11 +237,34 @@ class Test(Config):
     FEATURE_FLAGS_CONTRACT_VARIATION = enabled_since('2016-08-11')
 
     DM_DATA_API_AUTH_TOKEN = 'myToken'
+    DM_METRICS_TOKEN = 'myMetricsToken'
 
     SECRET_KEY = 'not_very_secret'
 
     DM_ASSETS_URL = 'http://asset-host'
 
+    DM_FRAMEWORK_CACHE_TTL = 0
+    DM_COMMUNICATIONS_INDEX_TTL = 0
+    DM_APPLICATION_STARTED_EMAIL_WINDOW = 0
+    DM_CONTENT_FILTER_CACHE_TTL = 0
+    DM_FRAGMENT_CACHE_BACKEND = None
+    DM_HEALTH_CHECK_INTERVAL = 0
+    DM_SIGNED_URL_SAFETY_MARGIN = Config.DM_SIGNED_URL_LIFETIME
+
+
+class Benchmark(Test):
+    """The test settings, but without debugging and with the caches switched on as they are in production, so that
+    `python -m benchmarks.run` measures what live requests do."""
+    DEBUG = False
+    # a benchmark that hits an error should fail, not time the error page
+    PROPAGATE_EXCEPTIONS = True
+
+    DM_FRAMEWORK_CACHE_TTL = Config.DM_FRAMEWORK_CACHE_TTL
+    DM_COMMUNICATIONS_INDEX_TTL = Config.DM_COMMUNICATIONS_INDEX_TTL
+    DM_CONTENT_FILTER_CACHE_TTL = Config.DM_CONTENT_FILTER_CACHE_TTL
+    DM_FRAGMENT_CACHE_BACKEND = Config.DM_FRAGMENT_CACHE_BACKEND
+    DM_SIGNED_URL_SAFETY_MARGIN = Config.DM_SIGNED_URL_SAFETY_MARGIN
+
 
 class Development(Config):
     DEBUG = True
@@ -129,6 +278,7 @@ class Development(Config):
     DM_DATA_API_URL = "http://localhost:5000"
     DM_DATA_API_AUTH_TOKEN = "myToken"
     DM_API_AUTH_TOKEN = "myToken"
+    DM_METRICS_TOKEN = "myMetricsToken"
 
     DM_SUBMISSIONS_BUCKET = "digitalmarketplace-dev-uploads"
     DM_COMMUNICATIONS_BUCKET = "digitalmarketplace-dev-uploads"
@@ -153,6 +303,8 @@ class Live(Config):
 
     DM_FRAMEWORK_AGREEMENTS_EMAIL = 'enquiries@digitalmarketplace.service.gov.uk'
 
+    DM_TEMPLATE_BYTECODE_CACHE_ENABLED = True
+
 
 class Preview(Live):
     FEATURE_FLAGS_CONTRACT_VARIATION = enabled_since('2016-08-22')
@@ -174,4 +326,5 @@ configs = {
     'staging': Staging,
     'production': Production,
     'test': Test,
+    'benchmark': Benchmark,
 }
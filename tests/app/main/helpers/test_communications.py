@@ -0,0 +1,82 @@
+"""Test for app/main/helpers/communications.py"""
+import mock
+
+from app.main.helpers.communications import CommunicationsFiles, CommunicationsIndex
+
+
+def _file(path, last_modified='2017-01-01T00:00:00.000000Z'):
+    return {'path': path, 'last_modified': last_modified, 'filename': path.split('/')[-1], 'ext': 'pdf'}
+
+
+class TestCommunicationsFiles(object):
+
+    def test_known_files_are_annotated_with_last_modified(self):
+        index = CommunicationsFiles('g-cloud-9', [
+            _file('g-cloud-9/communications/g-cloud-9-invitation.pdf', '2017-02-01T00:00:00.000000Z'),
+            _file('g-cloud-9/communications/updates/communications/an-update.pdf', '2017-03-01T00:00:00.000000Z'),
+        ])
+
+        files = index.communications_files()
+        assert files['invitation'] == {
+            'path': 'communications/',
+            'filename': 'g-cloud-9-invitation.pdf',
+            'last_modified': '2017-02-01T00:00:00.000000Z',
+        }
+        assert files['supplier_updates']['last_modified'] == '2017-03-01T00:00:00.000000Z'
+        assert files['final_agreement']['last_modified'] is None
+
+    def test_last_matching_file_in_listing_wins(self):
+        index = CommunicationsFiles('g-cloud-9', [
+            _file('g-cloud-9/communications/updates/communications/first.pdf', '2017-03-01T00:00:00.000000Z'),
+            _file('g-cloud-9/communications/updates/communications/second.pdf', '2017-04-01T00:00:00.000000Z'),
+        ])
+
+        assert index.last_modified('communications/updates/') == '2017-04-01T00:00:00.000000Z'
+
+    def test_updates_are_split_into_communications_and_clarifications(self):
+        index = CommunicationsFiles('g-cloud-9', [
+            _file('g-cloud-9/communications/g-cloud-9-invitation.pdf'),
+            _file('g-cloud-9/communications/updates/communications/an-update.pdf'),
+            _file('g-cloud-9/communications/updates/clarifications/an-answer.pdf'),
+        ])
+
+        updates = index.updates_files()
+        assert [f['path'] for f in updates['communications']] == ['updates/communications/an-update.pdf']
+        assert [f['path'] for f in updates['clarifications']] == ['updates/clarifications/an-answer.pdf']
+
+    def test_updates_files_can_be_modified_by_callers(self):
+        index = CommunicationsFiles('g-cloud-9', [_file('g-cloud-9/communications/updates/communications/a.pdf')])
+
+        index.updates_files()['communications'].pop()
+        assert len(index.updates_files()['communications']) == 1
+
+
+@mock.patch('app.main.helpers.communications.buckets')
+class TestCommunicationsIndex(object):
+
+    def setup_method(self, method):
+        self.app = mock.Mock(config={
+            'DM_COMMUNICATIONS_INDEX_TTL': 60,
+            'DM_COMMUNICATIONS_INDEX_SIZE': 10,
+        }, extensions={})
+        self.index = CommunicationsIndex()
+        self.index.init_app(self.app)
+
+    def test_bucket_is_only_listed_once(self, buckets):
+        bucket = buckets.get.return_value
+        bucket.list.return_value = [_file('g-cloud-9/communications/g-cloud-9-invitation.pdf')]
+
+        self.index.get('g-cloud-9')
+        self.index.get('g-cloud-9')
+
+        buckets.get.assert_called_once_with('communications')
+        bucket.list.assert_called_once_with('g-cloud-9', load_timestamps=True)
+
+    def test_refresh_rebuilds_the_index(self, buckets):
+        buckets.get.return_value.list.return_value = []
+
+        self.index.get('g-cloud-9')
+        self.index.refresh('g-cloud-9')
+        self.index.get('g-cloud-9')
+
+        assert buckets.get.return_value.list.call_count == 2
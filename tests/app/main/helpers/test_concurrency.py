@@ -0,0 +1,108 @@
+"""Test for app/main/helpers/concurrency.py"""
+import threading
+
+import pytest
+from flask import g, request, abort, session
+from werkzeug.exceptions import NotFound
+
+from app.main.helpers.concurrency import fetch_concurrently, pool_stats
+from tests.app.helpers import BaseApplicationTest
+
+
+class TestFetchConcurrently(BaseApplicationTest):
+
+    def test_returns_results_by_name(self):
+        with self.app.test_request_context('/'):
+            assert fetch_concurrently(one=lambda: 1, two=lambda: 2) == {'one': 1, 'two': 2}
+
+    def test_fetches_run_in_parallel(self):
+        barrier = threading.Barrier(2, timeout=5)
+        with self.app.test_request_context('/'):
+            # would time out if the fetches were run one after the other
+            assert fetch_concurrently(one=barrier.wait, two=barrier.wait).keys() == {'one', 'two'}
+
+    def test_fetches_share_the_request_and_app_contexts(self):
+        with self.app.test_request_context('/some-path'):
+            g.something = 'shared'
+            assert fetch_concurrently(
+                path=lambda: request.path,
+                something=lambda: g.something,
+            ) == {'path': '/some-path', 'something': 'shared'}
+
+    def test_changes_to_the_session_survive_the_fetches(self):
+        with self.app.test_request_context('/'):
+            session['something'] = 'changed'
+            session.modified = True
+            assert fetch_concurrently(
+                one=lambda: session.get('something'),
+                two=lambda: session.get('something'),
+            ) == {'one': 'changed', 'two': 'changed'}
+
+            assert session['something'] == 'changed'
+            assert session.modified
+
+    def test_fetches_do_not_tear_down_the_request(self):
+        torn_down = []
+        self.app.teardown_request(torn_down.append)
+        with self.app.test_request_context('/'):
+            fetch_concurrently(one=lambda: 1, two=lambda: 2)
+            assert torn_down == []
+            assert request.path == '/'
+
+    def test_exceptions_are_raised_in_the_calling_thread(self):
+        def not_found():
+            abort(404)
+
+        with self.app.test_request_context('/'):
+            with pytest.raises(NotFound):
+                fetch_concurrently(ok=lambda: 1, not_found=not_found)
+
+    def test_runs_sequentially_if_pool_disabled(self):
+        self.app.config['DM_FETCH_POOL_SIZE'] = 1
+        with self.app.test_request_context('/'):
+            assert fetch_concurrently(
+                one=threading.current_thread, two=threading.current_thread
+            ) == {'one': threading.current_thread(), 'two': threading.current_thread()}
+
+    def test_pool_stats_count_busy_threads(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def busy():
+            barrier.wait()
+            barrier.wait()
+
+        def fetch():
+            with self.app.test_request_context('/'):
+                fetch_concurrently(one=busy, two=busy)
+
+        fetching = threading.Thread(target=fetch)
+        fetching.start()
+        barrier.wait()
+        stats = pool_stats()
+        barrier.wait()
+        fetching.join()
+
+        assert stats == {'size': 10, 'busy': 2, 'queued': 0}
+        assert pool_stats()['busy'] == 0
+
+    def test_pool_stats_count_fetches_waiting_for_a_thread(self):
+        self.app.config['DM_FETCH_POOL_SIZE'] = 2
+        barrier = threading.Barrier(3, timeout=5)
+
+        def busy():
+            barrier.wait()
+            barrier.wait()
+
+        def fetch():
+            with self.app.test_request_context('/'):
+                fetch_concurrently(one=busy, two=busy, three=lambda: None)
+
+        fetching = threading.Thread(target=fetch)
+        fetching.start()
+        barrier.wait()
+        stats = pool_stats()
+        barrier.wait()
+        fetching.join()
+
+        assert stats == {'size': 2, 'busy': 2, 'queued': 1}
+        assert pool_stats() == {'size': 2, 'busy': 0, 'queued': 0}
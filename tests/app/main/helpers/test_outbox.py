@@ -0,0 +1,234 @@
+"""Test for app/main/helpers/outbox.py"""
+import sqlite3
+import time
+from threading import Thread
+
+import mock
+import pytest
+
+from dmutils.email.exceptions import EmailError
+
+from app.main.helpers.outbox import EmailOutbox
+from tests.app.helpers import BaseApplicationTest
+
+
+SEND_EMAIL_ARGS = (
+    'email@email.com', 'body', 'MANDRILL', 'subject', 'from@email.com', 'From', ['tag'],
+)
+
+
+class TestEmailOutbox(BaseApplicationTest):
+
+    def setup_method(self, method):
+        super(TestEmailOutbox, self).setup_method(method)
+        self.send_email_patch = mock.patch('app.main.helpers.outbox.email.send_email')
+        self.send_email = self.send_email_patch.start()
+
+    def teardown_method(self, method):
+        self.send_email_patch.stop()
+        super(TestEmailOutbox, self).teardown_method(method)
+
+    def _outbox(self, tmpdir, **config):
+        self.app.config.update(
+            DM_EMAIL_OUTBOX_PATH=str(tmpdir.join('outbox.sqlite3')),
+            DM_EMAIL_OUTBOX_WORKERS=0,
+            DM_EMAIL_OUTBOX_RETRY_DELAY=0,
+        )
+        self.app.config.update(config)
+        outbox = EmailOutbox()
+        outbox.init_app(self.app)
+        return outbox
+
+    @staticmethod
+    def _rows(tmpdir, query):
+        conn = sqlite3.connect(str(tmpdir.join('outbox.sqlite3')))
+        try:
+            return [tuple(row) for row in conn.execute(query).fetchall()]
+        finally:
+            conn.close()
+
+    def test_sends_synchronously_if_disabled(self):
+        outbox = EmailOutbox()
+        outbox.init_app(self.app)
+
+        outbox.send_email(*SEND_EMAIL_ARGS, reply_to='reply@email.com').wait(1)
+
+        self.send_email.assert_called_once_with(*SEND_EMAIL_ARGS, reply_to='reply@email.com')
+
+    def test_errors_are_raised_if_disabled(self):
+        self.send_email.side_effect = EmailError()
+        outbox = EmailOutbox()
+        outbox.init_app(self.app)
+
+        with pytest.raises(EmailError):
+            outbox.send_email(*SEND_EMAIL_ARGS)
+
+    def test_emails_are_queued_until_a_worker_sends_them(self, tmpdir):
+        outbox = self._outbox(tmpdir)
+
+        outbox.send_email(*SEND_EMAIL_ARGS, reply_to='reply@email.com')
+        assert not self.send_email.called
+
+        assert outbox.process_next() is True
+        self.send_email.assert_called_once_with(*SEND_EMAIL_ARGS, reply_to='reply@email.com')
+        assert outbox.process_next() is False
+
+    def test_queued_emails_survive_a_restart(self, tmpdir):
+        self._outbox(tmpdir).send_email(*SEND_EMAIL_ARGS)
+
+        assert self._outbox(tmpdir).process_next() is True
+        self.send_email.assert_called_once_with(*SEND_EMAIL_ARGS)
+
+    def test_the_api_key_is_read_from_the_config_rather_than_stored(self, tmpdir):
+        outbox = self._outbox(tmpdir)
+        outbox.send_email(*SEND_EMAIL_ARGS)
+
+        payloads = self._rows(tmpdir, "SELECT payload FROM outbox")
+        assert len(payloads) == 1
+        assert 'MANDRILL' not in payloads[0][0]
+
+        self.app.config['DM_MANDRILL_API_KEY'] = 'NEW_KEY'
+        outbox.process_next()
+        self.send_email.assert_called_once_with(
+            'email@email.com', 'body', 'NEW_KEY', 'subject', 'from@email.com', 'From', ['tag'],
+        )
+
+    def test_nothing_is_created_or_started_until_the_outbox_is_used(self, tmpdir):
+        outbox = self._outbox(tmpdir, DM_EMAIL_OUTBOX_PATH=str(tmpdir.join('outbox', 'outbox.sqlite3')),
+                              DM_EMAIL_OUTBOX_WORKERS=1)
+        assert not tmpdir.join('outbox').check()
+        assert outbox._workers == []
+
+        try:
+            self.client.get('/suppliers/_status?ignore-dependencies')
+            assert len(outbox._workers) == 1
+            outbox.send_email(*SEND_EMAIL_ARGS).wait(5)
+        finally:
+            outbox.stop()
+
+        assert tmpdir.join('outbox', 'outbox.sqlite3').check()
+
+    def test_the_lease_is_extended_while_an_email_is_being_sent(self, tmpdir):
+        outbox = self._outbox(tmpdir, DM_EMAIL_OUTBOX_LEASE=0.1)
+        claimed_while_sending = []
+
+        def slow_send(*args, **kwargs):
+            time.sleep(0.4)
+            claimed_while_sending.append(outbox._claim_next())
+        self.send_email.side_effect = slow_send
+
+        outbox.send_email(*SEND_EMAIL_ARGS)
+        outbox.process_next()
+
+        assert claimed_while_sending == [None]
+        assert self.send_email.call_count == 1
+
+    def test_failed_emails_are_retried(self, tmpdir):
+        self.send_email.side_effect = [EmailError(), None]
+        outbox = self._outbox(tmpdir)
+
+        outbox.send_email(*SEND_EMAIL_ARGS)
+
+        assert outbox.process_next() is True
+        assert outbox.process_next() is True
+        assert self.send_email.call_count == 2
+        assert outbox.process_next() is False
+
+    def test_retries_back_off(self, tmpdir):
+        self.send_email.side_effect = EmailError()
+        outbox = self._outbox(tmpdir, DM_EMAIL_OUTBOX_RETRY_DELAY=60)
+
+        outbox.send_email(*SEND_EMAIL_ARGS)
+
+        assert outbox.process_next() is True
+        assert outbox.process_next() is False
+
+    def test_emails_are_given_up_on_after_max_attempts(self, tmpdir):
+        self.send_email.side_effect = EmailError('Mandrill is down')
+        outbox = self._outbox(tmpdir, DM_EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+
+        queued = outbox.send_email(*SEND_EMAIL_ARGS)
+        while outbox.process_next():
+            pass
+
+        assert self.send_email.call_count == 2
+        with pytest.raises(EmailError) as e:
+            queued.wait(1)
+        assert 'Mandrill is down' in str(e.value)
+
+    def test_failed_emails_are_deleted_after_a_while(self, tmpdir):
+        self.send_email.side_effect = EmailError()
+        outbox = self._outbox(tmpdir, DM_EMAIL_OUTBOX_MAX_ATTEMPTS=1, DM_EMAIL_OUTBOX_FAILED_RETENTION=0)
+
+        outbox.send_email(*SEND_EMAIL_ARGS)
+        assert outbox.process_next() is True
+        assert self._rows(tmpdir, "SELECT status FROM outbox") == [('failed',)]
+
+        assert outbox.process_next() is False
+        assert self._rows(tmpdir, "SELECT status FROM outbox") == []
+
+    def test_wait_returns_once_email_is_sent(self, tmpdir):
+        outbox = self._outbox(tmpdir, DM_EMAIL_OUTBOX_WORKERS=1)
+
+        try:
+            outbox.send_email(*SEND_EMAIL_ARGS).wait(5)
+        finally:
+            outbox.stop()
+
+        self.send_email.assert_called_once_with(*SEND_EMAIL_ARGS)
+
+    def test_wait_times_out_and_takes_the_email_out_of_the_outbox(self, tmpdir):
+        outbox = self._outbox(tmpdir)
+
+        with pytest.raises(EmailError):
+            outbox.send_email(*SEND_EMAIL_ARGS).wait(0.1)
+
+        assert outbox.process_next() is False
+        assert not self.send_email.called
+
+    def test_wait_keeps_waiting_for_an_email_that_is_being_sent_when_it_times_out(self, tmpdir):
+        outbox = self._outbox(tmpdir)
+        queued = outbox.send_email(*SEND_EMAIL_ARGS)
+        self.send_email.side_effect = lambda *args, **kwargs: time.sleep(0.3)
+
+        sender = Thread(target=outbox.process_next)
+        sender.start()
+        try:
+            while self._rows(tmpdir, "SELECT status FROM outbox") != [('sending',)]:
+                time.sleep(0.01)
+            queued.wait(0.1)
+        finally:
+            sender.join()
+
+        assert self._rows(tmpdir, "SELECT status FROM outbox") == []
+        assert self.send_email.call_count == 1
+
+    def test_wait_times_out_if_the_worker_sending_the_email_has_died(self, tmpdir):
+        outbox = self._outbox(tmpdir, DM_EMAIL_OUTBOX_LEASE=0.1)
+        queued = outbox.send_email(*SEND_EMAIL_ARGS)
+        outbox._claim_next()
+
+        with pytest.raises(EmailError):
+            queued.wait(0.2)
+
+        assert self._rows(tmpdir, "SELECT status FROM outbox") == []
+
+    def test_sent_keys_are_shared_by_outboxes_using_the_same_database(self, tmpdir):
+        outbox, other_outbox = self._outbox(tmpdir), self._outbox(tmpdir)
+
+        assert outbox.remember_sent('key', 60) is True
+        assert other_outbox.remember_sent('key', 60) is False
+
+        other_outbox.forget_sent('key')
+        assert outbox.remember_sent('key', 60) is True
+
+    @mock.patch('app.main.helpers.outbox.time.time')
+    def test_sent_keys_expire(self, time_, tmpdir):
+        time_.return_value = 100
+        outbox = self._outbox(tmpdir)
+
+        assert outbox.remember_sent('key', 60) is True
+        time_.return_value = 159
+        assert outbox.remember_sent('key', 60) is False
+        time_.return_value = 160
+        assert outbox.remember_sent('key', 60) is True
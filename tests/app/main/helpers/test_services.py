@@ -0,0 +1,183 @@
+"""Test for app/main/helpers/services.py"""
+import mock
+import pytest
+
+from app.main.helpers.services import (
+    DraftIndex, SignedDocumentURLCache, UnansweredQuestionIndex, count_unanswered_questions_for_drafts, iter_drafts,
+    paginate
+)
+from tests.app.helpers import BaseApplicationTest
+
+
+class TestSignedDocumentURLCache(BaseApplicationTest):
+
+    def setup_method(self, method):
+        super(TestSignedDocumentURLCache, self).setup_method(method)
+        self.app.config['DM_SIGNED_URL_SAFETY_MARGIN'] = 10
+        self.signed_urls = SignedDocumentURLCache()
+        self.signed_urls.init_app(self.app)
+        self.uploader = mock.Mock(bucket_name='submissions-bucket')
+        self.uploader.get_signed_url.return_value = 'https://s3.amazonaws.com/path/document.pdf?signature=abc'
+
+    def test_url_is_rewritten_to_be_served_from_assets_url(self):
+        with self.app.app_context():
+            assert self.signed_urls.get(self.uploader, 'path/document.pdf') == \
+                'http://asset-host/path/document.pdf?signature=abc'
+
+    def test_signed_url_is_reused(self):
+        with self.app.app_context():
+            self.signed_urls.get(self.uploader, 'path/document.pdf')
+            self.signed_urls.get(self.uploader, 'path/document.pdf')
+
+        self.uploader.get_signed_url.assert_called_once_with('path/document.pdf')
+
+    def test_urls_are_cached_per_bucket_and_path(self):
+        other_uploader = mock.Mock(bucket_name='agreements-bucket')
+        other_uploader.get_signed_url.return_value = 'https://s3.amazonaws.com/other.pdf'
+
+        with self.app.app_context():
+            self.signed_urls.get(self.uploader, 'path/document.pdf')
+            self.signed_urls.get(self.uploader, 'path/other.pdf')
+            assert self.signed_urls.get(other_uploader, 'path/document.pdf') == 'http://asset-host/other.pdf'
+
+        assert self.uploader.get_signed_url.call_count == 2
+
+    def test_missing_documents_are_not_cached(self):
+        self.uploader.get_signed_url.return_value = None
+
+        with self.app.app_context():
+            assert self.signed_urls.get(self.uploader, 'path/document.pdf') is None
+            assert self.signed_urls.get(self.uploader, 'path/document.pdf') is None
+
+        assert self.uploader.get_signed_url.call_count == 2
+
+    @mock.patch('app.caching.time.monotonic')
+    def test_urls_are_not_handed_out_within_the_safety_margin(self, monotonic):
+        monotonic.return_value = 1000
+        with self.app.app_context():
+            self.signed_urls.get(self.uploader, 'path/document.pdf')
+
+            monotonic.return_value = 1020
+            self.signed_urls.get(self.uploader, 'path/document.pdf')
+
+        assert self.uploader.get_signed_url.call_count == 2
+
+
+class FakeQuestion(dict):
+    id = property(lambda self: self['id'])
+
+    def summary(self, draft):
+        value = [draft[key] for key in self.get('fields', []) if draft.get(key)]
+        return mock.Mock(value=value, answer_required=not value and not self.get('optional'))
+
+
+class TestUnansweredQuestionIndex(object):
+
+    def setup_method(self, method):
+        self.content = [
+            mock.Mock(questions=[
+                FakeQuestion(id='name', type='text'),
+                FakeQuestion(id='description', type='textbox_large', optional=True),
+            ]),
+            mock.Mock(questions=[
+                FakeQuestion(id='features', type='list'),
+                FakeQuestion(id='price', type='pricing', fields=['priceMin', 'priceMax']),
+                FakeQuestion(id='support', type='radios', assuranceApproach='2answers-type1'),
+            ]),
+        ]
+
+    def test_questions_are_indexed_by_whether_they_need_their_summary(self):
+        index = UnansweredQuestionIndex(self.content)
+
+        assert index.required_ids == ['name', 'features']
+        assert index.optional_ids == ['description']
+        assert [question.id for question in index.other_questions] == ['price', 'support']
+
+    def test_count(self):
+        index = UnansweredQuestionIndex(self.content)
+
+        assert index.count({}) == (4, 1)
+        assert index.count({'name': 'Service', 'features': [], 'priceMax': '10', 'description': ''}) == (2, 1)
+        assert index.count({'name': 'Service', 'features': ['fast'], 'priceMin': '1', 'description': 'A service'}) == \
+            (1, 0)
+
+    def test_indexes_are_built_once_per_manifest(self):
+        content = mock.MagicMock()
+
+        assert UnansweredQuestionIndex.for_content(content) is UnansweredQuestionIndex.for_content(content)
+
+    def test_count_unanswered_questions_for_drafts(self):
+        content_loader = mock.Mock()
+        content_loader.filter_manifests.side_effect = lambda slug, manifest, drafts: [self.content] * len(drafts)
+        drafts = [{'name': 'Service'}, {'name': 'Service', 'features': ['fast'], 'description': 'A service'}]
+
+        count_unanswered_questions_for_drafts(content_loader, 'g-cloud-9', drafts)
+
+        content_loader.filter_manifests.assert_called_once_with('g-cloud-9', 'edit_submission', drafts)
+        assert [(draft['unanswered_required'], draft['unanswered_optional']) for draft in drafts] == [(3, 1), (2, 0)]
+
+
+@mock.patch('app.main.helpers.services.current_user', mock.Mock(supplier_id=1234))
+class TestDraftListings(object):
+
+    def setup_method(self, method):
+        self.data_api_client = mock.Mock()
+        self.data_api_client.find_draft_services.return_value = {
+            'services': [
+                {'id': 1, 'lotSlug': 'scs', 'status': 'not-submitted'},
+                {'id': 2, 'lotSlug': 'saas', 'status': 'submitted'},
+            ],
+            'links': {'next': 'http://api/draft-services?page=2'},
+        }
+        self.data_api_client.get_page.return_value = {
+            'services': [
+                {'id': 3, 'lotSlug': 'scs', 'status': 'failed'},
+                {'id': 4, 'lotSlug': 'scs', 'status': 'not-submitted'},
+            ],
+            'links': {},
+        }
+
+    def test_iter_drafts_follows_next_links(self):
+        assert [draft['id'] for draft in iter_drafts(self.data_api_client, 'g-cloud-9')] == [1, 2, 3, 4]
+
+        self.data_api_client.find_draft_services.assert_called_once_with(1234, framework='g-cloud-9')
+        self.data_api_client.get_page.assert_called_once_with('http://api/draft-services?page=2')
+
+    def test_iter_drafts_fetches_pages_as_they_are_needed(self):
+        next(iter_drafts(self.data_api_client, 'g-cloud-9'))
+
+        assert not self.data_api_client.get_page.called
+
+    def test_draft_index(self):
+        drafts = DraftIndex.fetch(self.data_api_client, 'g-cloud-9')
+
+        assert [draft['id'] for draft in drafts.drafts()] == [1, 4]
+        assert [draft['id'] for draft in drafts.drafts(complete=True)] == [2, 3]
+        assert [draft['id'] for draft in drafts.drafts('scs')] == [1, 4]
+        assert [draft['id'] for draft in drafts.drafts('scs', complete=True)] == [3]
+        assert drafts.drafts('iaas') == []
+
+    def test_draft_index_counts(self):
+        drafts = DraftIndex.fetch(self.data_api_client, 'g-cloud-9', counts_only=True)
+
+        assert (drafts.count(), drafts.count(complete=True)) == (2, 2)
+        assert (drafts.count('scs'), drafts.count('scs', complete=True)) == (2, 1)
+        assert (drafts.count('saas'), drafts.count('saas', complete=True)) == (0, 1)
+        with pytest.raises(ValueError):
+            drafts.drafts('scs')
+
+    def test_draft_index_lot_results(self):
+        drafts = DraftIndex.fetch(self.data_api_client, 'g-cloud-9', counts_only=True)
+
+        assert drafts.lot_result('saas') == 'Successful'
+        assert drafts.lot_result('scs') == 'Unsuccessful'
+        assert drafts.lot_result('iaas') == 'No application'
+
+
+@pytest.mark.parametrize('page, expected', [
+    (1, ([1, 2], True)),
+    (2, ([3], False)),
+    (3, ([], False)),
+])
+def test_paginate(page, expected):
+    assert paginate([1, 2, 3], page, 2) == expected
@@ -1,6 +1,6 @@
 import pytest
 
-from app.main.helpers.validation import DOSValidator, get_validator
+from app.main.helpers.validation import DOSValidator, RequiredIf, any_truthy, get_validator, is_exactly
 from app.main import content_loader
 
 
@@ -266,3 +266,53 @@ def test_character_limit_errors(content, submission):
 def test_get_validator():
     validator = get_validator({"slug": "digital-outcomes-and-specialists"}, None, None)
     assert isinstance(validator, DOSValidator)
+
+
+def test_validators_for_the_same_content_share_a_plan(content, submission):
+    assert DOSValidator(content, submission).plan is DOSValidator(content, {}).plan
+
+
+def test_errors_can_be_limited_to_some_questions(content, submission):
+    del submission['termsAndConditions']
+    submission['primaryContactEmail'] = '@invalid.com'
+
+    validator = DOSValidator(content, submission)
+    assert validator.errors(['primaryContactEmail', 'tradingNames']) == {'primaryContactEmail': 'invalid_format'}
+    assert validator.errors(['tradingNames']) == {}
+
+
+def test_get_error_messages_for_pages_matches_each_page(content, submission):
+    del submission['termsAndConditions']
+    submission['primaryContactEmail'] = '@invalid.com'
+    sections = list(content)
+
+    validator = DOSValidator(content, submission)
+    pages_errors = validator.get_error_messages_for_pages(sections)
+
+    assert len(pages_errors) == len(sections)
+    assert sum(len(page_errors) for page_errors in pages_errors) == 2
+    for section, page_errors in zip(sections, pages_errors):
+        assert page_errors == validator.get_error_messages_for_page(section)
+
+
+def test_required_fields_for_some_questions_only_check_their_rules(content, submission):
+    submission['tradingStatus'] = "other (please specify)"
+    submission['bankrupt'] = True
+    validator = DOSValidator(content, submission)
+
+    assert 'tradingStatusOther' in validator.get_required_fields(['tradingStatusOther'])
+    assert 'mitigatingFactors' not in validator.get_required_fields(['tradingStatusOther'])
+    assert 'mitigatingFactors' in validator.get_required_fields()
+
+
+def test_required_if_rules():
+    rule = RequiredIf(
+        ['details'],
+        any_of=any_truthy(['a', 'b']),
+        all_of=[('c', is_exactly(False))],
+    )
+
+    assert rule.applies({'a': True, 'c': False})
+    assert rule.applies({'b': 'yes', 'c': False})
+    assert not rule.applies({'a': True, 'c': None})
+    assert not rule.applies({'a': False, 'b': '', 'c': False})
@@ -1,12 +1,15 @@
 # -*- coding: utf-8 -*-
 from collections import OrderedDict
 from itertools import chain
+import zlib
 
 from dmapiclient import HTTPError
 from flask import request
 from werkzeug.datastructures import MultiDict
 
 from app.main.forms.frameworks import ReuseDeclarationForm
+from app.main.helpers.frameworks import application_started_emails
+from app.main.helpers.outbox import email_outbox
 
 try:
     from StringIO import StringIO
@@ -205,6 +208,53 @@ class TestFrameworksDashboard(BaseApplicationTest):
                 ['digital-outcomes-and-specialists-application-started']
             )
 
+    @mock.patch('app.main.views.frameworks.send_email')
+    def test_email_only_sent_once_when_interest_registered_repeatedly(self, send_email, data_api_client, s3):
+        self.app.config['DM_APPLICATION_STARTED_EMAIL_WINDOW'] = 3600
+        application_started_emails.init_app(self.app)
+        with self.app.test_client():
+            self.login()
+
+            data_api_client.get_framework.return_value = self.framework(status='open')
+            data_api_client.get_supplier_framework_info.return_value = self.supplier_framework()
+            data_api_client.find_users.return_value = {'users': [{'emailAddress': 'email1', 'active': True}]}
+
+            for _ in range(3):
+                res = self.client.post("/suppliers/frameworks/digital-outcomes-and-specialists")
+                assert res.status_code == 200
+
+            assert data_api_client.register_framework_interest.call_count == 3
+            assert data_api_client.find_users.call_count == 1
+            assert send_email.call_count == 1
+
+    @mock.patch('app.main.views.frameworks.send_email')
+    def test_email_only_sent_once_by_workers_sharing_an_outbox(self, send_email, data_api_client, s3, tmpdir):
+        self.app.config.update(
+            DM_APPLICATION_STARTED_EMAIL_WINDOW=3600,
+            DM_EMAIL_OUTBOX_PATH=str(tmpdir.join('outbox.sqlite3')),
+            DM_EMAIL_OUTBOX_WORKERS=0,
+        )
+        email_outbox.init_app(self.app)
+        try:
+            with self.app.test_client():
+                self.login()
+
+                data_api_client.get_framework.return_value = self.framework(status='open')
+                data_api_client.get_supplier_framework_info.return_value = self.supplier_framework()
+                data_api_client.find_users.return_value = {'users': [{'emailAddress': 'email1', 'active': True}]}
+
+                for _ in range(2):
+                    # as if each POST went to a different worker process
+                    application_started_emails.init_app(self.app)
+                    res = self.client.post("/suppliers/frameworks/digital-outcomes-and-specialists")
+                    assert res.status_code == 200
+
+                assert data_api_client.find_users.call_count == 1
+                assert send_email.call_count == 1
+        finally:
+            self.app.config['DM_EMAIL_OUTBOX_PATH'] = None
+            email_outbox.init_app(self.app)
+
     def test_interest_not_registered_in_framework_on_get(self, data_api_client, s3):
         with self.app.test_client():
             self.login()
@@ -723,6 +773,16 @@ class TestFrameworksDashboard(BaseApplicationTest):
 
             assert res.status_code == 404
 
+    def test_returns_404_if_framework_does_not_exist_even_if_other_fetches_fail(self, data_api_client, s3):
+        with self.app.test_client():
+            self.login()
+            data_api_client.get_framework.side_effect = APIError(mock.Mock(status_code=404))
+            data_api_client.find_draft_services.side_effect = APIError(mock.Mock(status_code=503))
+
+            res = self.client.get('/suppliers/frameworks/does-not-exist')
+
+            assert res.status_code == 404
+
     def test_result_letter_is_shown_when_is_in_standstill(self, data_api_client, s3):
         with self.app.test_client():
             self.login()
@@ -2939,6 +2999,27 @@ class TestDeclarationOverview(BaseApplicationTest):
             for expected_section in expected_sections:
                 assert self._extract_section_information(doc, expected_section[0]) == expected_section
 
+    def test_page_with_a_make_declaration_form_is_compressed(self, data_api_client):
+        framework_slug, declaration, _, prefill_fw_slug, _ = next(
+            params for params in self._common_parametrization
+            if params[2] and params[1].get("status") != "complete"
+        )
+        self._setup_data_api_client(data_api_client, "open", framework_slug, declaration, prefill_fw_slug)
+
+        with self.app.test_client():
+            self.login()
+
+            response = self.client.get(
+                "/suppliers/frameworks/{}/declaration".format(framework_slug),
+                headers={'Accept-Encoding': 'gzip'},
+            )
+
+            assert response.status_code == 200
+            assert response.headers['Content-Encoding'] == 'gzip'
+            doc = html.fromstring(zlib.decompress(response.get_data(), 16 + zlib.MAX_WBITS))
+            tokens = doc.xpath("//input[@name='csrf_token']/@value")
+            assert tokens and not any('##' in token for token in tokens)
+
     @pytest.mark.parametrize(
         "framework_slug,declaration,decl_valid,prefill_fw_slug,expected_sections",
         tuple(
@@ -3964,7 +4045,7 @@ class TestSendClarificationQuestionEmail(BaseApplicationTest):
 
 
 @mock.patch('app.main.views.frameworks.data_api_client', autospec=True)
-@mock.patch('app.main.views.frameworks.count_unanswered_questions')
+@mock.patch('app.main.helpers.services.UnansweredQuestionIndex.count')
 class TestG7ServicesList(BaseApplicationTest):
 
     def test_404_when_g7_pending_and_no_complete_services(self, count_unanswered, data_api_client):
@@ -4054,6 +4135,71 @@ class TestG7ServicesList(BaseApplicationTest):
         assert u'1 draft service' in submissions.get_data(as_text=True)
         assert u'complete service' not in submissions.get_data(as_text=True)
 
+    def test_drafts_list_is_paginated(self, count_unanswered, data_api_client):
+        self.app.config['DM_DRAFTS_PER_PAGE'] = 2
+        with self.app.test_client():
+            self.login()
+
+        count_unanswered.return_value = 3, 1
+        data_api_client.get_framework.return_value = self.framework(status='open')
+        data_api_client.find_draft_services.return_value = {
+            'services': [
+                {'id': i, 'serviceName': 'draft {}'.format(i), 'lotSlug': 'scs', 'status': 'not-submitted'}
+                for i in range(1, 4)
+            ]
+        }
+
+        first_page = self.client.get('/suppliers/frameworks/g-cloud-7/submissions/scs')
+        second_page = self.client.get('/suppliers/frameworks/g-cloud-7/submissions/scs?page=2')
+        third_page = self.client.get('/suppliers/frameworks/g-cloud-7/submissions/scs?page=3')
+
+        assert u'draft 3' in first_page.get_data(as_text=True)
+        assert u'draft 2' in first_page.get_data(as_text=True)
+        assert u'draft 1' not in first_page.get_data(as_text=True)
+        assert u'/suppliers/frameworks/g-cloud-7/submissions/scs?page=2' in first_page.get_data(as_text=True)
+
+        assert u'draft 1' in second_page.get_data(as_text=True)
+        assert u'draft 2' not in second_page.get_data(as_text=True)
+        assert u'/suppliers/frameworks/g-cloud-7/submissions/scs?page=1' in second_page.get_data(as_text=True)
+
+        assert third_page.status_code == 404
+
+    def test_complete_drafts_are_paginated_separately(self, count_unanswered, data_api_client):
+        self.app.config['DM_DRAFTS_PER_PAGE'] = 2
+        with self.app.test_client():
+            self.login()
+
+        count_unanswered.return_value = 3, 1
+        data_api_client.get_framework.return_value = self.framework(status='open')
+        data_api_client.find_draft_services.return_value = {
+            'services': [
+                {'id': 1, 'serviceName': 'draft 1', 'lotSlug': 'scs', 'status': 'not-submitted'},
+            ] + [
+                {'id': i, 'serviceName': 'complete {}'.format(i), 'lotSlug': 'scs', 'status': 'submitted'}
+                for i in range(2, 5)
+            ]
+        }
+
+        first_page = self.client.get('/suppliers/frameworks/g-cloud-7/submissions/scs').get_data(as_text=True)
+        second_page = self.client.get(
+            '/suppliers/frameworks/g-cloud-7/submissions/scs?complete_page=2'
+        ).get_data(as_text=True)
+
+        assert u'draft 1' in first_page
+        assert u'complete 4' in first_page
+        assert u'complete 3' in first_page
+        assert u'complete 2' not in first_page
+        assert u'/suppliers/frameworks/g-cloud-7/submissions/scs?complete_page=2' in first_page
+        assert u'submissions/scs?page=2' not in first_page
+
+        assert u'draft 1' in second_page
+        assert u'complete 2' in second_page
+        assert u'complete 3' not in second_page
+        assert u'You haven’t added any services yet.' not in second_page
+        assert u'/suppliers/frameworks/g-cloud-7/submissions/scs?complete_page=1' in second_page
+
+        assert self.client.get('/suppliers/frameworks/g-cloud-7/submissions/scs?page=2').status_code == 404
+
     def test_drafts_list_can_be_completed(self, count_unanswered, data_api_client):
         with self.app.test_client():
             self.login()
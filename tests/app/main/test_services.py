@@ -7,6 +7,7 @@ except ImportError:
 from dmapiclient import HTTPError
 import copy
 from functools import partial
+import zlib
 import mock
 import pytest
 from lxml import html
@@ -450,6 +451,25 @@ class TestSupplierEditGCloudService(SupplierEditServiceTestsSharedAcrossFramewor
         "framework_name": "G-Cloud 9"
     }
 
+    def test_service_page_is_compressed(self, data_api_client):
+        self.login()
+        self._setup_service(
+            data_api_client,
+            service_status='published',
+            **self.framework_kwargs
+        )
+
+        res = self.client.get(
+            "/suppliers/frameworks/{}/services/123".format(self.framework_kwargs["framework_slug"]),
+            headers={'Accept-Encoding': 'gzip'},
+        )
+
+        assert res.status_code == 200
+        assert res.headers['Content-Encoding'] == 'gzip'
+        document = html.fromstring(zlib.decompress(res.get_data(), 16 + zlib.MAX_WBITS))
+        tokens = document.xpath("//input[@name='csrf_token']/@value")
+        assert tokens and not any('##' in token for token in tokens)
+
     def test_should_view_public_service_with_correct_message(self, data_api_client):
         self.login()
         self._setup_service(
@@ -1789,6 +1809,17 @@ class TestShowDraftService(BaseApplicationTest):
         with self.app.test_client():
             self.login()
 
+    def test_submission_summary_is_compressed(self, data_api_client):
+        data_api_client.get_framework.return_value = self.framework('open')
+        data_api_client.get_draft_service.return_value = self.draft_service
+        res = self.client.get('/suppliers/frameworks/g-cloud-7/submissions/scs/1', headers={'Accept-Encoding': 'gzip'})
+
+        assert res.status_code == 200
+        assert res.headers['Content-Encoding'] == 'gzip'
+        document = html.fromstring(zlib.decompress(res.get_data(), 16 + zlib.MAX_WBITS))
+        tokens = document.xpath("//input[@name='csrf_token']/@value")
+        assert tokens and not any('##' in token for token in tokens)
+
     def test_service_price_is_correctly_formatted(self, data_api_client):
         data_api_client.get_framework.return_value = self.framework('open')
         data_api_client.get_draft_service.return_value = self.draft_service
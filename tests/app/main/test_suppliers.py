@@ -773,6 +773,61 @@ class TestSupplierDetails(BaseApplicationTest):
             assert document.xpath("//*[normalize-space(string())='GB']")  # Country GB is shown
             assert "BEL153" not in page_html  # But overseas registration field isn't
 
+    def test_not_modified_if_browser_has_the_current_page(self, data_api_client):
+        data_api_client.get_supplier.side_effect = get_supplier
+        with self.app.test_client():
+            self.login()
+
+            res = self.client.get("/suppliers/details")
+            etag = res.headers['ETag']
+            assert 'private' in res.headers['Cache-Control']
+            assert 'no-cache' in res.headers['Cache-Control']
+
+            res = self.client.get("/suppliers/details", headers={'If-None-Match': etag})
+            assert res.status_code == 304
+            assert res.headers['ETag'] == etag
+            assert not res.get_data()
+
+    def test_not_modified_if_browser_has_the_compressed_page(self, data_api_client):
+        data_api_client.get_supplier.side_effect = get_supplier
+        with self.app.test_client():
+            self.login()
+
+            res = self.client.get("/suppliers/details", headers={'Accept-Encoding': 'gzip'})
+            assert res.headers['Content-Encoding'] == 'gzip'
+            etag = res.headers['ETag']
+            assert etag.startswith('W/')
+
+            res = self.client.get("/suppliers/details", headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'})
+            assert res.status_code == 304
+            assert res.headers['ETag'] == etag
+
+    def test_page_is_sent_again_if_there_are_flashed_messages(self, data_api_client):
+        data_api_client.get_supplier.side_effect = get_supplier
+        with self.app.test_client():
+            self.login()
+
+            etag = self.client.get("/suppliers/details").headers['ETag']
+            with self.client.session_transaction() as session:
+                session['_flashes'] = [('success', 'message')]
+            res = self.client.get("/suppliers/details", headers={'If-None-Match': etag})
+
+            assert res.status_code == 200
+
+    def test_page_is_sent_again_if_supplier_has_changed(self, data_api_client):
+        data_api_client.get_supplier.side_effect = get_supplier
+        with self.app.test_client():
+            self.login()
+
+            etag = self.client.get("/suppliers/details").headers['ETag']
+
+            data_api_client.get_supplier.side_effect = None
+            data_api_client.get_supplier.return_value = get_supplier(description="New description")
+            res = self.client.get("/suppliers/details", headers={'If-None-Match': etag})
+
+            assert res.status_code == 200
+            assert res.headers['ETag'] != etag
+
 
 @mock.patch("app.main.views.suppliers.data_api_client", autospec=True)
 @mock.patch("app.main.views.suppliers.get_current_suppliers_users", autospec=True)
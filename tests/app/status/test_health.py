@@ -0,0 +1,101 @@
+import time
+
+from flask import Flask
+import mock
+
+from app.buckets import BucketRegistry
+from app.status.health import BUCKET_CHECK_PREFIX, HealthProber
+
+
+@mock.patch('app.status.health.data_api_client')
+class TestHealthProber(object):
+
+    def setup_method(self, method):
+        self.app = Flask('app')
+        self.app.config.update(
+            DM_HEALTH_CHECK_INTERVAL=10,
+            DM_HEALTH_CHECK_MAX_AGE=60,
+            DM_HEALTH_CHECK_BUCKETS=False,
+            DM_HEALTH_CHECK_EMAIL=False,
+        )
+        self.prober = HealthProber()
+
+    def teardown_method(self, method):
+        self.prober.stop(timeout=1)
+
+    def _init(self, **config):
+        self.app.config.update(config)
+        self.prober.init_app(self.app)
+
+    def test_dependencies_are_checked_in_the_background(self, data_api_client):
+        data_api_client.get_status.return_value = {'status': 'ok'}
+        self._init(DM_HEALTH_CHECK_INTERVAL=0.01)
+
+        assert self.prober.latest().ok
+        for _ in range(100):
+            if data_api_client.get_status.call_count >= 3:
+                break
+            time.sleep(0.01)
+
+        assert data_api_client.get_status.call_count >= 3
+
+    def test_recent_results_are_reused(self, data_api_client):
+        data_api_client.get_status.return_value = {'status': 'ok'}
+        self._init()
+
+        with mock.patch.object(self.prober, '_ensure_started'):
+            first = self.prober.latest()
+            assert self.prober.latest() is first
+
+        assert data_api_client.get_status.call_count == 1
+
+    def test_stale_results_are_checked_again(self, data_api_client):
+        data_api_client.get_status.return_value = {'status': 'ok'}
+        self._init(DM_HEALTH_CHECK_MAX_AGE=0)
+
+        with mock.patch.object(self.prober, '_ensure_started'):
+            first = self.prober.latest()
+            assert self.prober.latest() is not first
+
+    def test_every_call_checks_if_the_interval_is_0(self, data_api_client):
+        data_api_client.get_status.return_value = {'status': 'ok'}
+        self._init(DM_HEALTH_CHECK_INTERVAL=0)
+
+        self.prober.latest()
+        self.prober.latest()
+
+        assert data_api_client.get_status.call_count == 2
+        assert self.prober._thread is None
+
+    def test_api_exceptions_are_errors(self, data_api_client):
+        data_api_client.get_status.side_effect = ValueError('oops')
+        self._init()
+
+        health = self.prober.check()
+
+        assert not health.ok
+        assert health.api_status == {'status': 'error', 'message': 'oops'}
+
+    @mock.patch('dmutils.s3.boto3')
+    def test_buckets_are_checked_if_enabled(self, boto3, data_api_client):
+        data_api_client.get_status.return_value = {'status': 'ok'}
+        s3_buckets = {'agreements-bucket': mock.Mock(), 'documents-bucket': mock.Mock()}
+        s3_buckets['agreements-bucket'].objects.filter.return_value = []
+        s3_buckets['documents-bucket'].objects.filter.side_effect = ValueError()
+        boto3.resource.return_value.Bucket.side_effect = s3_buckets.get
+        self.app.config.update(
+            DM_AGREEMENTS_BUCKET='agreements-bucket',
+            DM_COMMUNICATIONS_BUCKET=None,
+            DM_DOCUMENTS_BUCKET='documents-bucket',
+            DM_SUBMISSIONS_BUCKET=None,
+        )
+        registry = BucketRegistry()
+        registry.init_app(self.app)
+        self._init(DM_HEALTH_CHECK_BUCKETS=True)
+
+        with mock.patch('app.status.health.buckets', registry):
+            health = self.prober.check()
+
+        assert health.bucket_status == {'agreements': 'ok', 'documents': 'error'}
+        assert not health.ok
+        assert s3_buckets['agreements-bucket'].objects.filter.call_args[1]['Prefix'] == BUCKET_CHECK_PREFIX
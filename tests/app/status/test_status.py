@@ -1,18 +1,23 @@
 import json
 from ..helpers import BaseApplicationTest
+from app.profiling import request_profiler
+from app.status.health import health_prober
 
 import mock
 
 
+METRICS_HEADERS = {'Authorization': 'Bearer myMetricsToken'}
+
+
 class TestStatus(BaseApplicationTest):
 
-    @mock.patch('app.status.views.data_api_client')
+    @mock.patch('app.status.health.data_api_client')
     def test_should_return_200_from_elb_status_check(self, data_api_client):
         status_response = self.client.get('/suppliers/_status?ignore-dependencies')
         assert status_response.status_code == 200
         assert data_api_client.called is False
 
-    @mock.patch('app.status.views.data_api_client')
+    @mock.patch('app.status.health.data_api_client')
     def test_status_ok(self, data_api_client):
         data_api_client.get_status.return_value = {
             "status": "ok"
@@ -25,7 +30,7 @@ class TestStatus(BaseApplicationTest):
         assert "{}".format(json_data['status']) == "ok"
         assert "{}".format(json_data['api_status']['status']) == "ok"
 
-    @mock.patch('app.status.views.data_api_client')
+    @mock.patch('app.status.health.data_api_client')
     def test_status_error(self, data_api_client):
 
         data_api_client.get_status.return_value = {
@@ -41,3 +46,75 @@ class TestStatus(BaseApplicationTest):
         assert "{}".format(json_data['status']) == "error"
         assert "{}".format(json_data['api_status']['status']) == "error"
         assert "Error connecting to" in "{}".format(json_data['message'])
+
+    def test_timings(self):
+        self.client.get('/suppliers/_status?ignore-dependencies')
+
+        timings_response = self.client.get('/suppliers/_timings', headers=METRICS_HEADERS)
+        assert timings_response.status_code == 200
+
+        json_data = json.loads(timings_response.get_data().decode('utf-8'))
+        assert json_data['endpoints']['status.status']['total']['count'] == 1
+
+    def test_metrics(self):
+        self.client.get('/suppliers/_status?ignore-dependencies')
+
+        metrics_response = self.client.get('/suppliers/_metrics', headers=METRICS_HEADERS)
+        assert metrics_response.status_code == 200
+        assert metrics_response.content_type.startswith('text/plain; version=0.0.4')
+        assert 'dm_requests_total{endpoint="status.status",status="200"} 1\n' in metrics_response.get_data(as_text=True)
+
+    def test_timings_and_metrics_need_the_metrics_token(self):
+        for url in ['/suppliers/_timings', '/suppliers/_metrics']:
+            assert self.client.get(url).status_code == 404
+            assert self.client.get(url, headers={'Authorization': 'Bearer not-the-token'}).status_code == 404
+            assert self.client.get(url + '?token=myMetricsToken').status_code == 404
+
+    def test_timings_and_metrics_are_not_found_without_a_metrics_token_configured(self):
+        self.app.config['DM_METRICS_TOKEN'] = None
+
+        for url in ['/suppliers/_timings', '/suppliers/_metrics']:
+            assert self.client.get(url, headers={'Authorization': 'Bearer None'}).status_code == 404
+
+    @mock.patch('app.status.health.HealthProber._ensure_started')
+    @mock.patch('app.status.health.data_api_client')
+    def test_status_is_answered_from_the_last_check(self, data_api_client, _ensure_started):
+        data_api_client.get_status.return_value = {"status": "ok"}
+        health_prober.interval = 10
+
+        self.client.get('/suppliers/_status')
+        status_response = self.client.get('/suppliers/_status')
+
+        assert status_response.status_code == 200
+        assert data_api_client.get_status.call_count == 1
+        assert _ensure_started.called
+
+    @mock.patch('app.status.health.HealthProber._ensure_started')
+    @mock.patch('app.status.health.data_api_client')
+    def test_dependencies_can_be_checked_now(self, data_api_client, _ensure_started):
+        data_api_client.get_status.return_value = {"status": "ok"}
+        health_prober.interval = 10
+        self.client.get('/suppliers/_status')
+
+        data_api_client.get_status.return_value = {"status": "error"}
+        status_response = self.client.get('/suppliers/_status?check-dependencies')
+
+        assert status_response.status_code == 500
+        assert data_api_client.get_status.call_count == 2
+        assert self.client.get('/suppliers/_status').status_code == 500
+
+    def test_profiles_are_not_found_if_profiling_is_disabled(self):
+        assert self.client.get('/suppliers/_profiles').status_code == 404
+
+    def test_profiles_need_a_token(self, tmpdir):
+        self.app.config.update(DM_PROFILING_ENABLED=True, DM_PROFILING_DIR=str(tmpdir))
+        request_profiler.init_app(self.app)
+
+        assert self.client.get('/suppliers/_profiles').status_code == 404
+        assert self.client.get('/suppliers/_profiles', headers={'DM-Profile-Request': 'not-a-token'}).status_code == 404
+        token = request_profiler.make_token()
+        assert self.client.get('/suppliers/_profiles?token={}'.format(token)).status_code == 404
+
+        profiles_response = self.client.get('/suppliers/_profiles', headers={'DM-Profile-Request': token})
+        assert profiles_response.status_code == 200
+        assert json.loads(profiles_response.get_data().decode('utf-8')) == {'profiles': []}
@@ -0,0 +1,94 @@
+import mock
+from flask import g
+
+from app.api_client import RequestCachedDataAPIClient
+from .helpers import BaseApplicationTest
+
+
+@mock.patch('dmapiclient.DataAPIClient._request')
+class TestRequestCachedDataAPIClient(BaseApplicationTest):
+    def setup_method(self, method):
+        super(TestRequestCachedDataAPIClient, self).setup_method(method)
+        self.api_client = RequestCachedDataAPIClient('http://baseurl', 'auth-token', True)
+
+    def test_repeated_reads_in_a_request_only_hit_the_api_once(self, _request):
+        _request.return_value = {'frameworks': {'slug': 'g-cloud-9'}}
+        with self.app.test_request_context('/'):
+            assert self.api_client.get_framework('g-cloud-9') == {'frameworks': {'slug': 'g-cloud-9'}}
+            assert self.api_client.get_framework('g-cloud-9') == {'frameworks': {'slug': 'g-cloud-9'}}
+
+            assert _request.call_count == 1
+            assert g._data_api_cache.hits == 1
+            assert g._data_api_cache.misses == 1
+
+    def test_different_arguments_are_cached_separately(self, _request):
+        _request.return_value = {'frameworks': {}}
+        with self.app.test_request_context('/'):
+            self.api_client.get_framework('g-cloud-8')
+            self.api_client.get_framework('g-cloud-9')
+
+            assert _request.call_count == 2
+
+    def test_cache_does_not_outlive_the_request(self, _request):
+        _request.return_value = {'frameworks': {}}
+        with self.app.test_request_context('/'):
+            self.api_client.get_framework('g-cloud-9')
+        with self.app.test_request_context('/'):
+            self.api_client.get_framework('g-cloud-9')
+
+        assert _request.call_count == 2
+
+    def test_cached_responses_can_not_be_modified_by_callers(self, _request):
+        _request.return_value = {'frameworks': {'status': 'open'}}
+        with self.app.test_request_context('/'):
+            self.api_client.get_framework('g-cloud-9')['frameworks']['status'] = 'live'
+
+            assert self.api_client.get_framework('g-cloud-9') == {'frameworks': {'status': 'open'}}
+
+    def test_writes_clear_the_cache(self, _request):
+        _request.return_value = {'frameworks': {}}
+        with self.app.test_request_context('/'):
+            self.api_client.get_framework('g-cloud-9')
+            self.api_client.register_framework_interest(1234, 'g-cloud-9', 'email@email.com')
+            self.api_client.get_framework('g-cloud-9')
+
+            assert _request.call_count == 3
+
+    def test_responses_fetched_before_a_write_are_not_cached(self, _request):
+        def write_while_reading(*args, **kwargs):
+            # as if another thread made a write while this read was waiting for the API
+            self.api_client.clear_request_cache()
+            return {'frameworks': {}}
+        _request.side_effect = write_while_reading
+        with self.app.test_request_context('/'):
+            self.api_client.get_framework('g-cloud-9')
+            self.api_client.get_framework('g-cloud-9')
+
+            assert _request.call_count == 2
+
+    def test_uncached_reads_do_not_clear_the_cache(self, _request):
+        _request.return_value = {'frameworks': []}
+        with self.app.test_request_context('/'):
+            self.api_client.get_framework('g-cloud-9')
+            self.api_client.find_frameworks()
+            self.api_client.get_framework('g-cloud-9')
+
+            assert _request.call_count == 2
+
+    def test_nothing_is_cached_outside_a_request(self, _request):
+        _request.return_value = {'frameworks': {}}
+        self.api_client.get_framework('g-cloud-9')
+        self.api_client.get_framework('g-cloud-9')
+
+        assert _request.call_count == 2
+
+    def test_hits_and_misses_are_added_up_over_requests(self, _request):
+        _request.return_value = {'frameworks': {}}
+        for _ in range(2):
+            with self.app.test_request_context('/'):
+                self.api_client.get_framework('g-cloud-9')
+                self.api_client.get_framework('g-cloud-9')
+                self.api_client._record_cache_stats(mock.Mock())
+
+        assert self.api_client.request_cache_totals.hits == 2
+        assert self.api_client.request_cache_totals.misses == 2
@@ -0,0 +1,50 @@
+import threading
+
+import mock
+
+from app.buckets import BucketRegistry
+
+
+@mock.patch('dmutils.s3.S3')
+class TestBucketRegistry(object):
+
+    def setup_method(self, method):
+        self.app = mock.Mock(config={
+            'DM_AGREEMENTS_BUCKET': 'agreements-bucket',
+            'DM_COMMUNICATIONS_BUCKET': 'communications-bucket',
+            'DM_DOCUMENTS_BUCKET': 'documents-bucket',
+            'DM_SUBMISSIONS_BUCKET': 'submissions-bucket',
+        }, extensions={})
+        self.buckets = BucketRegistry()
+        self.buckets.init_app(self.app)
+
+    def test_handles_are_created_lazily_and_reused(self, s3):
+        assert s3.called is False
+
+        first = self.buckets.get('agreements')
+        second = self.buckets.get('agreements')
+
+        assert first is second
+        s3.assert_called_once_with('agreements-bucket')
+        assert self.buckets.stats()['agreements'] == {'created': 1, 'reused': 1}
+
+    def test_each_bucket_gets_its_own_handle(self, s3):
+        self.buckets.get('agreements')
+        self.buckets.get('submissions')
+
+        assert s3.call_args_list == [mock.call('agreements-bucket'), mock.call('submissions-bucket')]
+
+    def test_handles_are_not_shared_between_threads(self, s3):
+        self.buckets.get('communications')
+        thread = threading.Thread(target=self.buckets.get, args=('communications',))
+        thread.start()
+        thread.join()
+
+        assert s3.call_count == 2
+
+    def test_buckets_can_be_overridden(self, s3):
+        stand_in = mock.Mock()
+        self.buckets.override('documents', stand_in)
+
+        assert self.buckets.get('documents') is stand_in
+        assert s3.called is False
@@ -0,0 +1,111 @@
+import mock
+
+from app.caching import TTLCache, FrameworkCache
+
+
+class TestTTLCache(object):
+
+    def test_get_returns_default_for_missing_keys(self):
+        cache = TTLCache()
+        assert cache.get('missing') is None
+        assert cache.get('missing', 'default') == 'default'
+
+    def test_set_and_get(self):
+        cache = TTLCache()
+        cache.set('key', 'value')
+        assert cache.get('key') == 'value'
+        assert cache.hits == 1
+
+    @mock.patch('app.caching.time.monotonic')
+    def test_entries_expire(self, monotonic):
+        monotonic.return_value = 100
+        cache = TTLCache(ttl=10)
+        cache.set('key', 'value')
+
+        monotonic.return_value = 109
+        assert cache.get('key') == 'value'
+
+        monotonic.return_value = 110
+        assert cache.get('key') is None
+        assert len(cache) == 0
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TTLCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+
+    def test_zero_ttl_does_not_store(self):
+        cache = TTLCache()
+        cache.set('key', 'value', ttl=0)
+        assert cache.get('key') is None
+
+    @mock.patch('app.caching.time.monotonic')
+    def test_add_only_sets_missing_or_expired_keys(self, monotonic):
+        monotonic.return_value = 100
+        cache = TTLCache(ttl=10)
+
+        assert cache.add('key', 'first') is True
+        assert cache.add('key', 'second') is False
+        assert cache.get('key') == 'first'
+
+        monotonic.return_value = 110
+        assert cache.add('key', 'third') is True
+        assert cache.get('key') == 'third'
+
+    def test_add_always_succeeds_with_zero_ttl(self):
+        cache = TTLCache(ttl=0)
+        assert cache.add('key', 'value') is True
+        assert cache.add('key', 'value') is True
+
+
+class TestFrameworkCache(object):
+
+    def setup_method(self, method):
+        self.app = mock.Mock(config={
+            'DM_FRAMEWORK_CACHE_TTL': 300,
+            'DM_FRAMEWORK_CACHE_TRANSITION_TTL': 30,
+            'DM_FRAMEWORK_CACHE_SIZE': 10,
+        }, extensions={})
+        self.cache = FrameworkCache()
+        self.cache.init_app(self.app)
+        self.client = mock.Mock()
+
+    def test_get_framework_is_only_fetched_once(self):
+        self.client.get_framework.return_value = {'frameworks': {'slug': 'g-cloud-8', 'status': 'live'}}
+
+        assert self.cache.get_framework(self.client, 'g-cloud-8') == {'slug': 'g-cloud-8', 'status': 'live'}
+        assert self.cache.get_framework(self.client, 'g-cloud-8') == {'slug': 'g-cloud-8', 'status': 'live'}
+        self.client.get_framework.assert_called_once_with('g-cloud-8')
+
+    def test_returned_frameworks_are_copies(self):
+        self.client.get_framework.return_value = {'frameworks': {'slug': 'g-cloud-8', 'status': 'live'}}
+
+        self.cache.get_framework(self.client, 'g-cloud-8')['status'] = 'expired'
+        assert self.cache.get_framework(self.client, 'g-cloud-8')['status'] == 'live'
+
+    def test_find_frameworks_is_only_fetched_once(self):
+        self.client.find_frameworks.return_value = {'frameworks': [{'slug': 'g-cloud-8', 'status': 'live'}]}
+
+        self.cache.find_frameworks(self.client)
+        assert self.cache.find_frameworks(self.client) == [{'slug': 'g-cloud-8', 'status': 'live'}]
+        assert self.client.find_frameworks.call_count == 1
+
+    def test_frameworks_changing_status_use_the_short_ttl(self):
+        assert self.cache._ttl_for([{'status': 'live'}]) == 300
+        assert self.cache._ttl_for([{'status': 'live'}, {'status': 'open'}]) == 30
+        assert self.cache._ttl_for([{'status': 'standstill'}]) == 30
+
+    def test_disabled_cache_always_calls_the_client(self):
+        self.app.config['DM_FRAMEWORK_CACHE_TTL'] = 0
+        self.cache.init_app(self.app)
+        self.client.get_framework.return_value = {'frameworks': {'slug': 'g-cloud-8', 'status': 'live'}}
+
+        self.cache.get_framework(self.client, 'g-cloud-8')
+        self.cache.get_framework(self.client, 'g-cloud-8')
+        assert self.client.get_framework.call_count == 2
@@ -0,0 +1,142 @@
+import zlib
+
+from flask import Flask, Response, render_template_string, session, stream_with_context
+from flask_wtf.csrf import generate_csrf
+import mock
+import pytest
+
+from app.compression import Compression
+from app.csrf import MaskedCsrfProtect
+
+
+PAGE = u'<p>A page long enough to be worth compressing</p>' * 100
+
+
+def form_with_csrf_token():
+    return render_template_string(PAGE + u'<input type="hidden" name="csrf_token" value="{{ csrf_token() }}"/>')
+
+
+def form_with_unmasked_csrf_token():
+    return PAGE + u'<input type="hidden" name="csrf_token" value="{}"/>'.format(generate_csrf())
+
+
+def page_that_starts_a_csrf_session():
+    session['csrf_token'] = 'abc'
+    return PAGE
+
+
+class TestCompression(object):
+
+    def setup_method(self, method):
+        self.app = Flask('app')
+        self.app.config.update(
+            SECRET_KEY='secret',
+            WTF_CSRF_TIME_LIMIT=None,
+            DM_COMPRESSION_ENABLED=True,
+            DM_COMPRESSION_MIN_SIZE=1024,
+            DM_COMPRESSION_LEVEL=6,
+            DM_COMPRESSION_MIMETYPES=['text/html', 'application/json'],
+        )
+
+        @self.app.route('/page')
+        def page():
+            response = Response(PAGE)
+            response.set_etag('abc')
+            return response
+
+        @self.app.route('/short')
+        def short():
+            return u'<p>Short</p>'
+
+        @self.app.route('/csv')
+        def csv():
+            return Response(PAGE, mimetype='text/csv')
+
+        @self.app.route('/streamed')
+        def streamed():
+            return Response(stream_with_context(PAGE[i:i + 500] for i in range(0, len(PAGE), 500)))
+
+        self.app.add_url_rule('/form', 'form', form_with_csrf_token)
+        self.app.add_url_rule('/unmasked', 'unmasked', form_with_unmasked_csrf_token)
+        self.app.add_url_rule('/session', 'session', page_that_starts_a_csrf_session)
+
+        MaskedCsrfProtect(self.app)
+        with mock.patch('app.compression.brotli', None):
+            self.compression = Compression()
+            self.compression.init_app(self.app)
+        self.client = self.app.test_client()
+
+    def _get(self, url, encodings='gzip, deflate'):
+        return self.client.get(url, headers={'Accept-Encoding': encodings})
+
+    def test_pages_are_gzipped(self):
+        res = self._get('/page')
+
+        assert res.headers['Content-Encoding'] == 'gzip'
+        assert res.headers['Vary'] == 'Accept-Encoding'
+        assert int(res.headers['Content-Length']) == len(res.get_data())
+        assert zlib.decompress(res.get_data(), 16 + zlib.MAX_WBITS).decode('utf-8') == PAGE
+
+    def test_etags_of_compressed_pages_are_weak(self):
+        assert self._get('/page').headers['ETag'] == 'W/"abc"'
+
+    @pytest.mark.parametrize('url,encodings', [
+        ('/page', None),
+        ('/page', 'identity'),
+        ('/page', 'gzip;q=0'),
+        ('/short', 'gzip'),
+        ('/csv', 'gzip'),
+    ])
+    def test_responses_that_are_not_compressed(self, url, encodings):
+        res = self.client.get(url, headers={'Accept-Encoding': encodings} if encodings else {})
+
+        assert 'Content-Encoding' not in res.headers
+
+    def test_nothing_is_compressed_if_disabled(self):
+        self.compression.enabled = False
+
+        assert 'Content-Encoding' not in self._get('/page').headers
+
+    def test_streamed_responses_are_compressed_as_they_are_sent(self):
+        res = self._get('/streamed')
+
+        assert res.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Length' not in res.headers
+        assert zlib.decompress(res.get_data(), 16 + zlib.MAX_WBITS).decode('utf-8') == PAGE
+
+    def test_pages_with_masked_csrf_tokens_are_compressed(self):
+        assert self._get('/form').headers['Content-Encoding'] == 'gzip'
+        assert self._get('/form').headers['Content-Encoding'] == 'gzip'
+
+    def test_pages_with_the_unmasked_csrf_token_are_not_compressed(self):
+        self._get('/session')
+
+        assert 'Content-Encoding' not in self._get('/unmasked').headers
+        assert self._get('/page').headers['Content-Encoding'] == 'gzip'
+
+    def test_streamed_responses_are_compressed_for_sessions_with_a_csrf_token(self):
+        self._get('/session')
+
+        assert self._get('/streamed').headers['Content-Encoding'] == 'gzip'
+
+    def test_bytes_saved_are_counted(self):
+        self._get('/page')
+        self._get('/streamed').get_data()
+        self._get('/short')
+
+        stats = self.compression.stats()['gzip']
+        assert stats['responses'] == 2
+        assert stats['bytes_in'] == 2 * len(PAGE)
+        assert stats['bytes_saved'] == stats['bytes_in'] - stats['bytes_out'] > 0
+
+    def test_brotli_is_preferred_if_installed(self):
+        brotli = pytest.importorskip('brotli')
+        app = Flask('app')
+        app.config.update(self.app.config)
+        app.add_url_rule('/page', 'page', lambda: PAGE)
+        Compression().init_app(app)
+
+        res = app.test_client().get('/page', headers={'Accept-Encoding': 'gzip, br'})
+
+        assert res.headers['Content-Encoding'] == 'br'
+        assert brotli.decompress(res.get_data()).decode('utf-8') == PAGE
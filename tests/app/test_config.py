@@ -0,0 +1,72 @@
+import os
+import tempfile
+
+from flask import Flask
+import jinja2
+import mock
+
+from app import create_app
+from config import Config, Test
+
+
+class TestTemplateBytecodeCache(object):
+
+    def _app(self, **config):
+        app = Flask('app')
+        app.config.update(DM_TEMPLATE_BYTECODE_CACHE_ENABLED=False, DM_TEMPLATE_BYTECODE_CACHE_DIR=None)
+        app.config.update(config)
+        Config.init_app(app)
+        return app
+
+    def test_no_bytecode_cache_by_default(self):
+        assert self._app().jinja_env.bytecode_cache is None
+
+    def test_compiled_templates_are_kept_in_the_cache_dir(self, tmpdir):
+        cache_dir = str(tmpdir.join('template-cache'))
+        app = self._app(DM_TEMPLATE_BYTECODE_CACHE_ENABLED=True, DM_TEMPLATE_BYTECODE_CACHE_DIR=cache_dir)
+
+        app.jinja_env.get_template('errors/404.html')
+
+        assert len(os.listdir(cache_dir)) == 1
+
+    def test_other_workers_use_the_compiled_templates(self, tmpdir):
+        cache_dir = str(tmpdir.join('template-cache'))
+        config = dict(DM_TEMPLATE_BYTECODE_CACHE_ENABLED=True, DM_TEMPLATE_BYTECODE_CACHE_DIR=cache_dir)
+        self._app(**config).jinja_env.get_template('errors/404.html')
+
+        app = self._app(**config)
+        with mock.patch.object(app.jinja_env, 'compile') as compile:
+            app.jinja_env.get_template('errors/404.html')
+
+        assert not compile.called
+
+    def test_jinjas_own_directory_is_used_if_no_cache_dir_is_set(self):
+        app = self._app(DM_TEMPLATE_BYTECODE_CACHE_ENABLED=True)
+
+        assert app.jinja_env.bytecode_cache.directory == jinja2.FileSystemBytecodeCache().directory
+        assert app.jinja_env.bytecode_cache.directory != tempfile.gettempdir()
+
+    def test_jinjas_own_directory_is_used_if_the_cache_dir_cant_be_created(self, tmpdir):
+        tmpdir.join('not-a-directory').write('')
+        cache_dir = str(tmpdir.join('not-a-directory', 'template-cache'))
+        app = self._app(DM_TEMPLATE_BYTECODE_CACHE_ENABLED=True, DM_TEMPLATE_BYTECODE_CACHE_DIR=cache_dir)
+
+        assert app.jinja_env.bytecode_cache.directory == jinja2.FileSystemBytecodeCache().directory
+
+    def test_the_cache_is_used_even_if_the_jinja_environment_already_exists(self, tmpdir):
+        cache_dir = str(tmpdir.join('template-cache'))
+        app = Flask('app')
+        app.jinja_env
+        app.config.update(DM_TEMPLATE_BYTECODE_CACHE_ENABLED=True, DM_TEMPLATE_BYTECODE_CACHE_DIR=cache_dir)
+        Config.init_app(app)
+
+        assert app.jinja_env.bytecode_cache.directory == cache_dir
+
+    def test_create_app_sets_up_the_cache(self, tmpdir):
+        cache_dir = str(tmpdir.join('template-cache'))
+        config = dict(DM_TEMPLATE_BYTECODE_CACHE_ENABLED=True, DM_TEMPLATE_BYTECODE_CACHE_DIR=cache_dir)
+        with mock.patch.multiple(Test, **config):
+            app = create_app('test')
+
+        assert isinstance(app.jinja_env.bytecode_cache, jinja2.FileSystemBytecodeCache)
+        assert app.jinja_env.bytecode_cache.directory == cache_dir
@@ -0,0 +1,191 @@
+import threading
+import time
+
+import mock
+import pytest
+from dmcontent import content_loader as dmcontent_loader
+from dmcontent.content_loader import ContentLoader
+from dmcontent.errors import ContentNotFoundError
+
+import app.content_loader
+from app.caching import TTLCache
+from app.content_loader import LazyContentLoader, context_keys
+
+
+def fake_load_manifest(loader, framework_slug, question_set, manifest):
+    loader._content[framework_slug][manifest] = []
+
+
+def fake_load_messages(loader, framework_slug, blocks):
+    for block in blocks:
+        loader._messages[framework_slug][block] = {'key': 'value'}
+
+
+class TestLazyContentLoader(object):
+
+    def setup_method(self, method):
+        self.load_manifest_patch = mock.patch.object(
+            ContentLoader, 'load_manifest', autospec=True, side_effect=fake_load_manifest
+        )
+        self.load_messages_patch = mock.patch.object(
+            ContentLoader, 'load_messages', autospec=True, side_effect=fake_load_messages
+        )
+        self.load_manifest = self.load_manifest_patch.start()
+        self.load_messages = self.load_messages_patch.start()
+
+        self.loader = LazyContentLoader('app/content')
+        self.loader.register_manifest('g-cloud-9', 'services', 'edit_service')
+        self.loader.register_manifest('g-cloud-9', 'declaration', 'declaration')
+        self.loader.register_messages('g-cloud-9', ['dates', 'urls'])
+
+    def teardown_method(self, method):
+        self.load_manifest_patch.stop()
+        self.load_messages_patch.stop()
+
+    def test_nothing_is_loaded_until_it_is_used(self):
+        assert not self.load_manifest.called
+        assert not self.load_messages.called
+
+    def test_manifests_are_loaded_once_on_first_use(self):
+        self.loader.get_manifest('g-cloud-9', 'declaration')
+        self.loader.get_builder('g-cloud-9', 'declaration')
+
+        self.load_manifest.assert_called_once_with(self.loader, 'g-cloud-9', 'declaration', 'declaration')
+        assert not self.loader.is_loaded('g-cloud-9', 'edit_service')
+
+    def test_messages_are_loaded_once_on_first_use(self):
+        self.loader.get_message('g-cloud-9', 'dates')
+        self.loader.get_message('g-cloud-9', 'dates')
+
+        self.load_messages.assert_called_once_with(self.loader, 'g-cloud-9', ['dates'])
+
+    def test_unregistered_content_is_not_found(self):
+        with pytest.raises(ContentNotFoundError):
+            self.loader.get_manifest('g-cloud-9', 'edit_brief')
+        assert not self.load_manifest.called
+
+    def test_concurrent_first_uses_only_load_once(self):
+        def slow_load_manifest(*args):
+            time.sleep(0.1)
+            fake_load_manifest(*args)
+        self.load_manifest.side_effect = slow_load_manifest
+
+        threads = [
+            threading.Thread(target=self.loader.get_manifest, args=('g-cloud-9', 'declaration')) for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert self.load_manifest.call_count == 1
+
+    def test_load_all(self):
+        self.loader.load_all()
+
+        assert self.load_manifest.call_count == 2
+        assert self.load_messages.call_count == 2
+
+
+class TestFilterManifest(object):
+
+    MANIFEST = [{
+        'name': 'Section',
+        'questions': [
+            {'id': 'q1', 'depends': [{'on': 'lot', 'being': ['lot-1']}]},
+            {'id': 'q2', 'questions': [{'id': 'q3', 'depends': [{'on': 'q1', 'being': [True]}]}]},
+        ],
+    }]
+
+    def setup_method(self, method):
+        self.loader = LazyContentLoader('app/content')
+        self.loader._content['g-cloud-9']['edit_submission'] = self.MANIFEST
+        self.loader.filter_cache = TTLCache(maxsize=10, ttl=60)
+
+        self.get_manifest_patch = mock.patch.object(LazyContentLoader, 'get_manifest', autospec=True)
+        self.get_manifest = self.get_manifest_patch.start()
+        self.get_manifest.return_value.filter.side_effect = lambda context: mock.Mock(context=context)
+
+    def teardown_method(self, method):
+        self.get_manifest_patch.stop()
+
+    def test_context_keys(self):
+        assert context_keys(self.MANIFEST) == {'lot', 'q1'}
+
+    def test_contexts_agreeing_on_the_dependencies_share_a_filtered_manifest(self):
+        first = self.loader.filter_manifest('g-cloud-9', 'edit_submission', {'lot': 'lot-1', 'q1': True, 'x': 1})
+        second = self.loader.filter_manifest('g-cloud-9', 'edit_submission', {'lot': 'lot-1', 'q1': True, 'x': 2})
+
+        assert first is second
+        assert self.get_manifest.return_value.filter.call_count == 1
+
+    def test_contexts_disagreeing_on_the_dependencies_are_filtered_separately(self):
+        first = self.loader.filter_manifest('g-cloud-9', 'edit_submission', {'lot': 'lot-1', 'q1': True})
+        second = self.loader.filter_manifest('g-cloud-9', 'edit_submission', {'lot': 'lot-1'})
+
+        assert first is not second
+        assert second.context == {'lot': 'lot-1'}
+
+    def test_contexts_with_unhashable_values_are_filtered_every_time(self):
+        context = {'lot': 'lot-1', 'q1': {'a', 'set'}}
+        self.loader.filter_manifest('g-cloud-9', 'edit_submission', context)
+        self.loader.filter_manifest('g-cloud-9', 'edit_submission', context)
+
+        assert self.get_manifest.return_value.filter.call_count == 2
+
+    def test_filter_manifests_filters_each_distinct_context_once(self):
+        self.loader.filter_cache = TTLCache(ttl=0)
+        contexts = [{'lot': 'lot-1', 'q1': True}, {'lot': 'lot-2'}, {'lot': 'lot-1', 'q1': True, 'x': 1}]
+
+        first, second, third = self.loader.filter_manifests('g-cloud-9', 'edit_submission', contexts)
+
+        assert first is third
+        assert first is not second
+        assert self.get_manifest.return_value.filter.call_count == 2
+
+
+class TestContentSnapshots(object):
+
+    def setup_method(self, method):
+        self.read_yaml = dmcontent_loader.read_yaml
+
+    def teardown_method(self, method):
+        dmcontent_loader.read_yaml = self.read_yaml
+        app.content_loader._snapshot_files.clear()
+
+    def _content(self, tmpdir):
+        content = tmpdir.mkdir('content')
+        content.mkdir('frameworks').mkdir('g-cloud-9').mkdir('messages').join('dates.yml').write('key: value\n')
+        return content
+
+    def test_snapshot_is_used_instead_of_yaml(self, tmpdir):
+        content = self._content(tmpdir)
+        loader = LazyContentLoader(str(content))
+        loader.build_snapshot(str(tmpdir.join('snapshots')))
+
+        assert loader.use_snapshot(str(tmpdir.join('snapshots'))) is True
+
+        yaml_file = str(content.join('frameworks', 'g-cloud-9', 'messages', 'dates.yml'))
+        with mock.patch('app.content_loader._read_yaml') as read_yaml:
+            assert dmcontent_loader.read_yaml(yaml_file) == {'key': 'value'}
+        assert not read_yaml.called
+
+    def test_snapshot_reads_are_copies(self, tmpdir):
+        content = self._content(tmpdir)
+        loader = LazyContentLoader(str(content))
+        loader.build_snapshot(str(tmpdir.join('snapshots')))
+        loader.use_snapshot(str(tmpdir.join('snapshots')))
+
+        yaml_file = str(content.join('frameworks', 'g-cloud-9', 'messages', 'dates.yml'))
+        dmcontent_loader.read_yaml(yaml_file)['key'] = 'changed'
+        assert dmcontent_loader.read_yaml(yaml_file) == {'key': 'value'}
+
+    def test_snapshot_is_not_used_if_content_has_changed(self, tmpdir):
+        content = self._content(tmpdir)
+        loader = LazyContentLoader(str(content))
+        loader.build_snapshot(str(tmpdir.join('snapshots')))
+
+        content.join('frameworks', 'g-cloud-9', 'messages', 'dates.yml').write('key: new value\n')
+
+        assert loader.use_snapshot(str(tmpdir.join('snapshots'))) is False
+        assert dmcontent_loader.read_yaml is self.read_yaml
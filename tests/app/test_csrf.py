@@ -0,0 +1,67 @@
+from flask import Flask, render_template_string
+from flask_wtf.csrf import generate_csrf
+import pytest
+
+from app.csrf import MaskedCsrfProtect, mask_csrf_token, unmask_csrf_token
+
+
+class TestMasking(object):
+
+    def test_masked_tokens_are_different_every_time(self):
+        assert mask_csrf_token(u'##abc') != mask_csrf_token(u'##abc')
+
+    def test_masked_tokens_can_be_unmasked(self):
+        assert unmask_csrf_token(mask_csrf_token(u'##abc')) == u'##abc'
+
+    @pytest.mark.parametrize('value', [None, u'', u'##abc', u'not hex', u'abc', u'00ff'])
+    def test_values_that_are_not_masked_tokens_are_left_alone(self, value):
+        assert unmask_csrf_token(value) == value
+
+
+class TestMaskedCsrfProtect(object):
+
+    def setup_method(self, method):
+        self.app = Flask('app')
+        self.app.config.update(SECRET_KEY='secret', WTF_CSRF_TIME_LIMIT=None)
+        MaskedCsrfProtect(self.app)
+
+        @self.app.route('/form')
+        def form():
+            return render_template_string(u'{{ csrf_token() }}')
+
+        @self.app.route('/raw')
+        def raw():
+            return generate_csrf()
+
+        @self.app.route('/submit', methods=['POST'])
+        def submit():
+            return u'ok'
+
+        self.client = self.app.test_client()
+
+    def test_templates_get_masked_tokens(self):
+        first = self.client.get('/form').get_data(as_text=True)
+        second = self.client.get('/form').get_data(as_text=True)
+
+        assert first != second
+        assert unmask_csrf_token(first) == unmask_csrf_token(second) == self.client.get('/raw').get_data(as_text=True)
+
+    def test_masked_tokens_are_accepted_in_forms(self):
+        token = self.client.get('/form').get_data(as_text=True)
+
+        assert self.client.post('/submit', data={'csrf_token': token}).status_code == 200
+
+    def test_masked_tokens_are_accepted_in_headers(self):
+        token = self.client.get('/form').get_data(as_text=True)
+
+        assert self.client.post('/submit', headers={'X-CSRFToken': token}).status_code == 200
+
+    def test_unmasked_tokens_are_still_accepted(self):
+        token = self.client.get('/raw').get_data(as_text=True)
+
+        assert self.client.post('/submit', data={'csrf_token': token}).status_code == 200
+
+    def test_wrong_tokens_are_rejected(self):
+        self.client.get('/form')
+
+        assert self.client.post('/submit', data={'csrf_token': mask_csrf_token(u'##wrong')}).status_code == 400
@@ -0,0 +1,83 @@
+from flask import render_template_string
+import mock
+import pytest
+
+from app.fragment_cache import FileFragmentStore, FragmentCache
+from .helpers import BaseApplicationTest
+
+
+# autoescaped, as our .html templates are (and string templates are not, in older versions of Flask)
+TEMPLATE = (
+    "{% autoescape true %}{% for framework in frameworks %}"
+    "{% cache 60, 'framework', framework.slug %}{{ render() }}<b>{{ framework.name }}</b>{% endcache %}"
+    "{% endfor %}{% endautoescape %}"
+)
+
+
+class TestFragmentCache(BaseApplicationTest):
+
+    def setup_method(self, method):
+        super(TestFragmentCache, self).setup_method(method)
+        self.render = mock.Mock(return_value='')
+
+    def _render(self, *frameworks):
+        with self.app.test_request_context('/'):
+            return render_template_string(TEMPLATE, frameworks=frameworks, render=self.render)
+
+    def _fragment_cache(self, tmpdir, backend):
+        self.app.config.update(DM_FRAGMENT_CACHE_BACKEND=backend, DM_FRAGMENT_CACHE_DIR=str(tmpdir.join('fragments')))
+        fragment_cache = FragmentCache()
+        fragment_cache.init_app(self.app)
+        return fragment_cache
+
+    @pytest.mark.parametrize('backend', ['memory', 'filesystem'])
+    def test_fragments_are_rendered_once_per_key(self, tmpdir, backend):
+        self._fragment_cache(tmpdir, backend)
+
+        first = self._render({'slug': 'g-cloud-9', 'name': 'G & C'}, {'slug': 'dos', 'name': 'DOS'})
+        second = self._render({'slug': 'g-cloud-9', 'name': 'Changed'}, {'slug': 'dos', 'name': 'DOS'})
+
+        assert first == second == '<b>G &amp; C</b><b>DOS</b>'
+        assert self.render.call_count == 2
+
+    def test_fragments_are_rendered_every_time_if_disabled(self, tmpdir):
+        self._fragment_cache(tmpdir, None)
+
+        self._render({'slug': 'g-cloud-9', 'name': 'G-Cloud 9'})
+        assert self._render({'slug': 'g-cloud-9', 'name': 'Changed'}) == '<b>Changed</b>'
+        assert self.render.call_count == 2
+
+    def test_keys_include_the_content_version(self, tmpdir):
+        fragment_cache = self._fragment_cache(tmpdir, 'memory')
+        key = fragment_cache.key(['framework', 'g-cloud-9'])
+
+        fragment_cache._content_version = 'new-content'
+
+        assert fragment_cache.key(['framework', 'g-cloud-9']) != key
+
+    def test_unknown_backend(self, tmpdir):
+        with pytest.raises(ValueError):
+            self._fragment_cache(tmpdir, 'memcached')
+
+    def test_filesystem_backend_needs_a_directory(self):
+        self.app.config.update(DM_FRAGMENT_CACHE_BACKEND='filesystem', DM_FRAGMENT_CACHE_DIR=None)
+
+        with pytest.raises(ValueError) as e:
+            FragmentCache().init_app(self.app)
+        assert 'DM_FRAGMENT_CACHE_DIR' in str(e.value)
+
+
+class TestFileFragmentStore(object):
+
+    def test_fragments_expire(self, tmpdir):
+        store = FileFragmentStore(str(tmpdir))
+
+        with mock.patch('app.fragment_cache.time.time', return_value=1000):
+            store.set('key', u'<p>‘fragment’</p>', 60)
+            assert store.get('key') == u'<p>‘fragment’</p>'
+
+        with mock.patch('app.fragment_cache.time.time', return_value=1060):
+            assert store.get('key') is None
+
+    def test_missing_fragments(self, tmpdir):
+        assert FileFragmentStore(str(tmpdir)).get('key') is None
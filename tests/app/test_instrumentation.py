@@ -0,0 +1,118 @@
+from functools import partial
+import threading
+
+from flask import Flask, render_template_string
+import mock
+import pytest
+
+from app.instrumentation import Histogram, Instrumentation
+from app.main.helpers.concurrency import fetch_concurrently
+
+
+class TestInstrumentation(object):
+
+    def setup_method(self, method):
+        self.app = Flask('app')
+        self.instrumentation = Instrumentation()
+        self.instrumentation.init_app(self.app)
+
+        @self.app.route('/page')
+        def page():
+            with self.instrumentation.timer('api', 'get_framework'):
+                with self.instrumentation.timer('api', 'get_page'):
+                    pass
+            with self.instrumentation.timer('api', 'get_supplier'):
+                pass
+            return render_template_string(u'{{ 1 + 1 }}')
+
+        @self.app.route('/error')
+        def error():
+            try:
+                with self.instrumentation.timer('s3', 'documents.get_key'):
+                    raise ValueError()
+            except ValueError:
+                return u'', 404
+
+        @self.app.route('/crash')
+        def crash():
+            with self.instrumentation.timer('api', 'get_framework'):
+                raise ValueError()
+
+    def test_calls_are_timed_per_endpoint(self):
+        # Flask's logger is a read-only property, so it's replaced on the class
+        with mock.patch.object(Flask, 'logger', new_callable=mock.PropertyMock) as logger_property:
+            self.app.test_client().get('/page')
+        logger = logger_property.return_value
+
+        stats = self.instrumentation.stats()
+        assert set(stats['endpoints']['page']) == {'total', 'api', 'template'}
+        assert stats['endpoints']['page']['total']['count'] == 1
+        assert stats['responses'] == {'page': {200: 1}}
+        assert stats['calls']['api'] == {
+            'get_framework': {'count': 1, 'errors': 0, 'duration': mock.ANY},
+            'get_supplier': {'count': 1, 'errors': 0, 'duration': mock.ANY},
+        }
+        assert stats['calls']['template'] == {'<string>': {'count': 1, 'errors': 0, 'duration': mock.ANY}}
+
+        extra = logger.info.call_args[1]['extra']
+        assert extra['endpoint'] == 'page'
+        assert set(extra['timings']) == {'api', 'template'}
+        assert extra['calls'] == {'api.get_framework': 1, 'api.get_supplier': 1, 'template.<string>': 1}
+
+    def test_requests_that_raise_an_exception_are_counted_as_500s(self):
+        with mock.patch.object(Flask, 'logger', new_callable=mock.PropertyMock) as logger_property:
+            assert self.app.test_client().get('/crash').status_code == 500
+        logger = logger_property.return_value
+
+        stats = self.instrumentation.stats()
+        assert stats['responses'] == {'crash': {500: 1}}
+        assert stats['endpoints']['crash']['total']['count'] == 1
+        assert stats['calls']['api']['get_framework']['errors'] == 1
+        assert logger.info.call_args[1]['extra']['status'] == 500
+
+    def test_failed_calls_are_counted(self):
+        self.app.test_client().get('/error')
+
+        assert self.instrumentation.stats()['calls']['s3']['documents.get_key']['errors'] == 1
+
+    def test_nothing_is_timed_outside_requests(self):
+        with self.instrumentation.timer('api', 'get_framework'):
+            pass
+        with self.app.test_request_context('/page'):
+            with self.instrumentation.timer('api', 'get_framework'):
+                pass
+
+        assert self.instrumentation.stats() == {'endpoints': {}, 'responses': {}, 'calls': {}}
+
+    def test_calls_made_in_parallel_are_all_counted(self):
+        self.app.config['DM_FETCH_POOL_SIZE'] = 2
+        both_started = threading.Barrier(2)
+
+        def fetch(name):
+            with self.instrumentation.timer('api', name):
+                both_started.wait(timeout=1)
+
+        @self.app.route('/concurrent')
+        def concurrent():
+            fetch_concurrently(framework=partial(fetch, 'get_framework'), supplier=partial(fetch, 'get_supplier'))
+            return u''
+
+        self.app.test_client().get('/concurrent')
+
+        assert set(self.instrumentation.stats()['calls']['api']) == {'get_framework', 'get_supplier'}
+
+
+@pytest.mark.parametrize('values,counts', [
+    ([], [0, 0, 0]),
+    ([0.1, 1, 5], [1, 2, 3]),
+])
+def test_histogram(values, counts):
+    histogram = Histogram(buckets=(0.5, 1, float('inf')))
+    for value in values:
+        histogram.observe(value)
+
+    assert histogram.as_dict() == {
+        'count': len(values),
+        'sum': sum(values),
+        'buckets': [[0.5, counts[0]], [1, counts[1]], ['+Inf', counts[2]]],
+    }
@@ -0,0 +1,106 @@
+import json
+import os
+
+from flask import Flask
+import mock
+
+from app.caching import TTLCache
+from app.compression import Compression
+from app.instrumentation import Instrumentation
+from app.metrics import Metrics, aggregate, render_samples
+
+
+HISTOGRAM = {'count': 1, 'sum': 0.5, 'buckets': [[1, 1], ['+Inf', 1]]}
+
+
+class TestMetrics(object):
+
+    def setup_method(self, method):
+        self.app = Flask('app')
+        self.app.config.update(
+            DM_METRICS_DIR=None,
+            DM_METRICS_WRITE_INTERVAL=10,
+            DM_COMPRESSION_ENABLED=True,
+            DM_COMPRESSION_MIN_SIZE=0,
+            DM_COMPRESSION_LEVEL=6,
+            DM_COMPRESSION_MIMETYPES=['text/html'],
+        )
+        self.cache = TTLCache(ttl=60)
+        self.app.extensions['framework_cache'] = mock.Mock(backend=self.cache)
+        self.app.extensions['data_api_client'] = mock.Mock(request_cache_totals=mock.Mock(hits=3, misses=1))
+        Instrumentation().init_app(self.app)
+        Compression().init_app(self.app)
+
+        @self.app.route('/page')
+        def page():
+            return u'<p>Page</p>'
+
+    def _metrics(self, tmpdir=None):
+        if tmpdir is not None:
+            self.app.config['DM_METRICS_DIR'] = str(tmpdir)
+        metrics = Metrics()
+        metrics.init_app(self.app)
+        return metrics
+
+    def test_collect(self):
+        metrics = self._metrics()
+        self.cache.get('missing')
+        self.app.test_client().get('/page', headers={'Accept-Encoding': 'gzip'})
+
+        samples = {(name, tuple(sorted(labels.items()))): value for name, labels, value in metrics.collect()}
+
+        assert samples[('dm_requests_total', (('endpoint', 'page'), ('status', '200')))] == 1
+        assert samples[('dm_request_duration_seconds', (('endpoint', 'page'),))]['count'] == 1
+        assert samples[('dm_cache_misses_total', (('cache', 'framework'),))] == 1
+        assert samples[('dm_cache_hits_total', (('cache', 'data_api_request'),))] == 3
+        assert samples[('dm_cache_misses_total', (('cache', 'data_api_request'),))] == 1
+        assert samples[('dm_compressed_responses_total', (('encoding', 'gzip'),))] == 1
+        assert samples[('dm_fetch_pool_busy_threads', ())] == 0
+        assert samples[('process_resident_memory_bytes', ())] > 0
+
+    def test_snapshots_are_written_after_requests(self, tmpdir):
+        self._metrics(tmpdir)
+        self.app.test_client().get('/page')
+
+        with open(str(tmpdir.join('{}.json'.format(os.getpid())))) as f:
+            assert json.load(f)['pid'] == os.getpid()
+
+    def test_counters_from_other_processes_are_added_up(self, tmpdir):
+        metrics = self._metrics(tmpdir)
+        self.app.test_client().get('/page')
+        tmpdir.join('999999999.json').write(json.dumps({'pid': 999999999, 'samples': [
+            ['dm_requests_total', {'endpoint': 'page', 'status': '200'}, 2],
+            ['process_resident_memory_bytes', {}, 1024],
+        ]}))
+
+        rendered = metrics.render()
+
+        assert 'dm_requests_total{endpoint="page",status="200"} 3\n' in rendered
+        assert 'process_resident_memory_bytes{{pid="{}"}}'.format(os.getpid()) in rendered
+        assert 'pid="999999999"' not in rendered
+
+
+def test_aggregate_adds_up_histograms():
+    snapshot = {'pid': os.getpid(), 'samples': [['dm_request_duration_seconds', {'endpoint': 'page'}, HISTOGRAM]]}
+
+    assert aggregate([snapshot, snapshot]) == [
+        ['dm_request_duration_seconds', {'endpoint': 'page'}, {
+            'count': 2, 'sum': 1.0, 'buckets': [[1, 2], ['+Inf', 2]],
+        }],
+    ]
+
+
+def test_render_samples():
+    rendered = render_samples([
+        ['dm_request_duration_seconds', {'endpoint': 'main.page'}, HISTOGRAM],
+        ['dm_calls_total', {'category': 'api', 'name': 'say "hi"'}, 3],
+    ])
+
+    assert (
+        '# TYPE dm_request_duration_seconds histogram\n'
+        'dm_request_duration_seconds_bucket{endpoint="main.page",le="1"} 1\n'
+        'dm_request_duration_seconds_bucket{endpoint="main.page",le="+Inf"} 1\n'
+        'dm_request_duration_seconds_sum{endpoint="main.page"} 0.5\n'
+        'dm_request_duration_seconds_count{endpoint="main.page"} 1\n'
+    ) in rendered
+    assert 'dm_calls_total{category="api",name="say \\"hi\\""} 3\n' in rendered
@@ -0,0 +1,104 @@
+from flask import Flask
+import mock
+import pytest
+
+from app.profiling import RequestProfiler
+
+
+class TestRequestProfiler(object):
+
+    def setup_method(self, method):
+        self.app = Flask('app')
+        self.app.testing = True
+        self.app.config.update(
+            SECRET_KEY='not_very_secret',
+            DM_DOWNSTREAM_REQUEST_ID_HEADER='X-Amz-Cf-Id',
+            DM_PROFILING_ENABLED=True,
+            DM_PROFILING_SAMPLE_RATE=0,
+            DM_PROFILING_HEADER='DM-Profile-Request',
+            DM_PROFILING_TOKEN_MAX_AGE=3600,
+            DM_PROFILING_MAX_PROFILES=2,
+        )
+
+        @self.app.route('/page')
+        def page():
+            return u'<p>Page</p>'
+
+        @self.app.route('/error')
+        def error():
+            raise ValueError()
+
+    def _profiler(self, tmpdir, **config):
+        self.app.config['DM_PROFILING_DIR'] = str(tmpdir.join('profiles'))
+        self.app.config.update(config)
+        profiler = RequestProfiler()
+        profiler.init_app(self.app)
+        return profiler
+
+    def _get(self, profiler, url='/page', token=None):
+        headers = {'X-Amz-Cf-Id': 'request-id'}
+        if token:
+            headers['DM-Profile-Request'] = token
+        return self.app.test_client().get(url, headers=headers)
+
+    def test_requests_with_a_token_are_profiled(self, tmpdir):
+        profiler = self._profiler(tmpdir)
+        self._get(profiler, token=profiler.make_token())
+
+        profiles = profiler.profiles()
+        assert len(profiles) == 1
+        assert profiles[0]['endpoint'] == 'page'
+        assert profiles[0]['request_id'] == 'request-id'
+        assert profiles[0]['status'] == 200
+        assert 'function calls' in profiler.report(profiles[0]['id'])
+
+    @pytest.mark.parametrize('token', [None, 'not-a-token'])
+    def test_requests_without_a_valid_token_are_not_profiled(self, tmpdir, token):
+        profiler = self._profiler(tmpdir)
+        self._get(profiler, token=token)
+
+        assert profiler.profiles() == []
+
+    def test_expired_tokens_are_not_valid(self, tmpdir):
+        profiler = self._profiler(tmpdir, DM_PROFILING_TOKEN_MAX_AGE=-1)
+
+        assert not profiler.is_valid_token(profiler.make_token())
+
+    def test_a_fraction_of_requests_are_sampled(self, tmpdir):
+        profiler = self._profiler(tmpdir, DM_PROFILING_SAMPLE_RATE=0.5)
+        with mock.patch('app.profiling.random.random', side_effect=[0.3, 0.7]):
+            self._get(profiler)
+            self._get(profiler)
+
+        assert len(profiler.profiles()) == 1
+
+    def test_only_the_most_recent_profiles_are_kept(self, tmpdir):
+        profiler = self._profiler(tmpdir, DM_PROFILING_SAMPLE_RATE=1)
+        # only the profiler's clock is patched, as the test client's cookie jar reads the time too
+        with mock.patch('app.profiling.time') as time:
+            time.time.side_effect = [1000, 1000.5, 2000, 2000.1, 3000, 3000.2]
+            for _ in range(3):
+                self._get(profiler)
+
+        profiles = profiler.profiles()
+        assert [profile['started_at'] for profile in profiles] == [3000, 2000]
+        assert len(tmpdir.join('profiles').listdir()) == 4
+
+    def test_profiling_stops_if_the_view_fails(self, tmpdir):
+        profiler = self._profiler(tmpdir, DM_PROFILING_SAMPLE_RATE=1)
+        with pytest.raises(ValueError):
+            self._get(profiler, url='/error')
+
+        assert profiler.profiles() == []
+
+    def test_nothing_is_profiled_if_disabled(self, tmpdir):
+        profiler = self._profiler(tmpdir, DM_PROFILING_ENABLED=False, DM_PROFILING_SAMPLE_RATE=1)
+        self._get(profiler)
+
+        assert not tmpdir.join('profiles').check()
+
+    def test_report_for_missing_profile(self, tmpdir):
+        profiler = self._profiler(tmpdir)
+
+        assert profiler.report('1000-abc') is None
+        assert profiler.report('../secrets') is None